@@ -0,0 +1,706 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dart Analysis — lectura ligera de fuentes Dart (sin analizador completo)
+------------------------------------------------------------------------
+• Directivas import / export / part de un archivo, resueltas a rutas absolutas
+  (relativas al archivo, o `package:<este paquete>/…` → <proyecto>/lib/…).
+• Dependientes directos: qué archivos importan/exportan/incluyen alguno dado.
+• Declaraciones top-level (clases, mixins, enums, extensiones, typedefs, funciones)
+  e identificadores referenciados, para el índice de símbolos de la GUI.
+• Trozos (chunks) de un archivo cortados en límites de declaración: top-level y,
+  si una clase no cabe, entre sus miembros.
+• Código generado (*.g.dart, *.freezed.dart, …, o cabecera `// GENERATED CODE`),
+  enlaces `part` / `part of` y colapso a cabecera + firmas públicas.
+• Quitar comentarios (conservando, si se quiere, los de documentación).
+• Regiones top-level (cabecera, clases, funciones…) con sus líneas, y el texto de
+  solo algunas de ellas con marcas en lo omitido (selección parcial de la GUI).
+• Dependencias según .dart_tool/package_config.json (dónde está el `lib/` de cada
+  paquete) y ubicación del pub cache.
+
+Solo mira el texto con expresiones regulares: comentarios y cadenas raras pueden
+engañarlo, pero para elegir contexto de un dump sobra.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import sys
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import unquote, urlparse
+from urllib.request import url2pathname
+
+# `import 'x.dart'`, `export "package:a/b.dart"`, `part 'x.g.dart'` (no `part of`)
+_DIRECTIVE_RE = re.compile(
+    r"""^[ \t]*(?:import|export|part)[ \t]+(['"])([^'"\n]+)\1""", re.MULTILINE
+)
+# Declaraciones a columna 0 (lo indentado es miembro o cuerpo). Modificadores de
+# clase de Dart 3 delante; `mixin class X` y `extension type X` incluidos.
+_TYPE_DECL_RE = re.compile(
+    r"^(?:(?:abstract|sealed|base|final|interface|mixin)[ \t]+)*"
+    r"(?:class|mixin|enum|extension(?:[ \t]+type)?)[ \t]+([A-Za-z_$][\w$]*)",
+    re.MULTILINE,
+)
+# `typedef X = ...;` o la forma vieja `typedef void X(int a);`
+_TYPEDEF_RE = re.compile(
+    r"^typedef[ \t]+(?:[\w$<>?,. \t]+[ \t]+)?([A-Za-z_$][\w$]*)[ \t]*[=(<]",
+    re.MULTILINE,
+)
+# `Tipo<A, B>? nombre<T>(` a columna 0: función top-level (el tipo es opcional)
+_FUNC_DECL_RE = re.compile(
+    r"^(?:external[ \t]+)?(?:[\w$][\w$<>?,.\[\] \t]*[ \t]+)?([A-Za-z_$][\w$]*)"
+    r"[ \t]*(?:<[^>()\n]*>)?[ \t]*\(",
+    re.MULTILINE,
+)
+_NOT_FUNC_NAMES = frozenset(
+    "if for while switch return assert catch import export part library on".split()
+)
+_COMMENT_RE = re.compile(r"//[^\n]*|/\*.*?\*/", re.DOTALL)
+_IDENT_RE = re.compile(r"[A-Za-z_$][\w$]*")
+
+_PUBSPEC_NAME_RE = re.compile(r"^name:[ \t]*['\"]?([A-Za-z_][A-Za-z0-9_]*)", re.M)
+
+
+def pubspec_name(project_root: str) -> str:
+    """Nombre del paquete según pubspec.yaml ("" si no hay)."""
+    try:
+        with open(os.path.join(project_root, "pubspec.yaml"), encoding="utf-8") as fh:
+            m = _PUBSPEC_NAME_RE.search(fh.read())
+    except OSError:
+        return ""
+    return m.group(1) if m else ""
+
+
+def resolve_uri(
+    uri: str, from_file: str, project_root: str, package: str
+) -> Optional[str]:
+    """Ruta absoluta (normcase) de una URI de directiva; None si es externa."""
+    if uri.startswith("package:"):
+        name, _, rest = uri[len("package:") :].partition("/")
+        if not package or name != package or not rest:
+            return None
+        target = os.path.join(project_root, "lib", rest)
+    elif ":" in uri:
+        return None  # dart:, http:, etc.
+    else:
+        target = os.path.join(os.path.dirname(from_file), uri)
+    return os.path.normcase(os.path.abspath(target))
+
+
+def dart_directives(
+    text: str, from_file: str, project_root: str, package: str
+) -> List[str]:
+    """Destinos resueltos de import/export/part de `text` (en orden)."""
+    out: List[str] = []
+    for m in _DIRECTIVE_RE.finditer(text):
+        target = resolve_uri(m.group(2), from_file, project_root, package)
+        if target is not None:
+            out.append(target)
+    return out
+
+
+def direct_dependents(
+    targets: Set[str],
+    candidates: Iterable[str],
+    read: Callable[[str], bytes],
+    project_root: str,
+    package: str,
+) -> List[str]:
+    """Candidatos .dart (fuera de `targets`) con una directiva hacia alguno de ellos.
+
+    `targets` van en normcase/abspath; `read` devuelve los bytes de una ruta.
+    """
+    found: List[str] = []
+    for path in candidates:
+        key = os.path.normcase(os.path.abspath(path))
+        if key in targets or not path.lower().endswith(".dart"):
+            continue
+        try:
+            text = read(path).decode("utf-8", errors="replace")
+        except OSError:
+            continue
+        if any(
+            t in targets for t in dart_directives(text, path, project_root, package)
+        ):
+            found.append(path)
+    return found
+
+
+def top_level_declarations(text: str) -> List[str]:
+    """Nombres públicos declarados a nivel de archivo, sin repetir y en orden."""
+    text = _COMMENT_RE.sub("", text)
+    names: Dict[str, None] = {}
+    for m in _TYPE_DECL_RE.finditer(text):
+        names.setdefault(m.group(1))
+    for m in _TYPEDEF_RE.finditer(text):
+        names.setdefault(m.group(1))
+    for m in _FUNC_DECL_RE.finditer(text):
+        if m.group(1) not in _NOT_FUNC_NAMES:
+            names.setdefault(m.group(1))
+    # `extension on X` (sin nombre) y privados: no se pueden referenciar desde fuera
+    return [n for n in names if n != "on" and not n.startswith("_")]
+
+
+def referenced_identifiers(text: str) -> Set[str]:
+    """Identificadores que aparecen en el código (sin comentarios)."""
+    return set(_IDENT_RE.findall(_COMMENT_RE.sub("", text)))
+
+
+# ---------- Trozos en límites de declaración ----------
+
+# Lo que importa para la profundidad de llaves: comentarios y cadenas se saltan
+# enteros (sus llaves no cuentan), los saltos de línea marcan la profundidad.
+_BRACE_SCAN_RE = re.compile(
+    r"""
+    //[^\n]*|/\*.*?\*/
+  | r?'''.*?'''|r?\"\"\".*?\"\"\"|r?'(?:\\.|[^'\\\n])*'|r?"(?:\\.|[^"\\\n])*"
+  | [{}\n]
+    """,
+    re.DOTALL | re.VERBOSE,
+)
+
+
+def line_depths(text: str) -> List[int]:
+    """Profundidad de llaves al inicio de cada línea (y una extra al final)."""
+    depths = [0]
+    depth = 0
+    for m in _BRACE_SCAN_RE.finditer(text):
+        tok = m.group(0)
+        if tok == "{":
+            depth += 1
+        elif tok == "}":
+            depth = max(0, depth - 1)
+        else:
+            depths.extend([depth] * tok.count("\n"))
+    return depths
+
+
+@dataclass
+class DartChunk:
+    start: int  # línea inicial (1-based)
+    end: int  # línea final (inclusive)
+    text: str
+    enclosing: str = ""  # clase/mixin/enum/extensión que lo contiene
+    symbols: List[str] = field(default_factory=list)  # declaraciones top-level
+
+
+def _boundaries(
+    lines: List[str], depths: List[int], lo: int, hi: int, level: int
+) -> List[int]:
+    """Líneas de [lo, hi) donde empieza una declaración a profundidad `level`.
+
+    Empieza una si la línea está a esa profundidad y la anterior no vacía cerró
+    algo (`}`, `;`, o `{` al abrir el cuerpo); así comentarios y anotaciones
+    quedan pegados a lo que documentan.
+    """
+    cuts = [lo]
+    prev = ""
+    for i in range(lo, hi):
+        stripped = lines[i].strip()
+        if not stripped:
+            continue
+        if (
+            i > lo
+            and depths[i] == level
+            and prev.endswith(("}", ";", "{"))
+            and not stripped.startswith("}")
+        ):
+            cuts.append(i)
+        prev = stripped.split("//", 1)[0].rstrip() if "//" in stripped else stripped
+    return cuts
+
+
+def _hard_split(lines: List[str], lo: int, hi: int, max_chars: int) -> List[int]:
+    cuts = [lo]
+    size = 0
+    for i in range(lo, hi):
+        n = len(lines[i])
+        if size and size + n > max_chars:
+            cuts.append(i)
+            size = 0
+        size += n
+    return cuts
+
+
+def _pack(
+    lines: List[str], cuts: List[int], hi: int, max_chars: int
+) -> List[Tuple[int, int]]:
+    """Une segmentos consecutivos mientras quepan; devuelve rangos [lo, hi)."""
+    spans = list(zip(cuts, cuts[1:] + [hi]))
+    out: List[Tuple[int, int]] = []
+    for a, b in spans:
+        size = sum(len(lines[i]) for i in range(a, b))
+        if out:
+            pa, pb = out[-1]
+            if sum(len(lines[i]) for i in range(pa, pb)) + size <= max_chars:
+                out[-1] = (pa, b)
+                continue
+        out.append((a, b))
+    return out
+
+
+def dart_chunks(text: str, max_chars: int = 4000) -> List[DartChunk]:
+    """Parte un .dart en trozos de hasta ~`max_chars` en límites de declaración.
+
+    Un trozo por declaración top-level (así editar una no cambia el hash de las
+    demás); una que no cabe se parte entre sus miembros (juntando los contiguos
+    que quepan), y un miembro gigante, por líneas.
+    """
+    lines = text.splitlines(keepends=True)
+    depths = line_depths(text)
+    ranges: List[Tuple[int, int, str]] = []  # (lo, hi, clase contenedora)
+    cuts = _boundaries(lines, depths, 0, len(lines), 0)
+    for lo, hi in zip(cuts, cuts[1:] + [len(lines)]):
+        unit = "".join(lines[lo:hi])
+        m = _TYPE_DECL_RE.search(unit)
+        owner = m.group(1) if m else ""
+        if len(unit) <= max_chars:
+            single = top_level_declarations(unit) == [owner]
+            ranges.append((lo, hi, owner if single else ""))
+            continue
+        for mlo, mhi in _pack(
+            lines, _boundaries(lines, depths, lo, hi, 1), hi, max_chars
+        ):
+            if sum(len(lines[i]) for i in range(mlo, mhi)) <= max_chars:
+                ranges.append((mlo, mhi, owner))
+                continue
+            for a, b in _pack(
+                lines, _hard_split(lines, mlo, mhi, max_chars), mhi, max_chars
+            ):
+                ranges.append((a, b, owner))
+
+    chunks: List[DartChunk] = []
+    for lo, hi, owner in ranges:
+        while lo < hi and not lines[lo].strip():
+            lo += 1
+        while hi > lo and not lines[hi - 1].strip():
+            hi -= 1
+        if lo == hi:
+            continue
+        body = "".join(lines[lo:hi])
+        chunks.append(DartChunk(lo + 1, hi, body, owner, top_level_declarations(body)))
+    return chunks
+
+
+def line_chunks(text: str, max_chars: int = 4000) -> List[DartChunk]:
+    """Trozos por líneas para lo que no es Dart (yaml, md, etc.)."""
+    lines = text.splitlines(keepends=True)
+    out: List[DartChunk] = []
+    for lo, hi in _pack(
+        lines, _hard_split(lines, 0, len(lines), max_chars), len(lines), max_chars
+    ):
+        body = "".join(lines[lo:hi])
+        if body.strip():
+            out.append(DartChunk(lo + 1, hi, body))
+    return out
+
+
+# ---------- Código generado y partes ----------
+
+_GENERATED_NAME_RE = re.compile(
+    r"\.(?:g|freezed|mocks|gr|gen|config|chopper|pb|pbenum|pbjson|pbserver|pbgrpc)"
+    r"\.dart$"
+    r"|(?:^|[/\\])(?:app_localizations(?:_\w+)?|generated_plugin_registrant)\.dart$",
+    re.IGNORECASE,
+)
+# Solo se mira el comienzo del archivo y solo en comentarios de línea
+GENERATED_HEAD_CHARS = 2048
+_GENERATED_HEADER_RE = re.compile(
+    r"^[ \t]*//.*(?:GENERATED CODE|DO NOT (?:EDIT|MODIFY)|@generated"
+    r"|\bGenerated (?:file|code)\b)",
+    re.IGNORECASE | re.MULTILINE,
+)
+_PART_RE = re.compile(r"""^[ \t]*part[ \t]+(['"])([^'"\n]+)\1[ \t]*;""", re.M)
+_PART_OF_RE = re.compile(
+    r"""^[ \t]*part[ \t]+of[ \t]+(?:(['"])([^'"\n]+)\1|[\w$.]+)[ \t]*;""", re.M
+)
+
+
+def is_generated_dart(path: str, head: str) -> bool:
+    """Generado por nombre (build_runner, protobuf, l10n…) o por la cabecera."""
+    return bool(_GENERATED_NAME_RE.search(path)) or bool(
+        _GENERATED_HEADER_RE.search(head[:GENERATED_HEAD_CHARS])
+    )
+
+
+def part_links(text: str, from_file: str) -> Tuple[List[str], Optional[str]]:
+    """(partes que incluye, librería de la que es parte), en normcase/abspath.
+
+    None = no es una parte; "" = `part of nombre.de.libreria;` (forma antigua,
+    no se puede resolver a un archivo).
+    """
+    base = os.path.dirname(from_file)
+    parts = [
+        os.path.normcase(os.path.abspath(os.path.join(base, m.group(2))))
+        for m in _PART_RE.finditer(text)
+        if ":" not in m.group(2)
+    ]
+    m = _PART_OF_RE.search(text)
+    owner: Optional[str] = None
+    if m:
+        uri = m.group(2)
+        owner = (
+            os.path.normcase(os.path.abspath(os.path.join(base, uri)))
+            if uri and ":" not in uri
+            else ""
+        )
+    return parts, owner
+
+
+_HEADER_DIRECTIVE_RE = re.compile(r"(?:library|import|export|part)\b")
+_ANNOTATION_RE = re.compile(r"@[\w$.]+(?:<[^<>]*>)?")
+
+
+def _skip_parens(s: str, i: int) -> int:
+    """Índice tras el paréntesis que cierra el que abre en `s[i]`."""
+    depth = 0
+    for j in range(i, len(s)):
+        if s[j] == "(":
+            depth += 1
+        elif s[j] == ")":
+            depth -= 1
+            if depth == 0:
+                return j + 1
+    return len(s)
+
+
+def _signature(code: str) -> str:
+    """Declaración sin anotaciones, comentarios, cuerpo ni inicializador."""
+    s = " ".join(_COMMENT_RE.sub("", code).split())
+    while s.startswith("@"):
+        m = _ANNOTATION_RE.match(s)
+        j = m.end() if m else 1
+        if s[j : j + 1] == "(":
+            j = _skip_parens(s, j)
+        s = s[j:].lstrip()
+    depth = 0
+    for i, c in enumerate(s):
+        if c in "([":
+            depth += 1
+        elif c in ")]":
+            depth -= 1
+        elif depth:
+            continue
+        elif c in "{;" or s.startswith("=>", i):
+            return s[:i].rstrip()
+        elif c == ":" and s[:i].rstrip().endswith(")"):
+            return s[:i].rstrip()  # lista de inicialización del constructor
+        elif (
+            c == "="
+            and s[i + 1 : i + 2] != "="
+            and s[i - 1 : i] not in ("=", "!", "<", ">")
+            and "operator" not in s[:i]
+            and not s.startswith("typedef")  # `typedef X = ...` es la firma
+        ):
+            return s[:i].rstrip()
+    return s
+
+
+def _head_names(sig: str) -> List[str]:
+    """Identificadores antes del primer `(`, sin genéricos (el último es el nombre)."""
+    head = sig.split("(", 1)[0]
+    while "<" in head:
+        stripped = re.sub(r"<[^<>]*>", "", head)
+        if stripped == head:
+            break
+        head = stripped
+    return _IDENT_RE.findall(head)
+
+
+def _is_public(sig: str) -> bool:
+    m = _TYPE_DECL_RE.match(sig)
+    if m:
+        return not m.group(1).startswith("_")
+    names = _head_names(sig)
+    return bool(names) and not names[-1].startswith("_")
+
+
+def collapse_to_signatures(text: str) -> str:
+    """Cabecera (comentarios y directivas iniciales) + firmas públicas sin cuerpos.
+
+    Para código generado: deja ver qué API aporta sin sus cientos de líneas.
+    """
+    lines = text.splitlines(keepends=True)
+    depths = line_depths(text)
+    out: List[str] = []
+    i = 0
+    in_block = in_directive = False
+    while i < len(lines):
+        s = lines[i].strip()
+        if in_block:
+            in_block = "*/" not in s
+        elif in_directive:
+            in_directive = not s.endswith(";")
+        elif s.startswith("/*"):
+            in_block = "*/" not in s
+        elif _HEADER_DIRECTIVE_RE.match(s):
+            in_directive = not s.endswith(";")
+        elif s.startswith("///") or (s and not s.startswith("//")):
+            break  # `///` ya documenta la primera declaración
+        out.append(lines[i])
+        i += 1
+    while out and not out[-1].strip():
+        out.pop()
+    if out:
+        out.append("\n")
+
+    cuts = _boundaries(lines, depths, i, len(lines), 0)
+    for lo, hi in zip(cuts, cuts[1:] + [len(lines)]):
+        sig = _signature("".join(lines[lo:hi]))
+        if not sig or sig.startswith("}") or not _is_public(sig):
+            continue
+        if not _TYPE_DECL_RE.match(sig):
+            out.append(f"{sig};\n")
+            continue
+        out.append(f"{sig} {{\n")
+        members = _body_members("".join(lines[lo:hi]))
+        kind = _TYPE_KEYWORD_RE.search(sig)
+        if kind and kind.group(1) == "enum" and members:
+            values = _signature(members.pop(0)).rstrip(",")
+            if values:
+                out.append(f"  {values};\n")
+        for member in members:
+            msig = _signature(member)
+            if msig and _is_public(msig):
+                out.append(f"  {msig};\n")
+        out.append("}\n")
+    return "".join(out)
+
+
+# Como _BRACE_SCAN_RE, pero también corta en `;`
+_MEMBER_SCAN_RE = re.compile(
+    r"""
+    //[^\n]*|/\*.*?\*/
+  | r?'''.*?'''|r?\"\"\".*?\"\"\"|r?'(?:\\.|[^'\\\n])*'|r?"(?:\\.|[^"\\\n])*"
+  | [{};]
+    """,
+    re.DOTALL | re.VERBOSE,
+)
+
+
+def _body_members(code: str) -> List[str]:
+    """Trozos del cuerpo `{...}` de un tipo, uno por miembro (`;` o `}` de
+    cierre a nivel 1). Sirve igual si el cuerpo abre y cierra en la misma línea;
+    en un enum, el primer trozo son los valores."""
+    members: List[str] = []
+    depth = 0
+    start = -1
+    for m in _MEMBER_SCAN_RE.finditer(code):
+        tok = m.group(0)
+        if tok == "{":
+            depth += 1
+            if depth == 1:
+                start = m.end()
+        elif tok == "}":
+            depth -= 1
+            if depth == 0:
+                break
+            if depth == 1:
+                members.append(code[start : m.end()])
+                start = m.end()
+        elif tok == ";" and depth == 1:
+            members.append(code[start : m.end()])
+            start = m.end()
+    if start >= 0 and depth == 0:
+        tail = code[start : m.start()]
+        if _COMMENT_RE.sub("", tail).strip():
+            members.append(tail)
+    return members
+
+
+# Comentarios a quitar y cadenas a respetar (su `//` no es un comentario)
+_COMMENT_SCAN_RE = re.compile(
+    r"""
+    (///[^\n]*|/\*\*.*?\*/)
+  | (//[^\n]*|/\*.*?\*/)
+  | r?'''.*?'''|r?\"\"\".*?\"\"\"|r?'(?:\\.|[^'\\\n])*'|r?"(?:\\.|[^"\\\n])*"
+    """,
+    re.DOTALL | re.VERBOSE,
+)
+
+
+def strip_comments(text: str, keep_docs: bool = True) -> str:
+    """Quita comentarios `//` y `/* */` (con `keep_docs`, no los `///` ni `/** */`).
+
+    Las líneas que solo tenían comentario desaparecen; las demás pierden los
+    espacios finales que dejaba el comentario.
+    """
+
+    def repl(m: "re.Match[str]") -> str:
+        doc, comment = m.group(1), m.group(2)
+        if comment is None and (doc is None or keep_docs):
+            return m.group(0)
+        return "\n" * m.group(0).count("\n")  # conserva la numeración de líneas
+
+    stripped = _COMMENT_SCAN_RE.sub(repl, text)
+    if stripped == text:
+        return text
+    out: List[str] = []
+    for old, new in zip(
+        text.splitlines(keepends=True), stripped.splitlines(keepends=True)
+    ):
+        if old == new:
+            out.append(new)
+        elif new.strip():
+            out.append(new.rstrip() + ("\n" if new.endswith("\n") else ""))
+    return "".join(out)
+
+
+# ---------- Regiones top-level (selección parcial de un archivo) ----------
+
+HEADER_REGION = "<cabecera>"  # comentarios iniciales + library/import/export/part
+_TYPE_KEYWORD_RE = re.compile(r"\b(class|mixin|enum|extension)\b")
+
+
+@dataclass
+class DartRegion:
+    name: str  # nombre del símbolo (`Foo`, `Foo#2` si se repite, HEADER_REGION)
+    # header | class | mixin | enum | extension | typedef | function | variable
+    kind: str
+    start: int  # línea inicial (1-based)
+    end: int  # línea final (inclusive)
+
+
+def _region_name(sig: str) -> Tuple[str, str]:
+    """(tipo, nombre) de una declaración top-level a partir de su firma."""
+    m = _TYPE_DECL_RE.match(sig)
+    if m:
+        kind = _TYPE_KEYWORD_RE.findall(sig[: m.end()])[-1]
+        # `extension on X` no tiene nombre: la firma lo identifica
+        return kind, sig if m.group(1) == "on" else m.group(1)
+    m = _TYPEDEF_RE.match(sig)
+    if m:
+        return "typedef", m.group(1)
+    names = _head_names(sig)
+    if not names:
+        return "variable", sig[:40]
+    is_func = "(" in sig or "get" in names[:-1]
+    return ("function" if is_func else "variable"), names[-1]
+
+
+def top_level_regions(text: str) -> List[DartRegion]:
+    """Parte un .dart en regiones contiguas, una por declaración top-level.
+
+    Las regiones cubren todas las líneas: la primera (si hay) es la cabecera,
+    los comentarios van con la declaración que siguen y lo que sobra al final,
+    con la anterior. Un nombre repetido (getter + setter) lleva `#2`, `#3`…
+    """
+    lines = text.splitlines(keepends=True)
+    if not lines:
+        return []
+    depths = line_depths(text)
+    cuts = _boundaries(lines, depths, 0, len(lines), 0)
+    out: List[DartRegion] = []
+    seen: Dict[str, int] = {}
+    for lo, hi in zip(cuts, cuts[1:] + [len(lines)]):
+        sig = _signature("".join(lines[lo:hi]))
+        if out and (not sig or sig.startswith("}")):
+            out[-1].end = hi  # solo comentarios, o un cierre suelto
+            continue
+        if not sig or (
+            _HEADER_DIRECTIVE_RE.match(sig) and (not out or out[-1].kind == "header")
+        ):
+            kind, name = "header", HEADER_REGION
+            if out:
+                out[-1].end = hi
+                continue
+        else:
+            kind, name = _region_name(sig)
+        seen[name] = seen.get(name, 0) + 1
+        if seen[name] > 1:
+            name = f"{name}#{seen[name]}"
+        out.append(DartRegion(name, kind, lo + 1, hi))
+    return out
+
+
+def select_regions(text: str, names: Iterable[str]) -> str:
+    """Solo las regiones `names`; cada tramo omitido queda como una marca.
+
+    Si ya no existe ninguna (renombradas o borradas), devuelve el archivo
+    entero: mejor de más que un bloque vacío.
+    """
+    wanted = set(names)
+    regions = top_level_regions(text)
+    if not any(r.name in wanted for r in regions):
+        return text
+    lines = text.splitlines(keepends=True)
+    out: List[str] = []
+    skipped: List[DartRegion] = []
+
+    def flush() -> None:
+        if not skipped:
+            return
+        n = sum(r.end - r.start + 1 for r in skipped)
+        shown = [r.name for r in skipped[:3]] + (["…"] if len(skipped) > 3 else [])
+        out.append(f"[… OMITIDO: {n} líneas ({', '.join(shown)})]\n")
+        skipped.clear()
+
+    for r in regions:
+        if r.name not in wanted:
+            skipped.append(r)
+            continue
+        flush()
+        out.extend(lines[r.start - 1 : r.end])
+        if not out[-1].endswith("\n"):
+            out[-1] += "\n"
+    flush()
+    return "".join(out)
+
+
+# ---------- package_config.json ----------
+
+
+@dataclass
+class DartPackage:
+    name: str
+    root: str  # carpeta del paquete (absoluta, normalizada)
+    lib: str  # destino de `package:<name>/` (casi siempre <root>/lib)
+
+
+def package_config_path(project_root: str) -> str:
+    return os.path.join(project_root, ".dart_tool", "package_config.json")
+
+
+def pub_cache_dir() -> str:
+    """Carpeta del pub cache ($PUB_CACHE o la ubicación por defecto del SO)."""
+    env = os.environ.get("PUB_CACHE")
+    if env:
+        return os.path.abspath(env)
+    if sys.platform == "win32":
+        local = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        return os.path.join(local, "Pub", "Cache")
+    return os.path.expanduser("~/.pub-cache")
+
+
+def _uri_path(uri: str, base_dir: str) -> Optional[str]:
+    """`file:` absoluto o URI relativa a `base_dir`; None si es otro esquema."""
+    parsed = urlparse(uri)
+    if parsed.scheme == "file":
+        path = url2pathname(parsed.path)
+    elif not parsed.scheme:
+        path = os.path.join(base_dir, url2pathname(unquote(uri)))
+    else:
+        return None
+    return os.path.normpath(os.path.abspath(path))
+
+
+def read_package_config(project_root: str) -> List[DartPackage]:
+    """Paquetes de .dart_tool/package_config.json (OSError/ValueError si falta
+    o está roto: hace falta `dart pub get`)."""
+    path = package_config_path(project_root)
+    with open(path, "r", encoding="utf-8") as fh:
+        data = json.load(fh)
+    base = os.path.dirname(path)
+    out: List[DartPackage] = []
+    for p in data.get("packages", []):
+        name = str(p.get("name") or "")
+        root = _uri_path(str(p.get("rootUri") or ""), base) if name else None
+        if root is None:
+            continue
+        lib = _uri_path(str(p.get("packageUri") or "lib/"), root) or root
+        out.append(DartPackage(name, root, lib))
+    out.sort(key=lambda p: p.name)
+    return out
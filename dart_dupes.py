@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dart Dupes — código casi duplicado (candidatos a widget/función compartida)
+--------------------------------------------------------------------------
+• Tokeniza cada .dart (sin comentarios ni import/export/part; literales de texto y
+  números normalizados) y arma shingles de K tokens con hash rodante de 64 bits.
+• Firma MinHash de una permutación (OPH: un hash por shingle, mínimo por cubeta,
+  cubetas vacías densificadas por rotación) para el archivo completo y para
+  ventanas solapadas de tokens. Con numpy el cálculo es vectorizado; sin numpy, la
+  misma firma en Python puro (más lento, mismo resultado).
+• LSH por bandas: solo se comparan pares que comparten alguna banda, así que el
+  costo es ~lineal en el número de archivos/ventanas.
+• Ventanas coincidentes consecutivas (misma diagonal) se unen en regiones.
+• Firmas cacheadas por hash de contenido (~/.dart_dump_gui_dupes.json): tras una
+  edición solo se recalcula lo que cambió.
+
+Uso:
+    python dart_dupes.py ruta/al/proyecto/lib -o duplicados.txt
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import re
+import sys
+import zlib
+from array import array
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+)
+
+try:  # opcional: firmas vectorizadas
+    import numpy as np
+except ImportError:  # pragma: no cover - depende del entorno
+    np = None  # type: ignore[assignment]
+
+DUPES_CACHE: str = os.path.expanduser("~/.dart_dump_gui_dupes.json")
+CACHE_VERSION = 1  # subir si cambia tokenizado/firma
+
+SHINGLE = 5  # tokens por shingle
+FILE_BINS = 128  # cubetas de la firma por archivo (16 bandas x 8 filas: ~0.7)
+FILE_BANDS = 16
+WIN_TOKENS = 48  # ventana para regiones
+WIN_STRIDE = 16
+WIN_BINS = 32  # 8 bandas x 4 filas: ~0.6
+WIN_BANDS = 8
+MAX_BUCKET = 64  # cubetas LSH más grandes = boilerplate, se ignoran
+
+_M64 = (1 << 64) - 1
+_BASE = 0x100000001B3  # multiplicador del hash rodante
+_GOLDEN = 0x9E3779B97F4A7C15
+
+_DIRECTIVE_RE = re.compile(
+    r"^[ \t]*(?:import|export|part|library)\b[^;]*;", re.MULTILINE | re.DOTALL
+)
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<ws>\s+)
+  | (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<str>r?'''.*?'''|r?\"\"\".*?\"\"\"|r?'(?:\\.|[^'\\\n])*'|r?"(?:\\.|[^"\\\n])*")
+  | (?P<num>\d[\w.]*)
+  | (?P<id>[A-Za-z_$][\w$]*)
+  | (?P<op>.)
+    """,
+    re.DOTALL | re.VERBOSE,
+)
+
+
+def tokenize(text: str) -> Tuple[List[str], List[int]]:
+    """Tokens normalizados y la línea (1-based) de cada uno."""
+    text = _DIRECTIVE_RE.sub(lambda m: "\n" * m.group(0).count("\n"), text)
+    toks: List[str] = []
+    lines: List[int] = []
+    line, last = 1, 0
+    for m in _TOKEN_RE.finditer(text):
+        kind = m.lastgroup
+        if kind in ("ws", "comment"):
+            continue
+        start = m.start()
+        line += text.count("\n", last, start)
+        last = start
+        tok = m.group(kind)  # type: ignore[arg-type]
+        toks.append("S" if kind == "str" else "0" if kind == "num" else tok)
+        lines.append(line)
+    return toks, lines
+
+
+_tok_hash_cache: Dict[str, int] = {}
+
+
+def _token_hashes(toks: Sequence[str]) -> List[int]:
+    out: List[int] = []
+    cache = _tok_hash_cache
+    for t in toks:
+        h = cache.get(t)
+        if h is None:
+            h = cache[t] = zlib.crc32(t.encode("utf-8")) + 1
+        out.append(h)
+    return out
+
+
+def _mix(z: int) -> int:
+    """Finalizador splitmix64."""
+    z = (z + _GOLDEN) & _M64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _M64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _M64
+    return z ^ (z >> 31)
+
+
+def shingle_hashes(th: Sequence[int], k: int = SHINGLE) -> List[int]:
+    """Hash (mezclado) de cada ventana de k tokens; hash rodante mod 2^64."""
+    n = len(th) - k + 1
+    if n <= 0:
+        return []
+    top = pow(_BASE, k - 1, 1 << 64)
+    h = 0
+    for t in th[:k]:
+        h = (h * _BASE + t) & _M64
+    out = [_mix(h)]
+    for i in range(1, n):
+        h = ((h - th[i - 1] * top) * _BASE + th[i + k - 1]) & _M64
+        out.append(_mix(h))
+    return out
+
+
+def _densify(sig: List[int], empty: int, mask: int) -> List[int]:
+    """Cubetas vacías toman la siguiente llena (circular) + desplazamiento."""
+    n = len(sig)
+    if all(v == empty for v in sig):
+        return sig
+    out = list(sig)
+    for i in range(n):
+        if sig[i] != empty:
+            continue
+        d = 1
+        while sig[(i + d) % n] == empty:
+            d += 1
+        out[i] = (sig[(i + d) % n] + d * 0x9E3779B1) & mask
+    return out
+
+
+def oph_signature(hashes: Sequence[int], bins: int, bits: int = 32) -> List[int]:
+    """MinHash de una permutación: bits altos = cubeta, bits bajos = valor."""
+    shift = 64 - (bins.bit_length() - 1)
+    mask = (1 << bits) - 1
+    empty = mask + 1
+    sig = [empty] * bins
+    for h in hashes:
+        b = h >> shift
+        v = h & mask
+        if v < sig[b]:
+            sig[b] = v
+    return _densify(sig, empty, mask)
+
+
+def _np_shingles(th: Sequence[int], k: int) -> Any:
+    t = np.asarray(th, dtype=np.uint64)
+    n = len(t) - k + 1
+    h = np.zeros(n, dtype=np.uint64)
+    base = np.uint64(_BASE)
+    for j in range(k):
+        h = h * base + t[j : j + n]
+    z = h + np.uint64(_GOLDEN)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def _np_signatures(
+    sh: Any, starts: Sequence[int], length: int, bins: int, bits: int
+) -> List[List[int]]:
+    """Firmas OPH de varias ventanas [s, s+length) de `sh` en una sola pasada."""
+    shift = np.uint64(64 - (bins.bit_length() - 1))
+    mask = (1 << bits) - 1
+    empty = mask + 1
+    idx = np.asarray(starts, dtype=np.int64)[:, None] + np.arange(length)
+    win = sh[np.minimum(idx, len(sh) - 1)]
+    valid = idx < len(sh)
+    keys = np.arange(len(starts), dtype=np.int64)[:, None] * bins + (
+        win >> shift
+    ).astype(np.int64)
+    vals = (win & np.uint64(mask)).astype(np.int64)
+    flat = np.full(len(starts) * bins, empty, dtype=np.int64)
+    np.minimum.at(flat, keys[valid], vals[valid])
+    return [_densify(row, empty, mask) for row in flat.reshape(-1, bins).tolist()]
+
+
+@dataclass
+class FileSignature:
+    """Firma del archivo y de sus ventanas (línea inicial, línea final, firma)."""
+
+    tokens: int
+    sig: List[int]
+    windows: List[Tuple[int, int, List[int]]] = field(default_factory=list)
+
+
+def _window_starts(n_shingles: int) -> List[int]:
+    span = WIN_TOKENS - SHINGLE + 1
+    if n_shingles < span:
+        return []
+    starts = list(range(0, n_shingles - span + 1, WIN_STRIDE))
+    if starts[-1] != n_shingles - span:
+        starts.append(n_shingles - span)
+    return starts
+
+
+def signature(text: str) -> Optional[FileSignature]:
+    """Firma de un archivo; None si es demasiado corto para compararlo."""
+    toks, lines = tokenize(text)
+    th = _token_hashes(toks)
+    if len(th) < SHINGLE:
+        return None
+    span = WIN_TOKENS - SHINGLE + 1
+    starts = _window_starts(len(th) - SHINGLE + 1)
+    if np is not None:
+        sh = _np_shingles(th, SHINGLE)
+        sig = _np_signatures(sh, [0], len(sh), FILE_BINS, 32)[0]
+        wsigs = _np_signatures(sh, starts, span, WIN_BINS, 16) if starts else []
+    else:
+        shl = shingle_hashes(th, SHINGLE)
+        sig = oph_signature(shl, FILE_BINS, 32)
+        wsigs = [oph_signature(shl[s : s + span], WIN_BINS, 16) for s in starts]
+    windows = [(lines[s], lines[s + WIN_TOKENS - 1], w) for s, w in zip(starts, wsigs)]
+    return FileSignature(len(toks), sig, windows)
+
+
+# ---------- Caché por hash de contenido ----------
+
+
+def _pack(values: List[int], code: str) -> str:
+    return base64.b64encode(array(code, values).tobytes()).decode("ascii")
+
+
+def _unpack(blob: str, code: str) -> List[int]:
+    arr = array(code)
+    arr.frombytes(base64.b64decode(blob))
+    return arr.tolist()
+
+
+class SignatureCache:
+    """sha1 del contenido -> firma empaquetada; se guarda solo si cambió algo."""
+
+    def __init__(self, path: str = DUPES_CACHE) -> None:
+        self.path = path
+        self._data: Dict[str, Any] = {}
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+            if data.get("version") == CACHE_VERSION:
+                self._data = data.get("files", {})
+        except (OSError, ValueError):
+            pass
+        self._dirty = False
+        self.computed = 0
+
+    def get(self, content: bytes) -> Optional[FileSignature]:
+        key = hashlib.sha1(content).hexdigest()
+        hit = self._data.get(key)
+        if hit is not None:
+            if not hit:
+                return None  # demasiado corto
+            return FileSignature(
+                hit["n"],
+                _unpack(hit["sig"], "I"),
+                [(a, b, _unpack(w, "H")) for a, b, w in hit["win"]],
+            )
+        fs = signature(content.decode("utf-8", errors="replace"))
+        self.computed += 1
+        self._dirty = True
+        self._data[key] = (
+            {
+                "n": fs.tokens,
+                "sig": _pack(fs.sig, "I"),
+                "win": [[a, b, _pack(w, "H")] for a, b, w in fs.windows],
+            }
+            if fs is not None
+            else {}
+        )
+        return fs
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        try:
+            with open(self.path, "w", encoding="utf-8") as fh:
+                json.dump({"version": CACHE_VERSION, "files": self._data}, fh)
+        except OSError:
+            pass
+        self._dirty = False
+
+
+# ---------- LSH + reporte ----------
+
+
+def _lsh_pairs(sigs: List[List[int]], bands: int) -> Iterable[Tuple[int, int]]:
+    """Pares (i<j) que comparten al menos una banda completa."""
+    if not sigs:
+        return []
+    rows = len(sigs[0]) // bands
+    seen: set = set()
+    for b in range(bands):
+        buckets: Dict[Tuple[int, ...], List[int]] = {}
+        lo = b * rows
+        for i, s in enumerate(sigs):
+            buckets.setdefault(tuple(s[lo : lo + rows]), []).append(i)
+        for members in buckets.values():
+            if len(members) < 2 or len(members) > MAX_BUCKET:
+                continue
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    seen.add((members[x], members[y]))
+    return sorted(seen)
+
+
+def similarity(a: List[int], b: List[int]) -> float:
+    """Jaccard estimado: fracción de cubetas iguales."""
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+@dataclass
+class DupReport:
+    files: List[Tuple[float, str, str]]  # (similitud, a, b)
+    regions: List[Tuple[str, int, int, str, int, int]]  # a líneas, b líneas
+
+
+def find_duplicates(
+    paths: List[str],
+    read: Callable[[str], bytes],
+    cache: Optional[SignatureCache] = None,
+    file_threshold: float = 0.7,
+    window_threshold: float = 0.6,
+    min_lines: int = 8,
+) -> DupReport:
+    cache = cache if cache is not None else SignatureCache()
+    names: List[str] = []
+    sigs: List[FileSignature] = []
+    for p in paths:
+        try:
+            fs = cache.get(read(p))
+        except OSError:
+            continue
+        if fs is not None:
+            names.append(p)
+            sigs.append(fs)
+
+    files = [
+        (sim, names[i], names[j])
+        for i, j in _lsh_pairs([s.sig for s in sigs], FILE_BANDS)
+        for sim in (similarity(sigs[i].sig, sigs[j].sig),)
+        if sim >= file_threshold
+    ]
+    files.sort(key=lambda t: (-t[0], t[1], t[2]))
+
+    # Ventanas de todos los archivos en una sola tabla LSH
+    owner: List[Tuple[int, int]] = []  # (archivo, nº de ventana)
+    wsigs: List[List[int]] = []
+    for fi, fs in enumerate(sigs):
+        for wi, (_, _, w) in enumerate(fs.windows):
+            owner.append((fi, wi))
+            wsigs.append(w)
+    hits: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+    for x, y in _lsh_pairs(wsigs, WIN_BANDS):
+        (fa, wa), (fb, wb) = owner[x], owner[y]
+        if fa == fb and abs(wa - wb) * WIN_STRIDE < WIN_TOKENS:
+            continue  # solapada consigo misma
+        if similarity(wsigs[x], wsigs[y]) >= window_threshold:
+            hits.setdefault((fa, fb), []).append((wa, wb))
+
+    regions: List[Tuple[str, int, int, str, int, int]] = []
+
+    def flush(fa: int, fb: int, run: List[Tuple[int, int]]) -> None:
+        wa_, wb_ = sigs[fa].windows, sigs[fb].windows
+        a0 = min(wa_[a][0] for a, _ in run)
+        a1 = max(wa_[a][1] for a, _ in run)
+        b0 = min(wb_[b][0] for _, b in run)
+        b1 = max(wb_[b][1] for _, b in run)
+        if a1 - a0 + 1 >= min_lines:
+            regions.append((names[fa], a0, a1, names[fb], b0, b1))
+
+    for (fa, fb), pairs in hits.items():
+        # Misma diagonal (wb - wa) y ventanas contiguas => una sola región
+        pairs.sort(key=lambda p: (p[1] - p[0], p[0]))
+        run = [pairs[0]]
+        for wa, wb in pairs[1:]:
+            pa, pb = run[-1]
+            if wa <= pa + 2 and abs((wb - wa) - (pb - pa)) <= 2:
+                run.append((wa, wb))
+            else:
+                flush(fa, fb, run)
+                run = [(wa, wb)]
+        flush(fa, fb, run)
+    regions.sort(key=lambda r: (-(r[2] - r[1]), r[0], r[1]))
+    cache.save()
+    return DupReport(files, regions)
+
+
+def write_report(
+    fh: TextIO, report: DupReport, base: str, max_regions: int = 200
+) -> None:
+    def rel(p: str) -> str:
+        return os.path.relpath(p, base).replace(os.sep, "/")
+
+    fh.write("ARCHIVOS CASI DUPLICADOS (similitud estimada)\n")
+    fh.write("=" * 60 + "\n")
+    for sim, a, b in report.files:
+        fh.write(f"{sim:5.0%}  {rel(a)}  <->  {rel(b)}\n")
+    if not report.files:
+        fh.write("(ninguno)\n")
+    fh.write("\nREGIONES DUPLICADAS (más largas primero)\n")
+    fh.write("=" * 60 + "\n")
+    for a, a0, a1, b, b0, b1 in report.regions[:max_regions]:
+        fh.write(
+            f"{a1 - a0 + 1:4d} líneas  {rel(a)}:{a0}-{a1}  <->  {rel(b)}:{b0}-{b1}\n"
+        )
+    if not report.regions:
+        fh.write("(ninguna)\n")
+    elif len(report.regions) > max_regions:
+        fh.write(f"… y {len(report.regions) - max_regions} más\n")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Código Dart casi duplicado (MinHash LSH)")
+    ap.add_argument("root", help="carpeta a analizar (p. ej. lib)")
+    ap.add_argument("-o", "--out", help="reporte (por defecto, stdout)")
+    ap.add_argument("--umbral", type=float, default=0.7, help="similitud de archivos")
+    args = ap.parse_args(argv)
+
+    paths: List[str] = []
+    for dirpath, dirnames, filenames in os.walk(args.root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        paths.extend(
+            os.path.join(dirpath, f) for f in sorted(filenames) if f.endswith(".dart")
+        )
+
+    def read(p: str) -> bytes:
+        with open(p, "rb") as fh:
+            return fh.read()
+
+    report = find_duplicates(paths, read, file_threshold=args.umbral)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            write_report(fh, report, args.root)
+    else:
+        write_report(sys.stdout, report, args.root)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
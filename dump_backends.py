@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dump Backends — de dónde salen las carpetas y archivos al escanear y generar
+--------------------------------------------------------------------------
+• WorkTreeSource: el árbol de trabajo (scandir / open), lo de siempre.
+• GitRevSource: un commit/tag/rama de un repo local, sin checkout:
+    - Una sola llamada `git ls-tree -r -t -z --long` arma el índice de carpetas,
+      blobs y tamaños (no hay stat por archivo).
+    - Los blobs se leen por un único `git cat-file --batch` de vida larga.
+    - Las rutas siguen siendo absolutas bajo la raíz del proyecto, así que el árbol
+      de la GUI, los perfiles y el render no cambian. Lo que queda fuera del repo
+      (p. ej. un EXTRA externo) se lee del disco.
+
+Ambos exponen la misma interfaz: list_dir, isdir, isfile, stat, cache_key, open.
+
+• git_changed_files: lo cambiado según `git status` o `<base>...HEAD`.
+• resolve_commit: el commit al que apunta hoy una rama/tag/expresión.
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import subprocess
+import threading
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+
+class GitError(Exception):
+    """Fallo al consultar el repositorio (revisión inexistente, no es repo, etc.)."""
+
+
+class WorkTreeSource:
+    """Archivos del disco."""
+
+    label = ""  # vacío = árbol de trabajo
+
+    def list_dir(self, path: str) -> Tuple[List[str], List[str]]:
+        """(archivos, carpetas) de `path` con una sola llamada a scandir."""
+        files: List[str] = []
+        dirs: List[str] = []
+        try:
+            with os.scandir(path) as it:
+                for e in it:
+                    try:
+                        if e.is_file():
+                            files.append(e.name)
+                        elif e.is_dir():
+                            dirs.append(e.name)
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return files, dirs
+
+    def isdir(self, path: str) -> bool:
+        return os.path.isdir(path)
+
+    def isfile(self, path: str) -> bool:
+        return os.path.isfile(path)
+
+    def stat(self, path: str) -> Tuple[Optional[float], int]:
+        """(mtime, tamaño); OSError si no existe."""
+        st = os.stat(path)
+        return st.st_mtime, st.st_size
+
+    def cache_key(self, path: str) -> Tuple[str, float, int]:
+        """Clave estable del contenido para cachés (ruta, mtime, tamaño)."""
+        st = os.stat(path)
+        return os.path.normcase(path), st.st_mtime, st.st_size
+
+    def open(self, path: str) -> BinaryIO:
+        return open(path, "rb")
+
+    def close(self) -> None:
+        pass
+
+
+def _git(cwd: str, *args: str) -> str:
+    try:
+        proc = subprocess.run(
+            ["git", "-C", cwd, *args],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=False,
+        )
+    except OSError as e:
+        raise GitError(f"No se pudo ejecutar git: {e}") from e
+    if proc.returncode != 0:
+        msg = proc.stderr.decode("utf-8", errors="replace").strip()
+        raise GitError(msg or f"git {' '.join(args)} falló ({proc.returncode})")
+    return proc.stdout.decode("utf-8", errors="surrogateescape")
+
+
+def resolve_commit(project_root: str, rev: str) -> str:
+    """Id del commit de `rev` (una rama o HEAD se mueven: el texto no basta)."""
+    return _git(
+        os.path.abspath(project_root),
+        "rev-parse",
+        "--verify",
+        "--quiet",
+        f"{rev}^{{commit}}",
+    ).strip()
+
+
+class GitRevSource:
+    """Árbol de `rev` dentro del repo que contiene `project_root`."""
+
+    def __init__(self, project_root: str, rev: str) -> None:
+        self.root = os.path.abspath(project_root)
+        self.rev = rev
+        self.label = rev
+        self.toplevel = _git(self.root, "rev-parse", "--show-toplevel").strip()
+        prefix = _git(self.root, "rev-parse", "--show-prefix").strip()
+        self.commit = resolve_commit(self.root, rev)
+
+        self._dirs: Dict[str, Tuple[List[str], List[str]]] = {"": ([], [])}
+        self._blobs: Dict[str, Tuple[str, int]] = {}  # rel -> (oid, tamaño)
+        args = ["ls-tree", "-r", "-t", "-z", "--long", self.commit]
+        if prefix:
+            args += ["--", prefix]
+        for rec in _git(self.toplevel, *args).split("\0"):
+            if not rec:
+                continue
+            meta, path = rec.split("\t", 1)
+            _, otype, oid, size = meta.split()
+            if not path.startswith(prefix):
+                continue
+            rel = path[len(prefix) :]
+            parent, _, name = rel.rpartition("/")
+            if otype == "tree":
+                self._dirs.setdefault(rel, ([], []))
+                self._dirs.setdefault(parent, ([], []))[1].append(name)
+            elif otype == "blob":
+                self._blobs[rel] = (oid, int(size))
+                self._dirs.setdefault(parent, ([], []))[0].append(name)
+            # "commit" = submódulo: se ignora
+
+        self._work = WorkTreeSource()
+        self._lock = threading.Lock()
+        self._batch: Optional[subprocess.Popen] = None
+
+    def _rel(self, path: str) -> Optional[str]:
+        """Ruta relativa al proyecto con "/" (None si queda fuera)."""
+        rel = os.path.relpath(os.path.abspath(path), self.root)
+        if rel == os.curdir:
+            return ""
+        if rel.startswith(os.pardir):
+            return None
+        return rel.replace(os.sep, "/")
+
+    def list_dir(self, path: str) -> Tuple[List[str], List[str]]:
+        rel = self._rel(path)
+        if rel is None:
+            return self._work.list_dir(path)
+        files, dirs = self._dirs.get(rel, ([], []))
+        return list(files), list(dirs)
+
+    def isdir(self, path: str) -> bool:
+        rel = self._rel(path)
+        return self._work.isdir(path) if rel is None else rel in self._dirs
+
+    def isfile(self, path: str) -> bool:
+        rel = self._rel(path)
+        return self._work.isfile(path) if rel is None else rel in self._blobs
+
+    def _blob(self, path: str) -> Tuple[str, int]:
+        rel = self._rel(path)
+        hit = self._blobs.get(rel) if rel is not None else None
+        if hit is None:
+            raise FileNotFoundError(f"No existe en {self.rev}: {path}")
+        return hit
+
+    def stat(self, path: str) -> Tuple[Optional[float], int]:
+        if self._rel(path) is None:
+            return self._work.stat(path)
+        return None, self._blob(path)[1]
+
+    def cache_key(self, path: str) -> Tuple[str, float, int]:
+        if self._rel(path) is None:
+            return self._work.cache_key(path)
+        oid, size = self._blob(path)
+        return f"git:{oid}", 0.0, size  # el oid ya identifica el contenido
+
+    def open(self, path: str) -> BinaryIO:
+        if self._rel(path) is None:
+            return self._work.open(path)
+        return io.BytesIO(self.read_blob(self._blob(path)[0]))
+
+    def read_blob(self, oid: str) -> bytes:
+        """Lee un objeto por el pipe `cat-file --batch` (se abre una sola vez)."""
+        with self._lock:
+            if self._batch is None:
+                self._batch = subprocess.Popen(
+                    ["git", "-C", self.toplevel, "cat-file", "--batch"],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                )
+            proc = self._batch
+            assert proc.stdin is not None and proc.stdout is not None
+            proc.stdin.write(oid.encode("ascii") + b"\n")
+            proc.stdin.flush()
+            header = proc.stdout.readline().split()
+            if len(header) != 3:
+                raise OSError(f"git cat-file: objeto no encontrado: {oid}")
+            data = proc.stdout.read(int(header[2]))
+            proc.stdout.read(1)  # "\n" final
+            return data
+
+    def close(self) -> None:
+        with self._lock:
+            if self._batch is not None:
+                try:
+                    if self._batch.stdin:
+                        self._batch.stdin.close()
+                    self._batch.wait(timeout=5)
+                except Exception:
+                    self._batch.kill()
+                self._batch = None
+
+
+def git_changed_files(project_root: str, base: str = "") -> List[str]:
+    """Rutas absolutas de lo cambiado bajo `project_root` (una llamada a git).
+
+    Sin `base`: `git status` (preparado, sin preparar y no rastreado).
+    Con `base`: `git diff --name-only <base>...HEAD` (lo hecho en la rama).
+    Los borrados se omiten: no hay nada que volcar.
+    """
+    root = os.path.abspath(project_root)
+    toplevel = _git(root, "rev-parse", "--show-toplevel").strip()
+    paths: List[str] = []
+    if base:
+        out = _git(
+            root, "diff", "--name-only", "-z", "--diff-filter=d", f"{base}...HEAD"
+        )
+        paths = [p for p in out.split("\0") if p]
+    else:
+        out = _git(root, "status", "--porcelain=v1", "-z", "--untracked-files=all")
+        recs = iter(out.split("\0"))
+        for rec in recs:
+            if len(rec) < 4:
+                continue
+            code, path = rec[:2], rec[3:]
+            if "R" in code or "C" in code:
+                next(recs, None)  # ruta de origen del renombrado/copia
+            if "D" in code:
+                continue
+            paths.append(path)
+    result: List[str] = []
+    for p in paths:
+        full = os.path.normpath(os.path.join(toplevel, p))
+        if not os.path.relpath(full, root).startswith(os.pardir):
+            result.append(full)
+    return result
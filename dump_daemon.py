@@ -0,0 +1,586 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dump Daemon — índice caliente en memoria que sirve dumps al instante (opcional)
+------------------------------------------------------------------------------
+• Mantiene en memoria los listados de carpetas, el contenido de los archivos (LRU
+  con tope de bytes) y los perfiles; un hilo vigila el disco (stat periódico de lo
+  cacheado, por turnos de tamaño fijo) y descarta lo que cambió, así cada petición
+  no hace ni un scandir ni un open si nada cambió.
+• Protocolo: una línea JSON por petición y una por respuesta, por socket Unix
+  (POSIX) o por TCP en 127.0.0.1 (--port; útil en Windows).
+    {"cmd": "render", "profile": "core"}
+    {"cmd": "render", "paths": ["lib/main.dart", "lib/core"]}
+    {"cmd": "render", "op": "difference", "profiles": ["feature", "core"]}
+    {"cmd": "combine", "op": "intersection", "profiles": ["a", "b"], "save": "a&b"}
+    {"cmd": "profiles"} / {"cmd": "stats"} / {"cmd": "ping"} / {"cmd": "stop"}
+  La respuesta trae {"ok": true, "text": ..., "files": N, "ms": ...} o
+  {"ok": false, "error": "..."}.
+• El daemon no escribe dumps ni acepta rutas de proyecto del cliente: devuelve el
+  texto y es el cliente quien lo guarda (-o); "paths" usa el proyecto y las
+  opciones de las preferencias guardadas.
+• Seguridad: el socket Unix se crea ya 0600 (umask al hacer bind) y no se pisa el
+  de un daemon que sigue vivo. Por TCP cada petición lleva "token" (se
+  genera al arrancar en ~/.dart_dump_gui_daemon.token, 0600) y la primera línea
+  que no es JSON cierra la conexión: una página web que haga POST al puerto no
+  llega a ejecutar nada.
+• "op" + "profiles": unión, intersección, diferencia (el primero menos el resto)
+  o diferencia simétrica de perfiles, como bitsets (dump_selection.py);
+  "combine" devuelve la lista de archivos y con "save" la guarda como perfil.
+  Sin daemon escuchando, el cliente hace el "combine" en su propio proceso.
+
+Uso:
+    python dump_daemon.py serve                     # ~/.dart_dump_gui.sock
+    python dump_daemon.py serve --port 47321
+    python dump_daemon.py render --profile core > core.txt
+    python dump_daemon.py render lib/main.dart lib/core -o parcial.txt   # proyecto de las prefs
+    python dump_daemon.py render --profile core -o core.txt -o core.txt.gz
+    python dump_daemon.py render --op difference --profile feature --profile core
+    python dump_daemon.py combine intersection a b --save a_y_b   # con o sin daemon
+    python dump_daemon.py stop
+"""
+
+from __future__ import annotations
+
+import argparse
+import hmac
+import io
+import json
+import os
+import secrets
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+from dump_backends import WorkTreeSource
+from dump_dart_sources import (
+    PREFS_STORE,
+    PROFILE_STORE,
+    DumpRenderer,
+    _load_profile_store,
+    _save_profile_store,
+    combined_payload,
+    profile_file_index,
+    profile_render_job,
+)
+from dump_selection import OPERATIONS, FileIndex
+from dump_sinks import open_sinks, text_writer
+
+DEFAULT_SOCKET: str = os.path.expanduser("~/.dart_dump_gui.sock")
+TOKEN_FILE: str = os.path.expanduser("~/.dart_dump_gui_daemon.token")
+DEFAULT_PORT = 47321
+WATCH_INTERVAL = 1.0  # segundos entre pasadas del vigilante
+WATCH_BATCH = 4000  # stat por pasada: con más entradas se revisan por turnos
+CONTENT_CACHE_BYTES = 256 << 20  # contenido en memoria; se expulsa lo menos usado
+
+
+def _write_token(path: str = TOKEN_FILE) -> str:
+    """Token nuevo en un archivo solo legible por el usuario."""
+    token = secrets.token_hex(16)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with open(fd, "w", encoding="utf-8") as fh:
+        fh.write(token)
+    os.chmod(path, 0o600)  # si ya existía con otros permisos
+    return token
+
+
+def _read_token(path: str = TOKEN_FILE) -> str:
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            return fh.read().strip()
+    except OSError:
+        return ""
+
+
+def _read_json(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+class CachedSource(WorkTreeSource):
+    """Árbol de trabajo con listados, stat y contenido en memoria.
+
+    `watch()` (en un hilo) compara el stat de las carpetas/archivos cacheados con
+    el guardado y descarta lo que cambió: una carpeta cambia de mtime al crear,
+    borrar o renombrar entradas, un archivo al editarse. Cada pasada revisa como
+    mucho `batch` entradas, siguiendo por donde quedó la anterior.
+
+    El contenido es un LRU con tope de bytes (`max_bytes`).
+    """
+
+    def __init__(
+        self, max_bytes: int = CONTENT_CACHE_BYTES, batch: int = WATCH_BATCH
+    ) -> None:
+        self._lock = threading.Lock()
+        # carpeta -> ((mtime, tamaño), (archivos, carpetas))
+        self._dirs: Dict[str, Tuple[Any, Tuple[List[str], List[str]]]] = {}
+        self._stats: Dict[str, Tuple[float, int]] = {}
+        self._content: "OrderedDict[str, bytes]" = OrderedDict()
+        self._content_bytes = 0
+        self.max_bytes = max_bytes
+        self.batch = batch
+        self._cursor = 0  # por dónde sigue el vigilante
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _stamp(path: str) -> Optional[Tuple[float, int]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime, st.st_size
+
+    def list_dir(self, path: str) -> Tuple[List[str], List[str]]:
+        with self._lock:
+            hit = self._dirs.get(path)
+        if hit is not None:
+            self.hits += 1
+            files, dirs = hit[1]
+            return list(files), list(dirs)
+        self.misses += 1
+        stamp = self._stamp(path)
+        listing = super().list_dir(path)
+        if stamp is not None:
+            with self._lock:
+                self._dirs[path] = (stamp, listing)
+        return list(listing[0]), list(listing[1])
+
+    def isdir(self, path: str) -> bool:
+        with self._lock:
+            if path in self._dirs:
+                return True
+        return super().isdir(path)
+
+    def _file_stamp(self, path: str) -> Tuple[float, int]:
+        with self._lock:
+            stamp = self._stats.get(path)
+        if stamp is None:
+            stamp = self._stamp(path)
+            if stamp is None:
+                raise FileNotFoundError(path)
+            with self._lock:
+                self._stats[path] = stamp
+        return stamp
+
+    def isfile(self, path: str) -> bool:
+        with self._lock:
+            if path in self._stats:
+                return True
+        return super().isfile(path)
+
+    def stat(self, path: str) -> Tuple[Optional[float], int]:
+        return self._file_stamp(path)
+
+    def cache_key(self, path: str) -> Tuple[str, float, int]:
+        mtime, size = self._file_stamp(path)
+        return os.path.normcase(path), mtime, size
+
+    def _drop_content(self, path: str) -> None:
+        data = self._content.pop(path, None)
+        if data is not None:
+            self._content_bytes -= len(data)
+
+    def open(self, path: str) -> BinaryIO:
+        with self._lock:
+            data = self._content.get(path)
+            if data is not None:
+                self._content.move_to_end(path)
+        if data is None:
+            self.misses += 1
+            with open(path, "rb") as fh:
+                data = fh.read()
+            if len(data) <= self.max_bytes:
+                with self._lock:
+                    self._drop_content(path)
+                    self._content[path] = data
+                    self._content_bytes += len(data)
+                    while self._content_bytes > self.max_bytes:
+                        old = next(iter(self._content))
+                        self._drop_content(old)
+        else:
+            self.hits += 1
+        return io.BytesIO(data)
+
+    def sweep(self) -> int:
+        """Una pasada del vigilante (hasta `batch` stat); devuelve cuántas
+        entradas descartó."""
+        with self._lock:
+            n_dirs = len(self._dirs)
+            total = n_dirs + len(self._stats)
+            start = self._cursor if self._cursor < total else 0
+            end = min(total, start + self.batch)
+            self._cursor = end
+            # carpetas primero y luego archivos, en orden de inserción
+            dirs = [
+                (p, v[0])
+                for p, v in islice(self._dirs.items(), start, min(end, n_dirs))
+            ]
+            files = list(
+                islice(
+                    self._stats.items(), max(0, start - n_dirs), max(0, end - n_dirs)
+                )
+            )
+        stale_dirs = [p for p, stamp in dirs if self._stamp(p) != stamp]
+        stale_files = [p for p, stamp in files if self._stamp(p) != stamp]
+        with self._lock:
+            for p in stale_dirs:
+                self._dirs.pop(p, None)
+            for p in stale_files:
+                self._stats.pop(p, None)
+                self._drop_content(p)
+        n = len(stale_dirs) + len(stale_files)
+        self.evictions += n
+        return n
+
+    def watch(self, stop: threading.Event, interval: float = WATCH_INTERVAL) -> None:
+        while not stop.wait(interval):
+            self.sweep()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "dirs": len(self._dirs),
+                "files": len(self._stats),
+                "cached_files": len(self._content),
+                "bytes": self._content_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class DumpService:
+    """Estado del daemon: fuente cacheada, perfiles y un render a la vez."""
+
+    def __init__(self) -> None:
+        self.source = CachedSource()
+        self.stop_event = threading.Event()
+        self._render_lock = threading.Lock()
+        self._profiles: Dict[str, Any] = {}
+        self._profiles_mtime: Optional[float] = None
+        self.renders = 0
+
+    def profiles(self) -> Dict[str, Any]:
+        """Perfiles guardados; se recargan solo si el archivo cambió."""
+        try:
+            mtime: Optional[float] = os.stat(PROFILE_STORE).st_mtime
+        except OSError:
+            mtime = None
+        if mtime != self._profiles_mtime:
+            self._profiles = _read_json(PROFILE_STORE)
+            self._profiles_mtime = mtime
+        return self._profiles
+
+    def _named(self, name: str) -> Dict[str, Any]:
+        payload = self.profiles().get(name)
+        if payload is None:
+            raise ValueError(f"No existe el perfil {name!r}")
+        return dict(payload)
+
+    def _combined(self, req: Dict[str, Any]) -> Tuple[Dict[str, Any], FileIndex, int]:
+        """Perfil resultado de operar los perfiles de la petición."""
+        names = [str(n) for n in req.get("profiles") or []]
+        if not names:
+            raise ValueError("Falta 'profiles'")
+        payloads = [self._named(n) for n in names]
+        index = profile_file_index(payloads[0], self.source)
+        payload, bits = combined_payload(str(req.get("op") or "union"), payloads, index)
+        return payload, index, bits
+
+    def _payload(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        if req.get("profiles"):
+            return self._combined(req)[0]
+        if req.get("profile"):
+            return self._named(str(req["profile"]))
+        paths = [str(p) for p in req.get("paths") or []]
+        if not paths:
+            raise ValueError("Falta 'profile' o 'paths'")
+        # proyecto y opciones, siempre de las preferencias: nunca rutas del cliente
+        prefs = _read_json(PREFS_STORE)
+        return {
+            "project_root": prefs.get("project_root", "."),
+            "options": prefs,
+            "selection_rules": [
+                {"path": p.replace("\\", "/").strip("/"), "include": True}
+                for p in paths
+            ],
+            "extras_groups": [],
+        }
+
+    def render(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        payload = self._payload(req)
+        if req.get("mode"):
+            payload.setdefault("options", {})
+            payload["options"] = {**payload["options"], "output_mode": req["mode"]}
+        if req.get("out"):
+            raise ValueError("El daemon no escribe archivos: guarda 'text' (o usa -o)")
+        with self._render_lock:
+            opts, job = profile_render_job(payload, "", self.source)
+            renderer = DumpRenderer(opts, source=self.source)
+            buf = io.StringIO()
+            renderer.render_to(buf, job)
+            self.renders += 1
+        return {
+            "ok": True,
+            "text": buf.getvalue(),
+            "files": renderer.done,
+            "ms": round((time.perf_counter() - t0) * 1000, 1),
+        }
+
+    def combine(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        payload, index, bits = self._combined(req)
+        resp: Dict[str, Any] = {
+            "ok": True,
+            "count": FileIndex.count(bits),
+            "total": len(index),
+            "files": index.paths_of(bits),
+            "ms": round((time.perf_counter() - t0) * 1000, 1),
+        }
+        if req.get("save"):
+            name = str(req["save"])
+            store = _load_profile_store()
+            store[name] = payload
+            _save_profile_store(store)  # atómico, como los guardados de la GUI
+            resp["saved"] = name
+        return resp
+
+    def handle(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        cmd = req.get("cmd")
+        if cmd == "ping":
+            return {"ok": True}
+        if cmd == "render":
+            return self.render(req)
+        if cmd == "combine":
+            return self.combine(req)
+        if cmd == "profiles":
+            return {"ok": True, "profiles": sorted(self.profiles())}
+        if cmd == "stats":
+            return {"ok": True, "renders": self.renders, **self.source.stats()}
+        if cmd == "stop":
+            self.stop_event.set()
+            return {"ok": True}
+        return {"ok": False, "error": f"Comando desconocido: {cmd!r}"}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def _reply(self, resp: Dict[str, Any]) -> None:
+        self.wfile.write(json.dumps(resp, ensure_ascii=False).encode("utf-8"))
+        self.wfile.write(b"\n")
+        self.wfile.flush()
+
+    def handle(self) -> None:
+        service: DumpService = self.server.service  # type: ignore[attr-defined]
+        token: str = self.server.token  # type: ignore[attr-defined]
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                req = json.loads(line)
+            except ValueError:
+                return  # no es el protocolo (p. ej. HTTP): se corta sin leer más
+            if not isinstance(req, dict):
+                return
+            if token and not hmac.compare_digest(str(req.get("token", "")), token):
+                self._reply({"ok": False, "error": "Token inválido"})
+                return
+            try:
+                resp = service.handle(req)
+            except Exception as e:
+                resp = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            self._reply(resp)
+            if service.stop_event.is_set():
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def _clear_stale_socket(path: str) -> None:
+    """Borra el socket de un daemon que murió; si alguien responde, no lo toca."""
+    try:
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            return  # no es un socket: que falle el bind, no se borra nada
+    except FileNotFoundError:
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:
+        os.remove(path)  # nadie escucha
+        return
+    finally:
+        probe.close()
+    raise OSError(f"Ya hay un daemon escuchando en {path}")
+
+
+def serve(socket_path: str = "", port: int = 0) -> None:
+    service = DumpService()
+    token = ""
+    if port:
+        server: Any = _TCPServer(("127.0.0.1", port), _Handler)
+        token = _write_token()
+        where = f"127.0.0.1:{port} (token en {TOKEN_FILE})"
+    else:
+        _clear_stale_socket(socket_path)
+        old_umask = os.umask(0o177)  # 0600 desde que existe, sin ventana abierta
+        try:
+            server = _UnixServer(socket_path, _Handler)
+        finally:
+            os.umask(old_umask)
+        where = socket_path
+    server.service = service
+    server.token = token
+    watcher = threading.Thread(
+        target=service.source.watch, args=(service.stop_event,), daemon=True
+    )
+    watcher.start()
+    sys.stderr.write(f"dump_daemon escuchando en {where}\n")
+    try:
+        server.serve_forever()
+    finally:
+        service.stop_event.set()
+        server.server_close()
+        if not port and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def request(
+    req: Dict[str, Any], socket_path: str = "", port: int = 0, timeout: float = 60
+) -> Dict[str, Any]:
+    """Envía una petición al daemon y devuelve la respuesta."""
+    if port:
+        req = {**req, "token": _read_token()}
+        sock = socket.create_connection(("127.0.0.1", port), timeout=timeout)
+    else:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+    with sock, sock.makefile("rwb") as fh:
+        fh.write(json.dumps(req).encode("utf-8") + b"\n")
+        fh.flush()
+        line = fh.readline()
+    if not line:
+        raise ConnectionError("El daemon cerró la conexión sin responder")
+    return json.loads(line)
+
+
+def _handle_local(req: Dict[str, Any]) -> Dict[str, Any]:
+    """Atiende `req` en este proceso, como el daemon pero sin índice caliente."""
+    try:
+        return DumpService().handle(req)
+    except Exception as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Daemon de dumps con índice caliente")
+    ap.add_argument(
+        "--socket",
+        default=DEFAULT_SOCKET if hasattr(socket, "AF_UNIX") else "",
+        help="socket Unix (por defecto ~/.dart_dump_gui.sock)",
+    )
+    ap.add_argument("--port", type=int, default=0, help="TCP en 127.0.0.1")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("serve", help="arranca el daemon (primer plano)")
+    p_render = sub.add_parser("render", help="pide un dump")
+    p_render.add_argument("paths", nargs="*", help="rutas relativas al proyecto")
+    p_render.add_argument(
+        "--profile",
+        action="append",
+        help="perfil guardado (repetible: se combinan con --op, por defecto unión)",
+    )
+    p_render.add_argument("--op", choices=sorted(OPERATIONS), help="operación")
+    p_render.add_argument(
+        "-o",
+        "--out",
+        action="append",
+        help="archivo de salida (repetible; .gz/.xz/.zst comprime; si no, stdout)",
+    )
+    p_combine = sub.add_parser("combine", help="opera selecciones de perfiles")
+    p_combine.add_argument("op", choices=sorted(OPERATIONS))
+    p_combine.add_argument("profiles", nargs="+", help="el primero es la base")
+    p_combine.add_argument("--save", help="guarda el resultado como perfil")
+    for name in ("profiles", "stats", "ping", "stop"):
+        sub.add_parser(name)
+    args = ap.parse_args(argv)
+    port = args.port or (0 if args.socket else DEFAULT_PORT)
+
+    if args.cmd == "serve":
+        try:
+            serve(args.socket, port)
+        except OSError as e:
+            sys.stderr.write(f"No se pudo arrancar el daemon: {e}\n")
+            return 2
+        return 0
+
+    req: Dict[str, Any] = {"cmd": args.cmd}
+    if args.cmd == "combine":
+        req.update(op=args.op, profiles=args.profiles, save=args.save)
+    elif args.cmd == "render":
+        req["paths"] = args.paths
+        profiles = args.profile or []
+        if args.op or len(profiles) > 1:
+            req.update(op=args.op or "union", profiles=profiles)
+        elif profiles:
+            req["profile"] = profiles[0]
+    try:
+        resp = request(req, args.socket, port)
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        if args.cmd != "combine":
+            sys.stderr.write(f"No se pudo hablar con el daemon: {e}\n")
+            return 2
+        resp = _handle_local(req)  # no hay daemon: mismo resultado, más lento
+    except OSError as e:
+        sys.stderr.write(f"No se pudo hablar con el daemon: {e}\n")
+        return 2
+    if not resp.get("ok"):
+        sys.stderr.write(f"Error: {resp.get('error')}\n")
+        return 1
+    if "text" in resp and args.out:
+        # lo escribe el cliente: el daemon no toca rutas que le lleguen por socket
+        sink = open_sinks(args.out)
+        try:
+            fh = text_writer(sink)
+            fh.write(resp["text"])
+            fh.flush()
+            sink.commit()
+        except BaseException:
+            sink.abort()
+            raise
+        sys.stderr.write(f"{resp['files']} archivo(s) -> {', '.join(args.out)}\n")
+    elif "text" in resp:
+        sys.stdout.write(resp["text"])
+    elif args.cmd == "combine":
+        sys.stdout.writelines(f"{p}\n" for p in resp["files"])
+        sys.stderr.write(f"{resp['count']} de {resp['total']} archivo(s)\n")
+    else:
+        shown = {k: v for k, v in resp.items() if k != "ok"}
+        print(json.dumps(shown, ensure_ascii=False, indent=2) if shown else "ok")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
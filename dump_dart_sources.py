@@ -5,12 +5,57 @@ Dart Dump Builder (GUI) — multi-perfiles, salida personalizable, raíces múlt
 -----------------------------------------------------------------------------------------------
 • Raíces fuente configurables (p. ej., lib, src, app, packages, etc.).
 • EXTRAS: archivo, glob o carpeta con diálogo para excluir subcarpetas/archivos.
+    - Paquetes (pub): el lib/ de dependencias elegidas de package_config.json; la
+      resolución y los listados del pub cache se cachean entre ejecuciones.
+    - Globs: varios patrones con '!' en una sola pasada que poda las exclusiones;
+      los grupos glob se vuelven a evaluar al generar (archivos nuevos incluidos).
 • Perfiles:
     - Guardar / Cargar (combobox y diálogos con lista; sin escribir nombres).
     - Activar varios perfiles a la vez (fusión por unión) con panel visible de “Perfiles activos”.
+    - Combinar perfiles (y la selección actual): unión, intersección, diferencia y
+      diferencia simétrica como bitsets sobre los ids del escaneo (dump_selection.py);
+      el resultado se aplica o se guarda como perfil.
+    - La selección se guarda como reglas por carpeta (include/exclude): los archivos
+      nuevos de una carpeta marcada entran solos al aplicar el perfil.
 • Salida personalizable:
     - Modos: Contenido (selección) [DEFAULT] / Solo estructura / Selección + resto estructura.
     - Separador por archivo: carácter, ancho fijo o auto, y marcador END opcional.
+    - Escritura atómica: se genera en un temporal junto a la salida y se reemplaza al final.
+    - Compresión al vuelo (gzip/xz, zstd si está instalado), opcionalmente por bloques
+      en paralelo, y copia simultánea a stdout (dump_sinks.py).
+    - Generación en segundo plano: progreso (archivos, MB, ETA) y botón Cancelar.
+    - Binarios detectados por los primeros KB (veredicto en caché) y límites de
+      bytes/líneas por archivo con marca de truncado.
+    - JSONL por trozos (embeddings/RAG): cortes en declaraciones Dart, con raíz, ruta,
+      líneas, clase y hash; al reexportar solo salen los trozos que cambiaron.
+    - Código generado (*.g.dart, *.freezed.dart, cabecera GENERATED CODE…): incluir,
+      excluir o colapsar a cabecera + firmas públicas (por perfil); las partes
+      (part / part of) pueden seguir a su librería. Veredictos cacheados.
+    - Transformaciones por archivo (colapsar, quitar comentarios) en un pool de
+      procesos por lotes, en el orden del dump y cacheadas por hash de contenido
+      y versión (dump_transforms.py).
+    - Índice lateral opcional (<salida>.idx, JSON): offset, líneas, hash y mtime por bloque.
+    - Solo cambios: dump compacto ([+]/[~]/[-]) frente a un dump anterior (dump_reader.py).
+• Ver progreso en consola: tabla de tiempos por fase, contadores (lecturas, stat, nodos Tk,
+  bytes) y archivos más lentos; cada ejecución se agrega a ~/.dart_dump_gui_perf.jsonl.
+• Modo workspace (monorepos tipo melos): busca cada pubspec.yaml y usa sus raíces
+  (p. ej. packages/*/lib); las raíces se listan en paralelo y se unen en un árbol.
+• Revisión git opcional: escanea y genera desde un commit/tag/rama sin checkout
+  (dump_backends.py: ls-tree + un único `git cat-file --batch`).
+• Cambios (git): marca solo lo de `git status` o `<base>...HEAD`, y opcionalmente
+  los archivos que los importan directamente (dart_analysis.py).
+• Duplicados: MinHash + LSH sobre shingles de tokens (dart_dupes.py; numpy opcional)
+  reporta archivos y regiones casi iguales; firmas cacheadas por hash de contenido.
+• Definiciones: índice de símbolos top-level (cacheado por archivo) para marcar los
+  archivos que declaran los tipos/funciones que usa la selección.
+• Daemon opcional (dump_daemon.py): índice y contenido en memoria, sirve
+  "render perfil X" o "render estas rutas" por socket Unix / TCP local.
+• Selección dentro de un .dart: → lo abre en sus declaraciones top-level (cabecera,
+  clases, funciones…; calculadas al abrir y cacheadas por mtime). Con solo algunas
+  marcadas, el dump lleva esas y una marca [… OMITIDO …] por tramo saltado; los
+  perfiles las guardan por nombre, así que sobreviven a ediciones del archivo.
+• Filtro del árbol: subcadena o difuso (~) con índice de trigramas; marcar/desmarcar
+  actúa solo sobre lo filtrado.
 • Preferencias globales persistentes (JSON): raíces, extensiones, exclusiones, salida, separadores, etc.
 
 Probado con Python 3.13.9.
@@ -18,16 +63,30 @@ Probado con Python 3.13.9.
 
 from __future__ import annotations
 
+import hashlib
+import heapq
 import json
 import os
+import queue
+import re
 import sys
-import glob as _glob
+import tempfile
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
-from dataclasses import dataclass
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
 from typing import (
     Any,
+    Callable,
+    ContextManager,
     Dict,
+    FrozenSet,
     Iterable,
+    Iterator,
     List,
     Optional,
     Set,
@@ -35,12 +94,65 @@ from typing import (
     Tuple,
     cast,
     TypedDict,
+    Union,
 )
 
 # --- Tkinter ---
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, simpledialog
 
+from dart_analysis import (
+    DartPackage,
+    DartRegion,
+    collapse_to_signatures,
+    dart_chunks,
+    dart_directives,
+    direct_dependents,
+    is_generated_dart,
+    line_chunks,
+    package_config_path,
+    part_links,
+    pub_cache_dir,
+    pubspec_name,
+    read_package_config,
+    referenced_identifiers,
+    select_regions,
+    top_level_declarations,
+    top_level_regions,
+)
+from dart_dupes import find_duplicates, write_report
+from dump_backends import (
+    GitError,
+    GitRevSource,
+    WorkTreeSource,
+    git_changed_files,
+    resolve_commit,
+)
+from dump_reader import (
+    SIDECAR_SUFFIX,
+    SIDECAR_VERSION,
+    DumpIndex,
+    diff_against_tree,
+    write_diff_dump,
+)
+from dump_selection import OPERATIONS, FileIndex, combine
+from dump_sinks import (
+    STDOUT,
+    available_compressions,
+    compression_for,
+    open_sinks,
+    text_writer,
+    with_compression,
+)
+from dump_transforms import (
+    Chain,
+    TransformCache,
+    TransformStage,
+    apply_chain,
+    chain_signature,
+    transforms_for,
+)
+
 # =================== CONFIG GLOBAL ===================
 
 DEFAULT_PROJECT_ROOT: str = (
@@ -53,6 +165,19 @@ DEFAULT_EXCLUDES: str = ".git,build,.dart_tool,.idea,.vscode"
 
 PROFILE_STORE: str = os.path.expanduser("~/.dart_dump_gui_profiles.json")
 PREFS_STORE: str = os.path.expanduser("~/.dart_dump_gui_prefs.json")
+PERF_LOG: str = os.path.expanduser("~/.dart_dump_gui_perf.jsonl")
+SNIFF_CACHE: str = os.path.expanduser("~/.dart_dump_gui_sniff.json")
+SYMBOL_CACHE: str = os.path.expanduser("~/.dart_dump_gui_symbols.json")
+REGION_CACHE: str = os.path.expanduser("~/.dart_dump_gui_regions.json")
+PACKAGE_CACHE: str = os.path.expanduser("~/.dart_dump_gui_packages.json")
+GENERATED_CACHE: str = os.path.expanduser("~/.dart_dump_gui_generated.json")
+# Política para código generado -> texto del combo
+GENERATED_POLICIES: Dict[str, str] = {
+    "include": "incluir",
+    "exclude": "excluir",
+    "collapse": "colapsar (firmas)",
+}
+NO_COMPRESSION: str = "ninguna"  # opción del combo de compresión
 
 # ---------------- Tipado de preferencias ----------------
 
@@ -69,6 +194,16 @@ class Prefs(TypedDict, total=False):
     sep_width: int
     sep_auto: bool
     sep_print_end: bool
+    write_index: bool
+    max_file_kb: int
+    max_file_lines: int
+    workspace: bool
+    compression: str  # "" = sin comprimir
+    compress_parallel: bool
+    tee_stdout: bool
+    generated_policy: str  # clave de GENERATED_POLICIES
+    link_parts: bool
+    strip_comments: bool
 
 
 # =====================================================
@@ -85,15 +220,30 @@ def _load_json(path: str) -> Dict[str, Any]:
 
 
 def _save_json(path: str, data: Dict[str, Any]) -> None:
+    """Escribe en un temporal junto a `path` y lo reemplaza: quien lo lea (la GUI,
+    el daemon) nunca ve el archivo a medias, aunque escriban los dos a la vez."""
+    tmp = ""
     try:
-        with open(path, "w", encoding="utf-8") as fh:
+        fd, tmp = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(path)),
+            prefix=f".{os.path.basename(path)}.",
+            suffix=".tmp",
+        )
+        with open(fd, "w", encoding="utf-8") as fh:
             json.dump(data, fh, indent=2, ensure_ascii=False)
+        os.replace(tmp, path)
     except Exception as e:
-        # messagebox puede no existir en entornos sin GUI; protegemos
-        try:
-            messagebox.showwarning("Aviso", f"No se pudo guardar en {path}:\n{e}")
-        except Exception:
-            sys.stderr.write(f"[WARN] No se pudo guardar en {path}: {e}\n")
+        if tmp and os.path.exists(tmp):
+            os.remove(tmp)
+        # Tk no es seguro entre hilos: desde el hilo de generación o el daemon
+        # (cachés de binarios, paquetes, generados…) solo se avisa por stderr
+        if threading.current_thread() is threading.main_thread():
+            try:
+                messagebox.showwarning("Aviso", f"No se pudo guardar en {path}:\n{e}")
+                return
+            except Exception:
+                pass  # messagebox puede no existir en entornos sin GUI
+        sys.stderr.write(f"[WARN] No se pudo guardar en {path}: {e}\n")
 
 
 def _load_profile_store() -> Dict[str, Any]:
@@ -129,6 +279,26 @@ def _load_prefs() -> Prefs:
         prefs["sep_auto"] = bool(data["sep_auto"])
     if "sep_print_end" in data:
         prefs["sep_print_end"] = bool(data["sep_print_end"])
+    if "write_index" in data:
+        prefs["write_index"] = bool(data["write_index"])
+    if "max_file_kb" in data:
+        prefs["max_file_kb"] = int(data["max_file_kb"])
+    if "max_file_lines" in data:
+        prefs["max_file_lines"] = int(data["max_file_lines"])
+    if "workspace" in data:
+        prefs["workspace"] = bool(data["workspace"])
+    if "compression" in data:
+        prefs["compression"] = str(data["compression"])
+    if "compress_parallel" in data:
+        prefs["compress_parallel"] = bool(data["compress_parallel"])
+    if "tee_stdout" in data:
+        prefs["tee_stdout"] = bool(data["tee_stdout"])
+    if "generated_policy" in data:
+        prefs["generated_policy"] = str(data["generated_policy"])
+    if "link_parts" in data:
+        prefs["link_parts"] = bool(data["link_parts"])
+    if "strip_comments" in data:
+        prefs["strip_comments"] = bool(data["strip_comments"])
     return prefs
 
 
@@ -140,6 +310,23 @@ def sorted_casefold(items: Iterable[str]) -> List[str]:
     return sorted(items, key=lambda s: s.casefold())
 
 
+def parse_ext_list(raw: str) -> Set[str]:
+    """ "dart, .yaml" -> {"dart", "yaml"} (vacío = solo dart)."""
+    if not raw.strip():
+        return {"dart"}
+    return {e.strip().lower().lstrip(".") for e in raw.split(",") if e.strip()}
+
+
+def parse_name_list(raw: str) -> Set[str]:
+    return {e.strip() for e in raw.split(",") if e.strip()}
+
+
+def parse_root_list(raw: str) -> List[str]:
+    if not raw.strip():
+        return ["lib"]
+    return [r.strip().strip("\\/") for r in raw.split(",") if r.strip()]
+
+
 def dir_header(depth: int, dirname: str) -> str:
     if depth == 1:
         return f"Dentro de /{dirname}:\n"
@@ -150,19 +337,254 @@ def dir_header(depth: int, dirname: str) -> str:
         return f"{indent}/{dirname}:\n"
 
 
+# ---------------- Reglas de selección (perfiles) ----------------
+# Un perfil guarda reglas {"path": "lib/modules/core", "include": true} relativas al
+# proyecto. Gana la regla más específica (prefijo de carpeta más largo), así una
+# carpeta marcada completa es una sola regla y los archivos nuevos entran solos.
+
+SelectionRule = Dict[str, Any]
+
+
+def _extras_group(
+    label: str,
+    files: List[str],
+    globs: Optional[List[str]],
+    off: List[str],
+    package: str = "",
+) -> Dict[str, Any]:
+    """Grupo EXTRAS del perfil; con `globs` se re-evalúa al aplicar/generar.
+
+    Con `package`, las rutas y patrones son relativos al lib/ de esa dependencia
+    (se resuelve de nuevo con package_config.json, así sigue a otra versión).
+    """
+    group: Dict[str, Any] = {"label": label, "files": files}
+    if globs:
+        group["globs"] = globs
+        group["files_off"] = off
+    if package:
+        group["package"] = package
+    return group
+
+
+def _payload_rule_sets(payload: Dict[str, Any]) -> List[List[SelectionRule]]:
+    """Conjuntos de reglas del perfil (uno por perfil fusionado).
+
+    Los perfiles antiguos solo traen ``selected_files_rel``: cada archivo es un include.
+    """
+    if "selection_rule_sets" in payload:
+        return [list(rs) for rs in payload.get("selection_rule_sets") or []]
+    if "selection_rules" in payload:
+        return [list(payload.get("selection_rules") or [])]
+    return [
+        [
+            {"path": str(rel), "include": True}
+            for rel in payload.get("selected_files_rel", [])
+        ]
+    ]
+
+
+def _compile_rules(rules: Iterable[SelectionRule]) -> Dict[str, bool]:
+    return {
+        str(r.get("path", ""))
+        .replace("\\", "/")
+        .strip("/"): bool(r.get("include", True))
+        for r in rules
+    }
+
+
+def _rules_select(compiled: Dict[str, bool], rel: str) -> bool:
+    """¿Selecciona la regla más específica a `rel` (ruta relativa con '/')?"""
+    cur = rel
+    while True:
+        hit = compiled.get(cur)
+        if hit is not None:
+            return hit
+        if "/" not in cur:
+            return False
+        cur = cur.rsplit("/", 1)[0]
+
+
+def _payload_selects(payload: Dict[str, Any]) -> Callable[[str], bool]:
+    """¿Entra `rel` en la selección del perfil? (unión si fusiona varios)."""
+    compiled = [_compile_rules(rs) for rs in _payload_rule_sets(payload)]
+    return lambda rel: any(_rules_select(c, rel) for c in compiled)
+
+
+def _union_regions(payloads: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """Regiones de la unión: se juntan por archivo, salvo que algún perfil
+    seleccione el archivo entero (sus reglas lo marcan y no tiene regiones)."""
+    regions: Dict[str, Set[str]] = {}
+    for p in payloads:
+        for rel, names in (p.get("regions") or {}).items():
+            regions.setdefault(str(rel), set()).update(str(n) for n in names)
+    if not regions:
+        return {}
+    for p in payloads:
+        own = p.get("regions") or {}
+        selects = _payload_selects(p)
+        for rel in [r for r in regions if r not in own and selects(r)]:
+            del regions[rel]
+    return {rel: sorted(names) for rel, names in regions.items()}
+
+
+def union_payload(payloads: List[Dict[str, Any]], project_root: str) -> Dict[str, Any]:
+    """Une varias selecciones en una sola (∪). Mantiene opciones del primero."""
+    first = payloads[0]
+    proj = first.get("project_root", project_root)
+    options = dict(first.get("options", {}))
+
+    rule_sets: List[List[SelectionRule]] = []
+    extras_map: Dict[str, Set[str]] = {}
+    globs_map: Dict[str, Optional[List[str]]] = {}
+    off_map: Dict[str, Set[str]] = {}
+    pkg_map: Dict[str, str] = {}
+    for p in payloads:
+        rule_sets.extend(_payload_rule_sets(p))
+        for g in p.get("extras_groups", []):
+            label = str(g.get("label") or "Extras")
+            if g.get("package"):
+                pkg_map[label] = str(g["package"])
+            files = {str(r) for r in g.get("files", [])}
+            extras_map.setdefault(label, set()).update(files)
+            # patrones distintos con la misma etiqueta -> solo lista de archivos
+            globs = list(g.get("globs") or []) or None
+            off = {str(r) for r in g.get("files_off") or []}
+            if label not in globs_map:
+                globs_map[label], off_map[label] = globs, off
+            elif globs_map[label] != globs:
+                globs_map[label] = None
+            else:
+                off_map[label] &= off
+
+    union: Dict[str, Any] = {
+        "project_root": proj,
+        "options": options,
+        "selection_rule_sets": rule_sets,
+        "extras_groups": [
+            _extras_group(
+                lbl,
+                sorted(list(files), key=str.casefold),
+                globs_map.get(lbl),
+                sorted(off_map.get(lbl, set()), key=str.casefold),
+                pkg_map.get(lbl, ""),
+            )
+            for lbl, files in extras_map.items()
+        ],
+    }
+    regions = _union_regions(payloads)
+    if regions:
+        union["regions"] = regions
+    return union
+
+
+def _combined_extras(op: str, payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """EXTRAS de `payloads` operados como los archivos: un bit por (grupo, ruta).
+
+    Los grupos glob o de paquete conservan los patrones del primero que los trae
+    y desmarcan lo que conocían los operandos y quedó fuera; un grupo sin
+    archivos en el resultado desaparece.
+    """
+    keys: Dict[Tuple[str, str], int] = {}
+    globs_map: Dict[str, List[str]] = {}
+    pkg_map: Dict[str, str] = {}
+    operands: List[int] = []
+    for p in payloads:
+        bits = 0
+        for g in p.get("extras_groups", []):
+            label = str(g.get("label") or "Extras")
+            if g.get("globs"):
+                globs_map.setdefault(label, [str(x) for x in g["globs"]])
+            if g.get("package"):
+                pkg_map.setdefault(label, str(g["package"]))
+            for rel in g.get("files_off") or []:
+                keys.setdefault((label, str(rel)), len(keys))
+            for rel in g.get("files", []):
+                bits |= 1 << keys.setdefault((label, str(rel)), len(keys))
+        operands.append(bits)
+    res = combine(op, operands)
+    files: Dict[str, List[str]] = {}
+    off: Dict[str, List[str]] = {}
+    for (label, rel), i in keys.items():
+        (files if res >> i & 1 else off).setdefault(label, []).append(rel)
+    return [
+        _extras_group(
+            label,
+            sorted(rels, key=str.casefold),
+            globs_map.get(label),
+            sorted(off.get(label, []), key=str.casefold),
+            pkg_map.get(label, ""),
+        )
+        for label, rels in files.items()
+    ]
+
+
+def combined_payload(
+    op: str, payloads: List[Dict[str, Any]], index: FileIndex
+) -> Tuple[Dict[str, Any], int]:
+    """Opera las selecciones de `payloads` como bitsets sobre `index`.
+
+    Devuelve el perfil resultante (opciones del primero y reglas por carpeta del
+    resultado) y el bitset. EXTRAS: la unión los junta como `union_payload`; el
+    resto los opera igual que los archivos. Regiones de archivos parciales: la
+    unión las junta; el resto usa las del primero (la base).
+    """
+    bits = combine(op, [index.select(_payload_selects(p)) for p in payloads])
+    first = payloads[0]
+    if op == "union":
+        union = union_payload(payloads, "")
+        extras, regions = union["extras_groups"], union.get("regions", {})
+    else:
+        extras = _combined_extras(op, payloads)
+        regions = dict(first.get("regions") or {})
+    payload: Dict[str, Any] = {
+        "project_root": first.get("project_root", ""),
+        "options": dict(first.get("options", {})),
+        "selection_rules": index.rules(bits),
+        "extras_groups": extras,
+    }
+    kept = set(index.paths_of(bits)) if regions else set()
+    regions = {rel: names for rel, names in regions.items() if rel in kept}
+    if regions:
+        payload["regions"] = regions
+    return payload, bits
+
+
 CHECK_OFF = "☐"
 CHECK_ON = "☑"
 CHECK_PARTIAL = "◩"
 
 
+# Tipo de región de un .dart -> texto en el árbol
+REGION_KINDS: Dict[str, str] = {
+    "header": "cabecera",
+    "class": "clase",
+    "mixin": "mixin",
+    "enum": "enum",
+    "extension": "extensión",
+    "typedef": "typedef",
+    "function": "función",
+    "variable": "variable",
+}
+
+
+def _region_label(region: DartRegion) -> str:
+    kind = REGION_KINDS.get(region.kind, region.kind)
+    name = "" if region.kind == "header" else f" {region.name}"
+    return f"{kind}{name}  [L{region.start}-{region.end}]"
+
+
 @dataclass
 class NodeMeta:
-    kind: str  # "root-extras" | "root-srcroot" | "dir" | "file" | "extra-group"
+    # "root-extras" | "root-srcroot" | "dir" | "file" | "extra-group" | "region"
+    kind: str
     path: str  # absoluta si aplica
     root_for_rel: str  # base para rutas relativas
     group: str  # "extras" | "<srcroot>" | "extras-group" | "dialog"
     label: str  # texto sin prefijo
     selectable: bool = True
+    globs: Optional[Tuple[str, ...]] = None  # grupos EXTRAS por patrón glob
+    package: str = ""  # grupo EXTRAS de una dependencia (globs bajo su lib/)
+    symbol: str = ""  # región: declaración top-level del archivo `path`
 
 
 # ---------- Diálogo selector de carpeta (pre-exclusiones) ----------
@@ -175,6 +597,8 @@ class SelectFromFolderDialog(tk.Toplevel):
         base_dir: str,
         ext_filter: Optional[Set[str]] = None,
         title: str = "Seleccionar desde carpeta",
+        excludes: Optional[Set[str]] = None,
+        source: Optional[Source] = None,
     ) -> None:
         super().__init__(master)
         self.title(title)
@@ -188,15 +612,35 @@ class SelectFromFolderDialog(tk.Toplevel):
 
         self.base_dir = os.path.abspath(base_dir)
         self.ext_filter = {e.lower().lstrip(".") for e in (ext_filter or set())} or None
+        self.excludes: Set[str] = set(excludes or ())
+        # árbol de trabajo o la revisión git que está escaneada
+        self._source: Source = source if source is not None else WORK_TREE
 
         self.item_state: Dict[str, int] = {}
         self.item_meta: Dict[str, NodeMeta] = {}
         self.result_paths: Optional[List[str]] = None
 
+        # Carga perezosa: cada carpeta se lista (scandir en un hilo) al expandirse.
+        self._placeholders: Dict[str, str] = {}  # carpeta sin cargar -> hijo "…"
+        self._requested: Set[str] = set()
+        # (nodo, ruta, recorrer todo el subárbol)
+        self._requests: "queue.Queue[Tuple[str, str, bool]]" = queue.Queue()
+        self._results: "queue.Queue[Tuple[str, List[str], List[str]]]" = queue.Queue()
+        self._poll_id: Optional[str] = None
+        # Aceptar: las carpetas marcadas sin cargar se recorren en el mismo hilo
+        self._walked: "queue.Queue[List[str]]" = queue.Queue()
+        self._walked_dirs = 0  # carpetas listadas al aceptar (progreso)
+        self._accept_id: Optional[str] = None
+        self._accept_files: List[str] = []
+        self._accept_left = 0
+        self._status_var = tk.StringVar(value="")
+        threading.Thread(target=self._lister, daemon=True).start()
+
         # Top
         top = ttk.Frame(self, padding=6)
         top.pack(fill="x")
-        ttk.Label(top, text=f"Carpeta base: {self.base_dir}").pack(anchor="w")
+        rev = f" @ {self._source.label}" if self._source.label else ""
+        ttk.Label(top, text=f"Carpeta base: {self.base_dir}{rev}").pack(anchor="w")
 
         # Centro
         mid = ttk.Frame(self, padding=(6, 0, 6, 6))
@@ -271,50 +715,116 @@ class SelectFromFolderDialog(tk.Toplevel):
         ttk.Button(bottom, text="Agregar selección", command=self._accept).pack(
             side="right", padx=4
         )
+        ttk.Label(bottom, textvariable=self._status_var).pack(side="left")
 
-        # Árbol
+        # Árbol (solo la raíz; el resto se carga al expandir)
+        self.tree.bind("<<TreeviewOpen>>", self._on_open)
         base_label = os.path.basename(self.base_dir.strip("\\/")) or self.base_dir
         self.root_item = self._add_dir_node(
             "", base_label, self.base_dir, self.base_dir, "dialog"
         )
-        path_to_node: Dict[str, str] = {self.base_dir: self.root_item}
+        self.tree.item(self.root_item, open=True)
+        self._request_load(self.root_item)
+
+    # ---- carga perezosa ----
+
+    def _filter_listing(self, path: str) -> Tuple[List[str], List[str]]:
+        """(archivos, carpetas) de `path` ya filtrados por exclusiones y extensión."""
+        files, dirs = self._source.list_dir(path)
+        if self.ext_filter is not None:
+            files = [f for f in files if _file_ext(f) in self.ext_filter]
+        dirs = [d for d in dirs if d not in self.excludes]
+        return sorted_casefold(files), sorted_casefold(dirs)
+
+    def _lister(self) -> None:
+        """Hilo de fondo: lista carpetas pedidas (sin tocar Tk)."""
+        while True:
+            node, path, deep = self._requests.get()
+            if not path:  # diálogo cerrado
+                return
+            if deep:
+                self._walked.put(self._files_under(path))
+                continue
+            files, dirs = self._filter_listing(path)
+            self._results.put((node, files, dirs))
 
-        for root, dirs, files in os.walk(self.base_dir, topdown=True):
-            dirs[:] = sorted_casefold(dirs)
-            files = sorted_casefold(files)
-            parent_node = path_to_node.get(root, self.root_item)
+    def _request_load(self, node: str) -> None:
+        if node in self._requested:
+            return
+        self._requested.add(node)
+        ph = self._placeholders.get(node)
+        if ph:
+            self.tree.item(ph, text="… cargando")
+        else:
+            self._placeholders[node] = self.tree.insert(node, "end", text="… cargando")
+        self._requests.put((node, self.item_meta[node].path, False))
+        if self._poll_id is None:
+            self._poll_id = self.after(30, self._drain)
 
-            for d in dirs:
-                dpath = os.path.join(root, d)
-                node = self._add_dir_node(
-                    parent_node, d, dpath, self.base_dir, "dialog"
-                )
-                path_to_node[dpath] = node
+    def _drain(self) -> None:
+        self._poll_id = None
+        try:
+            while True:
+                node, files, dirs = self._results.get_nowait()
+                self._fill_dir(node, files, dirs)
+        except queue.Empty:
+            pass
+        if any(n in self._placeholders for n in self._requested):
+            self._poll_id = self.after(30, self._drain)
 
-            for f in files:
-                if self.ext_filter is not None:
-                    ext = f.rsplit(".", 1)[-1].lower() if "." in f else ""
-                    if ext not in self.ext_filter:
-                        continue
-                fpath = os.path.join(root, f)
-                self._add_file_node(
-                    parent_node, f, fpath, self.base_dir, "dialog", default_on=True
-                )
+    def _fill_dir(self, node: str, files: List[str], dirs: List[str]) -> None:
+        ph = self._placeholders.pop(node, None)
+        if not ph:
+            return
+        self.tree.delete(ph)
+        on = self.item_state.get(node, 1) == 1
+        path = self.item_meta[node].path
+        for d in dirs:
+            self._add_dir_node(
+                node, d, os.path.join(path, d), self.base_dir, "dialog", on=on
+            )
+        for f in files:
+            self._add_file_node(
+                node, f, os.path.join(path, f), self.base_dir, "dialog", default_on=on
+            )
 
-        self.tree.item(self.root_item, open=True)
+    def _on_open(self, event: tk.Event | None = None) -> None:
+        item = self.tree.focus()
+        if item in self.item_meta and self.item_meta[item].kind == "dir":
+            self._request_load(item)
+
+    def _files_under(self, path: str) -> List[str]:
+        """Archivos bajo una carpeta aún no cargada (al aceptar; hilo de fondo)."""
+        files, dirs = self._filter_listing(path)
+        self._walked_dirs += 1
+        out = [os.path.join(path, f) for f in files]
+        for d in dirs:
+            out.extend(self._files_under(os.path.join(path, d)))
+        return out
 
     def _set_item_text(self, item: str, base: str, state: int) -> None:
         prefix = CHECK_OFF if state == 0 else CHECK_ON if state == 1 else CHECK_PARTIAL
         self.tree.item(item, text=f"{prefix} {base}")
 
     def _add_dir_node(
-        self, parent: str, label: str, path: str, root_for_rel: str, group: str
+        self,
+        parent: str,
+        label: str,
+        path: str,
+        root_for_rel: str,
+        group: str,
+        on: bool = True,
     ) -> str:
-        node = self.tree.insert(parent, "end", text=f"{CHECK_ON} {label}", open=False)
+        node = self.tree.insert(
+            parent, "end", text=f"{CHECK_ON if on else CHECK_OFF} {label}", open=False
+        )
         self.item_meta[node] = NodeMeta(
             "dir", path, root_for_rel, group, label, selectable=True
         )
-        self.item_state[node] = 1
+        self.item_state[node] = 1 if on else 0
+        if parent:
+            # hijo "…" para que Tk muestre el expansor; se lista al abrir
+            self._placeholders[node] = self.tree.insert(node, "end", text="…")
         return node
 
     def _add_file_node(
@@ -343,7 +853,7 @@ class SelectFromFolderDialog(tk.Toplevel):
         if not parent:
             return
         children = self.tree.get_children(parent)
-        states = [self.item_state[c] for c in children]
+        states = [self.item_state[c] for c in children if c in self.item_state]
         if all(s == 1 for s in states):
             new = 1
         elif all(s == 0 for s in states):
@@ -359,7 +869,8 @@ class SelectFromFolderDialog(tk.Toplevel):
         self.item_state[item] = state
         self._set_item_text(item, self.item_meta[item].label, state)
         for ch in self.tree.get_children(item):
-            self._set_recursive(ch, on)
+            if ch in self.item_meta:
+                self._set_recursive(ch, on)
 
     def _on_space(self, event: tk.Event | None = None) -> None:
         item = self.tree.focus()
@@ -383,35 +894,1858 @@ class SelectFromFolderDialog(tk.Toplevel):
         self._set_recursive(self.root_item, on)
 
     def _expand_collapse(self, expand: bool) -> None:
+        """Solo carpetas ya cargadas (+ pide el siguiente nivel al expandir)."""
+
         def walk(it: str) -> None:
+            if it not in self.item_meta or self.item_meta[it].kind != "dir":
+                return
             self.tree.item(it, open=expand)
+            if expand and it in self._placeholders:
+                self._request_load(it)
+                return
             for c in self.tree.get_children(it):
                 walk(c)
 
         walk(self.root_item)
 
     def _accept(self) -> None:
+        """Archivos marcados; los de carpetas marcadas que nunca se abrieron los
+        lista el hilo de fondo y el diálogo se cierra al terminar."""
+        if self._accept_id is not None:
+            return
         result: List[str] = []
+        pending: List[str] = []
 
         def walk(it: str) -> None:
-            if self.item_meta[it].kind == "file" and self.item_state[it] == 1:
-                result.append(os.path.abspath(self.item_meta[it].path))
+            meta = self.item_meta.get(it)
+            if not meta:
+                return
+            if meta.kind == "file" and self.item_state[it] == 1:
+                result.append(meta.path)
+            elif it in self._placeholders and self.item_state[it] == 1:
+                pending.append(meta.path)
             for c in self.tree.get_children(it):
                 walk(c)
 
         walk(self.root_item)
-        self.result_paths = result
+        self._accept_files = result
+        self._accept_left = len(pending)
+        for path in pending:
+            self._requests.put(("", path, True))
+        self._poll_accept()
+
+    def _poll_accept(self) -> None:
+        self._accept_id = None
+        try:
+            while True:
+                self._accept_files.extend(self._walked.get_nowait())
+                self._accept_left -= 1
+        except queue.Empty:
+            pass
+        if self._accept_left:
+            self._status_var.set(
+                f"Listando carpetas sin abrir… {self._walked_dirs} · "
+                f"{len(self._accept_files)} archivo(s)"
+            )
+            self._accept_id = self.after(50, self._poll_accept)
+            return
+        self.result_paths = [os.path.abspath(p) for p in self._accept_files]
         self.destroy()
 
     def _cancel(self) -> None:
         self.result_paths = None
         self.destroy()
 
+    def destroy(self) -> None:
+        self._requests.put(("", "", False))
+        for after_id in (self._poll_id, self._accept_id):
+            if after_id is not None:
+                self.after_cancel(after_id)
+        self._poll_id = self._accept_id = None
+        super().destroy()
+
     def show(self) -> Optional[List[str]]:
         self.wait_window(self)
         return self.result_paths
 
 
+# ---------- Instrumentación (Ver progreso en consola) ----------
+
+
+class _Perf:
+    """Tiempos por fase, contadores y archivos más lentos de una operación.
+
+    Las fases son hojas (no se anidan): lo no medido aparece como "otros".
+    """
+
+    def __init__(self, op: str, top_n: int = 10) -> None:
+        self.op = op
+        self.top_n = top_n
+        self.phases: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self._slow: List[Tuple[float, int, str]] = []  # heap mínimo
+        self._t0 = time.perf_counter()
+        self.total = 0.0
+
+    @contextmanager
+    def _timed(self, name: str) -> Iterator[None]:
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - t
+
+    def phase(self, name: str) -> ContextManager[None]:
+        return self._timed(name)
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def file_done(self, path: str, seconds: float, nbytes: int) -> None:
+        item = (seconds, nbytes, path)
+        if len(self._slow) < self.top_n:
+            heapq.heappush(self._slow, item)
+        elif item > self._slow[0]:
+            heapq.heapreplace(self._slow, item)
+
+    def finish(self) -> None:
+        self.total = time.perf_counter() - self._t0
+
+    def as_dict(self, **extra: Any) -> Dict[str, Any]:
+        return {
+            "ts": datetime.now().isoformat(timespec="seconds"),
+            "op": self.op,
+            "total_s": round(self.total, 6),
+            "phases": {k: round(v, 6) for k, v in self.phases.items()},
+            "counters": dict(self.counters),
+            "slowest": [
+                {"path": p, "seconds": round(t, 6), "bytes": b}
+                for t, b, p in sorted(self._slow, reverse=True)
+            ],
+            **extra,
+        }
+
+    def print_report(self) -> None:
+        total = self.total or 1e-9
+        print(f"{'Fase':<18}{'Tiempo (s)':>12}{'%':>8}")
+        measured = 0.0
+        for name, secs in sorted(self.phases.items(), key=lambda kv: -kv[1]):
+            measured += secs
+            print(f"{name:<18}{secs:>12.4f}{100 * secs / total:>8.1f}")
+        rest = max(0.0, self.total - measured)
+        print(f"{'otros':<18}{rest:>12.4f}{100 * rest / total:>8.1f}")
+        print(f"{'TOTAL':<18}{self.total:>12.4f}")
+        if self.counters:
+            print(
+                "Contadores: "
+                + ", ".join(f"{k}={v}" for k, v in sorted(self.counters.items()))
+            )
+        if self._slow:
+            print(f"Archivos más lentos (top {self.top_n}):")
+            for t, b, p in sorted(self._slow, reverse=True):
+                print(f"  {t:>9.4f} s {b:>10} B  {p}")
+
+    def save(self, path: str = PERF_LOG, **extra: Any) -> None:
+        """Agrega una línea JSON (para seguir la tendencia entre ejecuciones)."""
+        try:
+            with open(path, "a", encoding="utf-8") as fh:
+                fh.write(json.dumps(self.as_dict(**extra), ensure_ascii=False) + "\n")
+        except OSError as e:
+            sys.stderr.write(f"[WARN] No se pudo guardar en {path}: {e}\n")
+
+
+class _NullPerf(_Perf):
+    """Instrumentación desactivada: todo es no-op."""
+
+    _NULL_CTX: ContextManager[None] = nullcontext()
+
+    def phase(self, name: str) -> ContextManager[None]:
+        return self._NULL_CTX
+
+    def count(self, name: str, n: int = 1) -> None:
+        pass
+
+    def file_done(self, path: str, seconds: float, nbytes: int) -> None:
+        pass
+
+
+_NULL_PERF = _NullPerf("off")
+
+
+# Origen de archivos por defecto (árbol de trabajo); ver dump_backends.py.
+Source = Union[WorkTreeSource, GitRevSource]
+WORK_TREE: WorkTreeSource = WorkTreeSource()
+_list_dir = WORK_TREE.list_dir
+
+
+# ---------- Salida con buffer + índice lateral (<salida>.idx) ----------
+
+
+class _BufferedWriter:
+    """Acumula texto y lo vuelca al archivo en bloques grandes (pocas llamadas a write).
+
+    Con `track=True` lleva la posición en bytes (tal como quedan en disco, con la
+    traducción de saltos del modo texto) y el número de línea, para el índice lateral.
+    """
+
+    def __init__(
+        self,
+        fh: TextIO,
+        buffer_size: int = 1 << 20,
+        track: bool = False,
+        perf: "_Perf" = _NULL_PERF,
+    ) -> None:
+        self._fh = fh
+        self._parts: List[str] = []
+        self._size = 0
+        self._limit = buffer_size
+        self._perf = perf
+        self._nl_extra = len(os.linesep) - 1  # modo texto: "\n" -> os.linesep
+        self.pos = 0
+        self.line = 1
+        if track:
+            self.write = self._write_tracked  # type: ignore[method-assign]
+
+    def write(self, s: str) -> None:
+        self._parts.append(s)
+        self._size += len(s)
+        if self._size >= self._limit:
+            self.flush()
+
+    def _write_tracked(self, s: str) -> None:
+        n = s.count("\n")
+        self.pos += (len(s) if s.isascii() else len(s.encode("utf-8"))) + (
+            n * self._nl_extra
+        )
+        self.line += n
+        self._parts.append(s)
+        self._size += len(s)
+        if self._size >= self._limit:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._parts:
+            return
+        with self._perf.phase("write"):
+            self._fh.write("".join(self._parts))
+        self._parts.clear()
+        self._size = 0
+
+
+class _SidecarIndex:
+    """Registra offsets, líneas, hash y mtime de cada bloque mientras se genera.
+
+    Mismo formato de entradas que `dump_reader.DumpEntry` (+ sha1/mtime/size).
+    `sha1` es el del texto escrito en el bloque y `src_sha1` el de la fuente sin
+    transformar ni truncar (UTF-8, saltos "\n"); difieren si se quitaron
+    comentarios, se colapsó, se truncó o se eligieron regiones.
+    """
+
+    def __init__(self, writer: _BufferedWriter, source: Source = WORK_TREE) -> None:
+        self.writer = writer
+        self.source = source
+        self.blocks: List[Dict[str, Any]] = []
+
+    def start(self, section: str, rel: str, abs_path: str) -> Dict[str, Any]:
+        mtime: Optional[float]
+        size: Optional[int]
+        try:
+            mtime, size = self.source.stat(abs_path)
+        except OSError:
+            mtime = size = None
+        block: Dict[str, Any] = {
+            "section": section,
+            "path": rel,
+            "offset": self.writer.pos,
+            "length": 0,
+            "content_offset": 0,
+            "content_length": -1,
+            "line_start": self.writer.line,
+            "line_end": self.writer.line,
+            "sha1": None,
+            "src_sha1": None,
+            "mtime": mtime,
+            "size": size,
+        }
+        self.blocks.append(block)
+        return block
+
+    def content_start(self, block: Dict[str, Any]) -> None:
+        block["content_offset"] = self.writer.pos
+
+    def content_end(
+        self, block: Dict[str, Any], content: str, src_sha1: Optional[str]
+    ) -> None:
+        block["content_length"] = self.writer.pos - block["content_offset"]
+        block["sha1"] = hashlib.sha1(content.encode("utf-8")).hexdigest()
+        block["src_sha1"] = src_sha1
+        block["line_end"] = max(
+            block["line_start"],
+            self.writer.line - (1 if content.endswith("\n") else 0),
+        )
+
+    def finish(self, block: Dict[str, Any], with_end: bool) -> None:
+        w = self.writer
+        if with_end:
+            block["length"] = w.pos - block["offset"]
+            block["line_end"] = w.line - 1
+        elif block["content_length"] >= 0:
+            end = block["content_offset"] + block["content_length"]
+            block["length"] = end - block["offset"]
+        else:
+            block["length"] = block["content_offset"] - block["offset"]
+
+    def save(self, out_path: str, generated: str, project_root: str) -> None:
+        data = {
+            "version": SIDECAR_VERSION,
+            "dump": os.path.basename(out_path),
+            "dump_size": os.path.getsize(out_path),
+            "generated": generated,
+            "project_root": project_root,
+            "blocks": self.blocks,
+        }
+        with open(out_path + SIDECAR_SUFFIX, "w", encoding="utf-8") as fh:
+            json.dump(data, fh, ensure_ascii=False, separators=(",", ":"))
+
+
+# ---------- Render del dump (sin Tk) ----------
+
+OUTPUT_MODES = ("content_selected", "structure_only", "selected_plus_structure")
+
+
+@dataclass(frozen=True)
+class RenderOptions:
+    """Opciones de salida congeladas al iniciar (no se vuelve a leer Tk)."""
+
+    mode: str = "content_selected"
+    filename_only: bool = False
+    sep_char: str = "-"
+    sep_width: int = 80
+    sep_auto: bool = False
+    sep_print_end: bool = True
+    allowed_exts: FrozenSet[str] = frozenset({"dart"})
+    excludes: FrozenSet[str] = frozenset()
+    write_index: bool = False
+    max_file_bytes: int = 0  # 0 = sin límite
+    max_file_lines: int = 0  # 0 = sin límite
+    compress_threads: int = 0  # >1 = comprimir por bloques en paralelo
+    generated: str = "include"  # "include" | "exclude" | "collapse"
+    link_parts: bool = False  # las partes siguen a su librería
+    strip_comments: bool = False  # .dart sin comentarios (salvo documentación)
+
+
+@dataclass
+class RenderRoot:
+    name: str
+    path: str
+    selected: Set[str]  # rutas normcase(abspath) seleccionadas
+
+
+@dataclass
+class RenderJob:
+    project_root: str
+    roots_label: str  # texto de la línea RAICES
+    extras: List[Tuple[str, str, bool]]  # (abs_path, root_for_rel, is_selected)
+    roots: List[RenderRoot]
+    out_path: str
+    revision: str = ""  # línea REVISION (vacío = árbol de trabajo)
+    tee: List[str] = field(default_factory=list)  # copias extra ("-" = stdout)
+    # .dart con selección parcial: normcase(abspath) -> declaraciones a incluir
+    regions: Dict[str, Tuple[str, ...]] = field(default_factory=dict)
+
+
+@dataclass
+class _DirListing:
+    """Archivos permitidos y subcarpetas no vacías, ya ordenados (una pasada scandir)."""
+
+    files: List[str]
+    dirs: List[Tuple[str, "_DirListing"]]
+
+
+def _file_ext(name: str) -> str:
+    return name.rsplit(".", 1)[-1].lower() if "." in name else ""
+
+
+def _list_tree(
+    path: str,
+    allowed_exts: FrozenSet[str],
+    excludes: FrozenSet[str],
+    list_dir: Callable[[str], Tuple[List[str], List[str]]] = _list_dir,
+    keep_empty: bool = False,
+) -> _DirListing:
+    files, dirs = list_dir(path)
+    listing = _DirListing(
+        [f for f in sorted_casefold(files) if _file_ext(f) in allowed_exts], []
+    )
+    for d in sorted_casefold(dirs):
+        if d in excludes:
+            continue
+        sub = _list_tree(
+            os.path.join(path, d), allowed_exts, excludes, list_dir, keep_empty
+        )
+        if keep_empty or sub.files or sub.dirs:
+            listing.dirs.append((d, sub))
+    return listing
+
+
+def _count_dirs(listing: _DirListing) -> int:
+    return 1 + sum(_count_dirs(sub) for _, sub in listing.dirs)
+
+
+# ---------- Detección de binarios (caché por ruta/mtime/tamaño) ----------
+
+SNIFF_BYTES = 8192
+_TEXT_BYTES = bytes(
+    sorted({7, 8, 9, 10, 12, 13, 27} | set(range(0x20, 0x100)) - {0x7F})
+)
+
+
+def _looks_binary(head: bytes) -> bool:
+    """NUL, o muchos bytes de control si no es UTF-8 válido => binario."""
+    if not head:
+        return False
+    if b"\0" in head:
+        return True
+    try:
+        head.decode("utf-8")
+        return False
+    except UnicodeDecodeError as e:
+        if e.reason == "unexpected end of data":
+            return False  # multibyte cortado al final del bloque
+    return len(head.translate(None, _TEXT_BYTES)) > len(head) * 0.3
+
+
+def _decode_text(data: bytes) -> str:
+    """UTF-8 (lo inválido se omite) con saltos normalizados a "\n"."""
+    text = data.decode("utf-8", errors="ignore")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+class _SniffCache:
+    """Veredictos de binario por (ruta, mtime, tamaño), persistidos entre ejecuciones.
+
+    Solo se guardan los binarios: un texto se lee igualmente, así que recordarlo
+    no ahorra nada; un binario conocido ni se abre.
+    """
+
+    def __init__(self, path: str = SNIFF_CACHE) -> None:
+        self.path = path
+        self._data: Dict[str, Any] = _load_json(path)  # ruta -> [mtime, tamaño]
+        self._dirty = False
+
+    def known_binary(self, key: str, mtime: float, size: int) -> bool:
+        return self._data.get(key) == [mtime, size]
+
+    def remember(self, key: str, mtime: float, size: int, binary: bool) -> None:
+        if binary:
+            self._data[key] = [mtime, size]
+            self._dirty = True
+        elif self._data.pop(key, None) is not None:
+            self._dirty = True
+
+    def save(self) -> None:
+        if self._dirty:
+            _save_json(self.path, self._data)
+            self._dirty = False
+
+
+# ---------- Índice de símbolos (declaraciones top-level -> archivos) ----------
+
+
+def _read_text(source: Source, path: str) -> str:
+    with source.open(path) as fh:
+        return fh.read().decode("utf-8", errors="replace")
+
+
+class _SymbolIndex:
+    """Qué archivos declaran cada clase/mixin/enum/extensión/typedef/función.
+
+    Las declaraciones de cada archivo se cachean en disco por (clave, mtime,
+    tamaño) de su origen: reindexar miles de archivos sin cambios es solo stat.
+    """
+
+    def __init__(self, path: str = SYMBOL_CACHE) -> None:
+        self.path = path
+        # ruta normalizada -> [clave, mtime, tamaño, [nombres]]
+        self._files: Dict[str, Any] = _load_json(path)
+        self._dirty = False
+        self.defs: Dict[str, List[str]] = {}
+        self.parsed = 0  # archivos leídos en el último update()
+
+    def update(self, paths: Iterable[str], source: Source) -> None:
+        defs: Dict[str, List[str]] = {}
+        self.parsed = 0
+        for path in paths:
+            try:
+                key, mtime, size = source.cache_key(path)
+            except OSError:
+                continue
+            norm = os.path.normcase(os.path.abspath(path))
+            entry = self._files.get(norm)
+            if entry is not None and entry[:3] == [key, mtime, size]:
+                names: List[str] = entry[3]
+            else:
+                try:
+                    names = top_level_declarations(_read_text(source, path))
+                except OSError:
+                    continue
+                self._files[norm] = [key, mtime, size, names]
+                self._dirty = True
+                self.parsed += 1
+            for n in names:
+                defs.setdefault(n, []).append(path)
+        self.defs = defs
+
+    def save(self) -> None:
+        if self._dirty:
+            _save_json(self.path, self._files)
+            self._dirty = False
+
+
+class _RegionIndex:
+    """Regiones top-level (nombre, tipo, líneas) de cada .dart expandido en el árbol.
+
+    Se calculan al expandir el archivo y se cachean en disco por (clave, mtime,
+    tamaño), como el índice de símbolos.
+    """
+
+    def __init__(self, path: str = REGION_CACHE) -> None:
+        self.path = path
+        # ruta normalizada -> [clave, mtime, tamaño, [[nombre, tipo, ini, fin]]]
+        self._files: Dict[str, Any] = _load_json(path)
+        self._dirty = False
+
+    def regions(self, path: str, source: Source) -> List[DartRegion]:
+        key, mtime, size = source.cache_key(path)
+        norm = os.path.normcase(os.path.abspath(path))
+        entry = self._files.get(norm)
+        if entry is not None and entry[:3] == [key, mtime, size]:
+            return [DartRegion(*r) for r in entry[3]]
+        regions = top_level_regions(_read_text(source, path))
+        self._files[norm] = [
+            key,
+            mtime,
+            size,
+            [[r.name, r.kind, r.start, r.end] for r in regions],
+        ]
+        self._dirty = True
+        return regions
+
+    def save(self) -> None:
+        if self._dirty:
+            _save_json(self.path, self._files)
+            self._dirty = False
+
+
+class _PackageIndex:
+    """Dependencias de package_config.json y listados del pub cache, en disco.
+
+    La resolución se cachea por (mtime, tamaño) de package_config.json. Lo que
+    está dentro del pub cache no cambia (cada versión vive en su carpeta), así
+    que cada carpeta se lista una sola vez y queda guardada; solo se listan las
+    que se visitan (el lib/ de los paquetes añadidos), nunca el cache entero.
+    Lo de fuera (dependencias `path:`) se lista siempre del disco.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: str = PACKAGE_CACHE) -> None:
+        self.path = path
+        data = _load_json(path)
+        if data.get("version") != self.VERSION:
+            data = {}
+        # package_config normcase -> {"stamp": [mtime, tamaño], "packages": {...}}
+        self._configs: Dict[str, Any] = data.get("configs", {})
+        self._dirs: Dict[str, List[List[str]]] = data.get("dirs", {})
+        self._lock = threading.Lock()
+        self._cache_prefix = os.path.normcase(pub_cache_dir()) + os.sep
+        self._dirty = False
+        self.listed = 0  # carpetas leídas del disco (no del índice)
+
+    def packages(self, project_root: str) -> Dict[str, DartPackage]:
+        """Dependencias del proyecto por nombre (OSError/ValueError sin `pub get`)."""
+        cfg = os.path.abspath(package_config_path(project_root))
+        st = os.stat(cfg)
+        stamp = [st.st_mtime, st.st_size]
+        key = os.path.normcase(cfg)
+        entry = self._configs.get(key)
+        if entry is not None and entry.get("stamp") == stamp:
+            return {
+                n: DartPackage(n, root, lib)
+                for n, (root, lib) in entry["packages"].items()
+            }
+        pkgs = read_package_config(project_root)
+        self._configs[key] = {
+            "stamp": stamp,
+            "packages": {p.name: [p.root, p.lib] for p in pkgs},
+        }
+        self._dirty = True
+        return {p.name: p for p in pkgs}
+
+    def list_dir(self, path: str) -> Tuple[List[str], List[str]]:
+        """Como WorkTreeSource.list_dir; dentro del pub cache sale del índice."""
+        norm = os.path.normcase(os.path.abspath(path))
+        if not norm.startswith(self._cache_prefix):
+            return WORK_TREE.list_dir(path)
+        with self._lock:
+            hit = self._dirs.get(norm)
+        if hit is None:
+            files, dirs = WORK_TREE.list_dir(path)
+            if not files and not dirs and not os.path.isdir(path):
+                return files, dirs  # no existe: no se cachea
+            hit = [files, dirs]
+            with self._lock:
+                self._dirs[norm] = hit
+                self._dirty = True
+                self.listed += 1
+        return list(hit[0]), list(hit[1])
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {"version": self.VERSION, "configs": self._configs}
+            data["dirs"] = self._dirs
+            self._dirty = False
+        _save_json(self.path, data)
+
+
+def _package_globs(exts: Iterable[str]) -> Tuple[str, ...]:
+    """Patrones (bajo lib/) de un grupo de dependencia: las extensiones activas."""
+    return tuple(f"**/*.{e}" for e in sorted(exts)) or ("**/*",)
+
+
+def _package_rel_base(pkg: DartPackage) -> str:
+    """Base de las rutas del dump: la carpeta que contiene al paquete, así sale
+    `collection-1.18.0/lib/src/x.dart` (nombre y versión)."""
+    return os.path.dirname(pkg.root)
+
+
+class _DartFileIndex:
+    """Por .dart: ¿es generado? y sus enlaces part / part of.
+
+    Cacheado en disco por (clave, mtime, tamaño) como el índice de símbolos: con
+    la caché caliente, decidir la política de generados es solo stat.
+    """
+
+    def __init__(self, path: str = GENERATED_CACHE) -> None:
+        self.path = path
+        # ruta normalizada -> [clave, mtime, tamaño, generado, [partes], part_of]
+        self._files: Dict[str, Any] = _load_json(path)
+        self._dirty = False
+
+    def info(
+        self, path: str, source: Source
+    ) -> Optional[Tuple[bool, List[str], Optional[str]]]:
+        """(generado, partes, librería dueña) o None si no se puede leer."""
+        try:
+            key, mtime, size = source.cache_key(path)
+        except OSError:
+            return None
+        norm = os.path.normcase(os.path.abspath(path))
+        entry = self._files.get(norm)
+        if entry is None or entry[:3] != [key, mtime, size]:
+            try:
+                text = _read_text(source, path)
+            except OSError:
+                return None
+            parts, owner = part_links(text, path)
+            entry = [key, mtime, size, is_generated_dart(path, text), parts, owner]
+            self._files[norm] = entry
+            self._dirty = True
+        return entry[3], entry[4], entry[5]
+
+    def save(self) -> None:
+        if self._dirty:
+            _save_json(self.path, self._files)
+            self._dirty = False
+
+
+def _apply_code_policy(
+    job: RenderJob, opts: RenderOptions, source: Source
+) -> Tuple[RenderJob, Set[str]]:
+    """Ajusta la selección a la política de generados y al enlace de partes.
+
+    Con `link_parts`, una parte entra si y solo si entra su librería (y las
+    partes de una librería marcada se añaden aunque estuvieran desmarcadas).
+    Devuelve el trabajo ajustado y los generados a colapsar (normcase).
+    """
+    if opts.generated == "include" and not opts.link_parts:
+        return job, set()
+    index = _DartFileIndex()
+    roots = [RenderRoot(r.name, r.path, set(r.selected)) for r in job.roots]
+    extras = list(job.extras)
+
+    def selected() -> Set[str]:
+        sel = {p for r in roots for p in r.selected}
+        sel.update(os.path.normcase(a) for a, _, on in extras if on)
+        return {p for p in sel if p.endswith(".dart")}
+
+    if opts.link_parts:
+        libs: Set[str] = set()
+        drop: Set[str] = set()
+        for p in selected():
+            info = index.info(p, source)
+            if info is None:
+                continue
+            if info[2] is None:
+                libs.add(p)
+            elif info[2]:
+                drop.add(p)  # parte: decide su librería
+        for lib in libs:
+            info = index.info(lib, source)
+            for part in info[1] if info else ():
+                drop.discard(part)
+                for r in roots:
+                    root_n = os.path.normcase(os.path.abspath(r.path))
+                    if part.startswith(root_n + os.sep) and source.isfile(part):
+                        r.selected.add(part)
+                        break
+        for r in roots:
+            r.selected -= drop
+        extras = [(a, b, on and os.path.normcase(a) not in drop) for a, b, on in extras]
+
+    generated: Set[str] = set()
+    if opts.generated != "include":
+        for p in selected():
+            info = index.info(p, source)
+            if info is not None and info[0]:
+                generated.add(p)
+        if opts.generated == "exclude":
+            for r in roots:
+                r.selected -= generated
+            extras = [
+                (a, b, on and os.path.normcase(a) not in generated)
+                for a, b, on in extras
+            ]
+            generated = set()
+    index.save()
+    return replace(job, roots=roots, extras=extras), generated
+
+
+class RenderCancelled(Exception):
+    """Generación cancelada: el temporal se borra y `out_path` queda intacto."""
+
+
+def _selected_in_order(
+    job: RenderJob, opts: RenderOptions, source: Source
+) -> Iterator[Tuple[str, str, str]]:
+    """(sección, ruta relativa, ruta absoluta) en el orden del dump."""
+    for abs_path, root_for_rel, sel in job.extras:
+        if sel:
+            rel = os.path.relpath(abs_path, root_for_rel).replace(os.sep, "/")
+            yield "extras", rel, abs_path
+    for root in job.roots:
+        root_abs = os.path.abspath(root.path)
+        if not root.selected or not source.isdir(root_abs):
+            continue
+        stack = [
+            (
+                "",
+                root_abs,
+                _list_tree(
+                    root_abs,
+                    opts.allowed_exts,
+                    opts.excludes,
+                    source.list_dir,
+                ),
+            )
+        ]
+        while stack:
+            prefix, cur, listing = stack.pop()
+            for f in listing.files:
+                fpath = os.path.join(cur, f)
+                if os.path.normcase(fpath) in root.selected:
+                    yield root.name, prefix + f, fpath
+            for d, sub in reversed(listing.dirs):
+                stack.append((f"{prefix}{d}/", os.path.join(cur, d), sub))
+
+
+class _SelectionWriter:
+    """Base de `DumpRenderer` y `ChunkExporter`: opciones, origen, caché de
+    binarios, progreso/cancelación y la escritura atómica de la salida."""
+
+    def __init__(
+        self,
+        opts: RenderOptions,
+        perf: _Perf = _NULL_PERF,
+        sniff: Optional[_SniffCache] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+        cancel: Optional[threading.Event] = None,
+        source: Source = WORK_TREE,
+    ) -> None:
+        self.opts = opts
+        self.source = source
+        self.perf = perf
+        self.sniff = sniff if sniff is not None else _SniffCache()
+        self.progress = progress
+        self.cancel = cancel
+        self.done = 0
+        self.bytes_done = 0
+        self._collapse: Set[str] = set()  # generados a colapsar (normcase)
+
+    def expected_files(self, job: RenderJob) -> int:
+        return sum(len(r.selected) for r in job.roots) + sum(
+            1 for _, _, sel in job.extras if sel
+        )
+
+    def _check_cancel(self) -> None:
+        if self.cancel is not None and self.cancel.is_set():
+            raise RenderCancelled()
+
+    def _report(self) -> None:
+        if self.progress is not None:
+            self.progress(self.done, self.bytes_done)
+
+    @contextmanager
+    def _output(self, job: RenderJob, track: bool = False) -> Iterator[_BufferedWriter]:
+        """Escritor sobre `job.out_path` (y `job.tee`), comprimido según la
+        extensión; los destinos solo se reemplazan si el bloque termina bien."""
+        sink = open_sinks([job.out_path, *job.tee], threads=self.opts.compress_threads)
+        try:
+            fh = text_writer(sink)
+            w = _BufferedWriter(fh, track=track, perf=self.perf)
+            yield w
+            w.flush()
+            with self.perf.phase("write"):
+                fh.flush()
+                sink.commit()
+        except BaseException:
+            sink.abort()
+            raise
+
+
+class DumpRenderer(_SelectionWriter):
+    """Escribe el dump: un solo camino de código para los tres modos de salida.
+
+    Separadores con plantilla precalculada, salida por `_BufferedWriter` y archivo
+    temporal que reemplaza a `out_path` solo al terminar bien. `progress(hechos,
+    bytes)` se llama por archivo (desde el hilo que renderiza) y `cancel` se
+    consulta antes de cada bloque. Las transformaciones (colapsar generados,
+    quitar comentarios) van por `TransformStage`: procesos y caché en disco.
+    """
+
+    def __init__(
+        self,
+        opts: RenderOptions,
+        perf: _Perf = _NULL_PERF,
+        sniff: Optional[_SniffCache] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+        cancel: Optional[threading.Event] = None,
+        source: Source = WORK_TREE,
+        transform_cache: Optional[TransformCache] = None,
+    ) -> None:
+        super().__init__(opts, perf, sniff, progress, cancel, source)
+        self._ch = (opts.sep_char or "-")[0]
+        self._fixed_width = max(20, int(opts.sep_width))
+        self._fill = self._ch * self._fixed_width
+        self._w: Optional[_BufferedWriter] = None
+        self._sidecar: Optional[_SidecarIndex] = None
+        self._with_content = opts.mode != "structure_only"
+        self._skip_unselected = opts.mode == "content_selected"
+        self._regions: Dict[str, Tuple[str, ...]] = {}  # selección parcial
+        self._transforms = set(transforms_for(opts.mode))
+        self._transform_cache = transform_cache
+        self._stage: Optional[TransformStage] = None
+        self._sizes: Dict[str, int] = {}  # tamaño real de lo leído por la etapa
+        self._src_sha1: Dict[str, str] = {}  # hash de la fuente entera (índice lateral)
+
+    # ---- separadores ----
+
+    def separator(self, text: str, is_end: bool) -> str:
+        label = f" {'END ' if is_end else ''}FILE: {text} "
+        if self.opts.sep_auto:
+            width = min(max(len(label) + 6, 60), 120)
+            fill = self._ch * width
+        else:
+            width, fill = self._fixed_width, self._fill
+        start = max(0, width // 2 - len(label) // 2)
+        return f"{fill[:start]}{label}{fill[start + len(label):]}\n"
+
+    # ---- render ----
+
+    def expected_files(self, job: RenderJob) -> int:
+        """Archivos con contenido a escribir (0 = desconocido: solo estructura)."""
+        if not self._with_content:
+            return 0
+        return super().expected_files(job)
+
+    def render(self, job: RenderJob) -> str:
+        """Genera `job.out_path` (y `job.tee`) de forma atómica, comprimido según
+        la extensión. Devuelve la marca GENERADO."""
+        # Los offsets del índice lateral son del texto plano: no valen comprimido
+        index = self.opts.write_index and not compression_for(job.out_path)
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            with self._output(job, track=index) as w:
+                self._w = w
+                self._sidecar = _SidecarIndex(w, self.source) if index else None
+                self._render_body(job, now)
+        finally:
+            self._w = None
+            self._close_stage()
+        if self._sidecar:
+            self._sidecar.save(job.out_path, now, job.project_root)
+            self._sidecar = None
+        self.sniff.save()
+        return now
+
+    def render_to(self, fh: TextIO, job: RenderJob) -> str:
+        """Escribe el dump en `fh` (sin temporal ni índice lateral); p. ej. un StringIO."""
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._w = _BufferedWriter(fh, perf=self.perf)
+        try:
+            self._render_body(job, now)
+            self._w.flush()
+        finally:
+            self._w = None
+            self._close_stage()
+        self.sniff.save()
+        return now
+
+    def _render_body(self, job: RenderJob, now: str) -> None:
+        w = cast(_BufferedWriter, self._w)
+        with self.perf.phase("code_policy"):
+            job, self._collapse = _apply_code_policy(job, self.opts, self.source)
+        self._regions = job.regions
+        self._start_stage(job)
+        w.write(f"GENERADO: {now}\n")
+        w.write(f"PROYECTO: {job.project_root}\n")
+        w.write(f"RAICES: {job.roots_label}\n")
+        if job.revision:
+            w.write(f"REVISION: {job.revision}\n")
+        if (
+            self._with_content
+            and self.opts.strip_comments
+            and "strip_comments" in self._transforms
+        ):
+            # la única transformación que no deja marca en el bloque
+            w.write("TRANSFORMACIONES: strip_comments\n")
+        w.write("=" * 80 + "\n\n")
+
+        # ============ EXTRAS ============
+        if job.extras:
+            w.write("EXTRAS (inicio)\n")
+            w.write("=" * 80 + "\n\n")
+            for abs_path, root_for_rel, is_selected in job.extras:
+                rel = os.path.relpath(abs_path, root_for_rel).replace(os.sep, "/")
+                self._emit_file(abs_path, rel, is_selected, "extras")
+            w.write("\n")
+
+        # ============ POR CADA RAÍZ ============
+        for root in job.roots:
+            root_abs = os.path.abspath(root.path)
+            if not self.source.isdir(root_abs):
+                continue
+            w.write(f"=== RAIZ: {root.name} ===\n\n")
+            with self.perf.phase("fs_walk"):
+                listing = _list_tree(
+                    root_abs,
+                    self.opts.allowed_exts,
+                    self.opts.excludes,
+                    self.source.list_dir,
+                )
+            sel_dirs: Optional[Set[str]] = None
+            if self._skip_unselected:
+                # carpetas con algo seleccionado dentro (ancestros de cada archivo)
+                sel_dirs = set()
+                root_n = os.path.normcase(root_abs)
+                for p in root.selected:
+                    d = os.path.dirname(p)
+                    while d not in sel_dirs and len(d) > len(root_n):
+                        sel_dirs.add(d)
+                        d = os.path.dirname(d)
+            self._emit_dir(listing, root_abs, "", root, sel_dirs)
+
+    # ---- transformaciones ----
+
+    def _chain(self, abs_path: str, rel: str) -> Chain:
+        chain: List[str] = []
+        if self.opts.strip_comments and _file_ext(rel) == "dart":
+            chain.append("strip_comments")
+        norm = os.path.normcase(abs_path)
+        if norm in self._collapse and norm not in self._regions:
+            chain.append("collapse")  # si se eligieron regiones, mandan ellas
+        return tuple(n for n in chain if n in self._transforms)
+
+    def _start_stage(self, job: RenderJob) -> None:
+        """Planifica, en el orden del dump, los archivos que llevan transformación."""
+        if not self._with_content or not (self.opts.strip_comments or self._collapse):
+            return
+        self._stage = TransformStage(
+            self._stage_load,
+            (
+                self._transform_cache
+                if self._transform_cache is not None
+                else TransformCache()
+            ),
+            perf=self.perf,
+        )
+        self._stage.plan(
+            (abs_path, self._chain(abs_path, rel))
+            for _, rel, abs_path in _selected_in_order(job, self.opts, self.source)
+        )
+
+    def _stage_load(self, abs_path: str) -> Optional[str]:
+        try:
+            content, size, binary = self._load(abs_path)
+        except Exception:
+            return None  # _read lo vuelve a intentar y escribe el error
+        if binary:
+            return None
+        self._sizes[abs_path] = size
+        return content
+
+    def _close_stage(self) -> None:
+        if self._stage is not None:
+            self._stage.close()
+            self._stage = None
+        self._sizes.clear()
+        self._src_sha1.clear()
+
+    def _emit_dir(
+        self,
+        listing: _DirListing,
+        cur: str,
+        rel_prefix: str,
+        root: RenderRoot,
+        sel_dirs: Optional[Set[str]],
+    ) -> None:
+        w = cast(_BufferedWriter, self._w)
+        for f in listing.files:
+            fpath = os.path.join(cur, f)
+            selected = os.path.normcase(fpath) in root.selected
+            self._emit_file(fpath, rel_prefix + f, selected, root.name)
+        for d, sub in listing.dirs:
+            subpath = os.path.join(cur, d)
+            if sel_dirs is not None and os.path.normcase(subpath) not in sel_dirs:
+                continue
+            w.write(dir_header(1, d))
+            w.write("\n")
+            self._emit_dir(sub, subpath, f"{rel_prefix}{d}/", root, sel_dirs)
+
+    def _emit_file(self, abs_path: str, rel: str, selected: bool, section: str) -> None:
+        if self._skip_unselected and not selected:
+            return
+        self._check_cancel()
+        w = cast(_BufferedWriter, self._w)
+        idx = self._sidecar
+        header = os.path.basename(rel) if self.opts.filename_only else rel
+        block = idx.start(section, rel, abs_path) if idx else None
+        w.write(self.separator(header, is_end=False))
+        if idx and block:
+            idx.content_start(block)
+        if selected and self._with_content:
+            content = self._read(abs_path, rel, self._chain(abs_path, rel))
+            w.write(content)
+            if idx and block:
+                idx.content_end(block, content, self._src_sha1.pop(abs_path, None))
+            if self.opts.sep_print_end:
+                w.write("\n")
+            self.done += 1
+            self.bytes_done += len(content)
+        elif not self._with_content:
+            self.done += 1
+        if self.opts.sep_print_end:
+            w.write(self.separator(header, is_end=True))
+        if idx and block:
+            idx.finish(block, self.opts.sep_print_end)
+        w.write("\n")
+        self._report()
+
+    def _load(self, abs_path: str) -> Tuple[str, int, bool]:
+        """(texto UTF-8 con saltos normalizados, tamaño, binario), hasta el límite.
+
+        Con selección parcial, el texto es el de las regiones elegidas (con
+        marcas en lo omitido) y el límite se aplica a eso, no al archivo.
+        """
+        perf = self.perf
+        regions = self._regions.get(os.path.normcase(abs_path))
+        limit = 0 if regions else self.opts.max_file_bytes
+        data = b""
+        with perf.phase("read"):
+            key, mtime, size = self.source.cache_key(abs_path)
+            binary = self.sniff.known_binary(key, mtime, size)
+            if not binary:
+                with self.source.open(abs_path) as fh:
+                    head = fh.read(SNIFF_BYTES)
+                    binary = _looks_binary(head)
+                    self.sniff.remember(key, mtime, size, binary)
+                    if not binary and not limit:
+                        data = head + fh.read()
+                    elif not binary:
+                        data = (head + fh.read(max(0, limit - len(head))))[:limit]
+        if binary:
+            return "", size, True
+        content = _decode_text(data)
+        if self._sidecar is not None:
+            # el diff contra el árbol compara con la fuente, no con lo escrito
+            if limit and size > limit:
+                with perf.phase("read"), self.source.open(abs_path) as fh:
+                    full = _decode_text(fh.read())
+            else:
+                full = content
+            self._src_sha1[abs_path] = hashlib.sha1(full.encode("utf-8")).hexdigest()
+        if regions:
+            with perf.phase("regions"):
+                content = select_regions(content, regions)
+            perf.count("regions_selected")
+            data = content.encode("utf-8")
+            size, limit = len(data), self.opts.max_file_bytes
+            if limit and size > limit:
+                content = data[:limit].decode("utf-8", errors="ignore")
+        return content, size, False
+
+    def _read(self, abs_path: str, rel: str, chain: Chain = ()) -> str:
+        """Lee en UTF-8 con saltos normalizados, límites y binarios omitidos.
+
+        `chain`: transformaciones a aplicar (ya calculadas si la etapa las tenía).
+        """
+        perf = self.perf
+        limit = self.opts.max_file_bytes
+        t0 = time.perf_counter()
+        done = self._stage.take(abs_path) if self._stage and chain else None
+        if done is not None:
+            content, size = done, self._sizes.pop(abs_path, 0)
+        else:
+            try:
+                content, size, binary = self._load(abs_path)
+            except Exception as e:
+                return f"[ERROR al leer el archivo: {e}]\n"
+            if binary:
+                perf.count("binary_skipped")
+                return f"[BINARIO omitido: {size} bytes]\n"
+            if chain:
+                with perf.phase("transform"):
+                    content = apply_chain(chain, content)
+        if "collapse" in chain:
+            perf.count("collapsed")
+
+        marker = ""
+        max_lines = self.opts.max_file_lines
+        if max_lines:
+            pos = -1
+            for _ in range(max_lines):
+                pos = content.find("\n", pos + 1)
+                if pos < 0:
+                    break
+            if 0 <= pos < len(content) - 1:
+                content = content[: pos + 1]
+                marker = f"[… TRUNCADO a {max_lines} líneas]\n"
+        if not marker and limit and size > limit and "collapse" not in chain:
+            # Colapsado, el tamaño original no dice nada de lo que se escribe
+            marker = f"[… TRUNCADO a {limit} de {size} bytes]\n"
+        if marker:
+            perf.count("truncated")
+            if content and not content.endswith("\n"):
+                content += "\n"
+            content += marker
+        perf.count("files_read")
+        perf.file_done(rel, time.perf_counter() - t0, len(content))
+        return content
+
+
+# ---------- Exportación JSONL por trozos (índices de embeddings / RAG) ----------
+
+CHUNK_MAX_CHARS = 4000
+CHUNK_STATE_SUFFIX = ".state.json"
+
+
+class ChunkExporter(_SelectionWriter):
+    """Escribe la selección como JSONL: un registro por trozo de archivo.
+
+    Los .dart se cortan en límites de declaración (dart_analysis.dart_chunks); el
+    resto, por líneas. Cada registro lleva raíz, ruta relativa, líneas, clase
+    contenedora, símbolos, hash y texto. `<salida>.state.json` guarda los hashes
+    exportados por archivo: al reexportar solo salen los trozos nuevos, más un
+    registro `deleted` por cada trozo que desapareció. Un archivo con la misma
+    clave de origen (ruta/mtime/tamaño u oid) ni se vuelve a leer.
+    """
+
+    def __init__(
+        self,
+        opts: RenderOptions,
+        perf: _Perf = _NULL_PERF,
+        sniff: Optional[_SniffCache] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+        cancel: Optional[threading.Event] = None,
+        source: Source = WORK_TREE,
+        max_chars: int = CHUNK_MAX_CHARS,
+    ) -> None:
+        super().__init__(opts, perf, sniff, progress, cancel, source)
+        self.max_chars = max_chars
+        self.written = 0  # trozos nuevos
+        self.skipped = 0  # trozos sin cambios (no se escriben)
+        self.deleted = 0
+
+    def render(self, job: RenderJob) -> str:
+        """Genera `job.out_path` (atómico) y, si todo salió bien, el estado."""
+        state_path = job.out_path + CHUNK_STATE_SUFFIX
+        old: Dict[str, Any] = _load_json(state_path).get("files", {})
+        new: Dict[str, Any] = {}
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        job, self._collapse = _apply_code_policy(job, self.opts, self.source)
+        with self._output(job) as w:
+            for section, rel, abs_path in _selected_in_order(
+                job, self.opts, self.source
+            ):
+                self._check_cancel()
+                file_id = f"{section}/{rel}"
+                new[file_id] = self._export_file(
+                    w, section, rel, abs_path, old.get(file_id)
+                )
+                self.done += 1
+                self._report()
+            for file_id, prev in old.items():
+                gone = set(prev.get("hashes", ())) - set(
+                    new.get(file_id, {}).get("hashes", ())
+                )
+                section, _, rel = file_id.partition("/")
+                for h in sorted(gone):
+                    self._write(
+                        w,
+                        {"root": section, "path": rel, "hash": h, "deleted": True},
+                    )
+                    self.deleted += 1
+        _save_json(
+            state_path,
+            {"generated": now, "project_root": job.project_root, "files": new},
+        )
+        self.sniff.save()
+        return now
+
+    @staticmethod
+    def _write(w: _BufferedWriter, record: Dict[str, Any]) -> None:
+        w.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _export_file(
+        self,
+        w: _BufferedWriter,
+        section: str,
+        rel: str,
+        abs_path: str,
+        prev: Optional[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        """Escribe los trozos nuevos de un archivo; devuelve su entrada de estado.
+        El avance (`done` y progreso) lo lleva `render` para cualquier salida."""
+        try:
+            key, mtime, size = self.source.cache_key(abs_path)
+        except OSError:
+            return {}
+        stamp = [key, mtime, size]
+        collapse = os.path.normcase(abs_path) in self._collapse
+        if collapse:
+            # cambiar la política (o la versión de `collapse`) re-exporta el archivo
+            stamp.append(chain_signature(("collapse",)))
+        if prev is not None and prev.get("key") == stamp:
+            self.skipped += len(prev.get("hashes", ()))
+            return prev
+        with self.perf.phase("read"):
+            if self.sniff.known_binary(key, mtime, size):
+                return {"key": stamp, "hashes": []}
+            with self.source.open(abs_path) as fh:
+                data = fh.read()
+            binary = _looks_binary(data[:SNIFF_BYTES])
+            self.sniff.remember(key, mtime, size, binary)
+        if binary:
+            return {"key": stamp, "hashes": []}
+        text = data.decode("utf-8", errors="ignore")
+        if "\r" in text:
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+        if collapse:
+            text = collapse_to_signatures(text)
+        with self.perf.phase("chunk"):
+            chunks = (
+                dart_chunks(text, self.max_chars)
+                if _file_ext(rel) == "dart"
+                else line_chunks(text, self.max_chars)
+            )
+        known = set(prev.get("hashes", ())) if prev else set()
+        hashes: List[str] = []
+        for c in chunks:
+            h = hashlib.sha1(c.text.encode("utf-8")).hexdigest()
+            hashes.append(h)
+            if h in known:
+                self.skipped += 1
+                continue
+            self._write(
+                w,
+                {
+                    "root": section,
+                    "path": rel,
+                    "start_line": c.start,
+                    "end_line": c.end,
+                    "class": c.enclosing or None,
+                    "symbols": c.symbols,
+                    "hash": h,
+                    "text": c.text,
+                },
+            )
+            self.written += 1
+        self.bytes_done += len(data)
+        self.perf.count("files_read")
+        return {"key": stamp, "hashes": hashes}
+
+
+# ---------- Glob multi-patrón para EXTRAS ----------
+
+# Carpetas pesadas de plataforma que `**` no recorre (además de las exclusiones).
+GLOB_PRUNE_DIRS: FrozenSet[str] = frozenset({"Pods", "node_modules"})
+
+_GLOB_FLAGS = re.IGNORECASE if os.name == "nt" else 0
+
+
+def split_glob_patterns(text: str) -> List[str]:
+    """'a/**/*.dart, !**/*.g.dart' -> ['a/**/*.dart', '!**/*.g.dart']
+
+    Los absolutos ('/x/**', 'C:/x/**') se conservan: `relative_glob_patterns`.
+    """
+    out: List[str] = []
+    for raw in text.split(","):
+        pat = raw.strip().replace("\\", "/")
+        neg = pat.startswith("!")
+        pat = pat[1:].strip() if neg else pat
+        while pat.startswith("./"):
+            pat = pat[2:]
+        pat = pat.rstrip("/")
+        if pat:
+            out.append(("!" if neg else "") + pat)
+    return out
+
+
+def relative_glob_patterns(
+    patterns: List[str], project_root: str
+) -> Tuple[List[str], List[str]]:
+    """(patrones relativos al proyecto, absolutos que quedan fuera de él).
+
+    Un absoluto dentro del proyecto pasa a relativo; los grupos glob se evalúan
+    siempre desde la raíz del proyecto.
+    """
+    proj = os.path.abspath(project_root)
+    out: List[str] = []
+    outside: List[str] = []
+    for pat in patterns:
+        neg = pat.startswith("!")
+        body = pat[1:] if neg else pat
+        if os.path.isabs(body) or re.match(r"[A-Za-z]:/", body):
+            try:
+                rel = os.path.relpath(body, proj).replace(os.sep, "/")
+            except ValueError:  # otra unidad (Windows)
+                rel = ".."
+            if rel == ".." or rel.startswith("../"):
+                outside.append(pat)
+                continue
+            body = "" if rel == "." else rel
+        if body:
+            out.append(("!" if neg else "") + body)
+    return out, outside
+
+
+def _glob_segment_regex(seg: str) -> str:
+    """Un segmento sin '/': '*' y '?' no cruzan carpetas ni encuentran ocultos."""
+    out: List[str] = []
+    i, n = 0, len(seg)
+    if seg[:1] in ("*", "?", "["):
+        out.append(r"(?!\.)")
+    while i < n:
+        c = seg[i]
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            j = seg.find("]", i + 2)
+            if j < 0:
+                out.append(re.escape(c))
+            else:
+                body = seg[i + 1 : j]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body.replace(chr(92), chr(92) * 2)}]")
+                i = j
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+class _GlobPattern:
+    def __init__(self, raw: str) -> None:
+        self.negate = raw.startswith("!")
+        self.segs = (raw[1:] if self.negate else raw).split("/")
+        self.globstar = "**" in self.segs
+        # segmentos de carpeta antes del primer '**' (o todos menos el último)
+        head = self.segs[: self.segs.index("**")] if self.globstar else self.segs[:-1]
+        self.head = head
+        self.head_re = [
+            re.compile(_glob_segment_regex(h) + r"\Z", _GLOB_FLAGS) for h in head
+        ]
+        parts: List[str] = []
+        last = len(self.segs) - 1
+        for i, seg in enumerate(self.segs):
+            if seg == "**":
+                star = r"(?:[^/.][^/]*/)*"
+                parts.append(star + r"[^/.][^/]*" if i == last else star)
+            else:
+                parts.append(_glob_segment_regex(seg) + ("" if i == last else "/"))
+        self.regex = re.compile("".join(parts) + r"\Z", _GLOB_FLAGS)
+        # '!carpeta/**' descarta la carpeta completa (se puede podar)
+        self.prunes_dir = (
+            self.negate and self.segs[-1] == "**" and not ("**" in self.segs[:-1])
+        )
+
+    def enters(self, dsegs: List[str], pruned: FrozenSet[str]) -> bool:
+        """¿Puede haber coincidencias bajo la carpeta `dsegs`?"""
+        for i, name in enumerate(dsegs):
+            if i < len(self.head):
+                if not self.head_re[i].match(name):
+                    return False
+                if name in pruned and self.head[i] != name:
+                    return False  # excluida salvo que el patrón la nombre literal
+            elif not self.globstar or name.startswith(".") or name in pruned:
+                return False
+        return True
+
+    def covers_dir(self, dsegs: List[str]) -> bool:
+        return len(dsegs) >= len(self.head) and all(
+            r.match(name) for r, name in zip(self.head_re, dsegs)
+        )
+
+
+class GlobSet:
+    """Varios patrones glob (con negación '!') evaluados en una sola pasada scandir.
+
+    Gana el último patrón que coincide (como .gitignore). `**` cruza carpetas; los
+    comodines no encuentran nombres ocultos (igual que glob.glob). Las carpetas
+    excluidas se podan antes de bajar, salvo que un patrón las nombre literalmente.
+    """
+
+    def __init__(self, patterns: Iterable[str]) -> None:
+        self.patterns = [_GlobPattern(p) for p in patterns]
+        # índice del último patrón positivo (las negaciones posteriores podan)
+        self._last_pos = max(
+            (i for i, p in enumerate(self.patterns) if not p.negate), default=-1
+        )
+
+    def match(self, rel: str) -> bool:
+        hit = False
+        for p in self.patterns:
+            if p.negate == hit and p.regex.match(rel):
+                hit = not p.negate
+        return hit
+
+    def _enters(self, dsegs: List[str], pruned: FrozenSet[str]) -> bool:
+        for i in range(len(self.patterns) - 1, self._last_pos, -1):
+            p = self.patterns[i]
+            if p.prunes_dir and p.covers_dir(dsegs):
+                return False
+        return any(not p.negate and p.enters(dsegs, pruned) for p in self.patterns)
+
+    def walk(
+        self,
+        base: str,
+        excludes: Iterable[str] = (),
+        list_dir: Callable[[str], Tuple[List[str], List[str]]] = _list_dir,
+    ) -> List[str]:
+        """Rutas absolutas (orden casefold) de los archivos bajo `base` que coinciden."""
+        pruned = frozenset(excludes) | GLOB_PRUNE_DIRS
+        found: List[str] = []
+
+        def rec(path: str, dsegs: List[str]) -> None:
+            files, dirs = list_dir(path)
+            prefix = "".join(f"{d}/" for d in dsegs)
+            for f in files:
+                if self.match(prefix + f):
+                    found.append(os.path.join(path, f))
+            for d in dirs:
+                sub = dsegs + [d]
+                if self._enters(sub, pruned):
+                    rec(os.path.join(path, d), sub)
+
+        if self._last_pos >= 0:
+            rec(os.path.abspath(base), [])
+        return sorted_casefold(found)
+
+
+@lru_cache(maxsize=64)
+def compile_globs(patterns: Tuple[str, ...]) -> GlobSet:
+    return GlobSet(patterns)
+
+
+def discover_packages(
+    project_root: str,
+    excludes: Iterable[str] = (),
+    list_dir: Callable[[str], Tuple[List[str], List[str]]] = _list_dir,
+) -> List[str]:
+    """Carpetas con pubspec.yaml, relativas al proyecto con "/" ("" = la raíz)."""
+    found = compile_globs(("**/pubspec.yaml",)).walk(project_root, excludes, list_dir)
+    rels = [
+        os.path.relpath(os.path.dirname(p), project_root).replace(os.sep, "/")
+        for p in found
+    ]
+    return sorted_casefold("" if r == "." else r for r in rels)
+
+
+# ---------- Perfil -> trabajo de render (sin Tk; lo usa dump_daemon.py) ----------
+
+
+def _generated_policy(value: str) -> str:
+    """Clave de política válida (acepta también el texto del combo)."""
+    if value in GENERATED_POLICIES:
+        return value
+    for key, text in GENERATED_POLICIES.items():
+        if text == value:
+            return key
+    return "include"
+
+
+def profile_render_options(opts: Dict[str, Any]) -> RenderOptions:
+    """Opciones de un perfil (o de las preferencias) como RenderOptions."""
+    return RenderOptions(
+        mode=str(opts.get("output_mode", "content_selected")),
+        filename_only=bool(opts.get("filename_only", False)),
+        sep_char=(str(opts.get("sep_char", "-")) or "-")[0],
+        sep_width=int(opts.get("sep_width", 80)),
+        sep_auto=bool(opts.get("sep_auto", False)),
+        sep_print_end=bool(opts.get("sep_print_end", True)),
+        allowed_exts=frozenset(
+            parse_ext_list(str(opts.get("extensions", DEFAULT_EXTENSIONS)))
+        ),
+        excludes=frozenset(
+            parse_name_list(str(opts.get("excludes", DEFAULT_EXCLUDES)))
+        ),
+        write_index=bool(opts.get("write_index", False)),
+        max_file_bytes=max(0, int(opts.get("max_file_kb", 0))) * 1024,
+        max_file_lines=max(0, int(opts.get("max_file_lines", 0))),
+        compress_threads=(
+            os.cpu_count() or 1 if opts.get("compress_parallel", False) else 0
+        ),
+        generated=_generated_policy(str(opts.get("generated_policy", "include"))),
+        link_parts=bool(opts.get("link_parts", False)),
+        strip_comments=bool(opts.get("strip_comments", False)),
+    )
+
+
+def _profile_roots(
+    payload: Dict[str, Any], source: Source
+) -> Tuple[str, Dict[str, Any], RenderOptions, List[Tuple[str, str, List[str]]]]:
+    """Proyecto, opciones y (raíz, ruta, archivos) de las raíces del perfil."""
+    proj = os.path.abspath(str(payload.get("project_root") or "."))
+    opts = dict(payload.get("options", {}))
+    ropts = profile_render_options(opts)
+    roots = parse_root_list(str(opts.get("source_roots", DEFAULT_SOURCE_ROOTS)))
+    if opts.get("workspace"):
+        roots = [
+            f"{pkg}/{r}" if pkg else r
+            for pkg in discover_packages(proj, ropts.excludes, source.list_dir)
+            for r in roots
+        ]
+    out: List[Tuple[str, str, List[str]]] = []
+    for name in roots:
+        root_path = os.path.join(proj, name)
+        if not source.isdir(root_path):
+            continue
+        files: List[str] = []
+        stack = [
+            (
+                root_path,
+                _list_tree(
+                    root_path, ropts.allowed_exts, ropts.excludes, source.list_dir
+                ),
+            )
+        ]
+        while stack:
+            cur, listing = stack.pop()
+            files.extend(os.path.join(cur, f) for f in listing.files)
+            stack.extend((os.path.join(cur, d), sub) for d, sub in listing.dirs)
+        out.append((name, root_path, files))
+    return proj, opts, ropts, out
+
+
+def profile_file_index(
+    payload: Dict[str, Any], source: Source = WORK_TREE
+) -> FileIndex:
+    """Índice de archivos (rutas relativas al proyecto) de las raíces del perfil."""
+    proj, _, _, roots = _profile_roots(payload, source)
+    return FileIndex(
+        os.path.relpath(f, proj).replace(os.sep, "/")
+        for _, _, files in roots
+        for f in files
+    )
+
+
+def profile_render_job(
+    payload: Dict[str, Any], out_path: str = "", source: Source = WORK_TREE
+) -> Tuple[RenderOptions, RenderJob]:
+    """Lo mismo que aplicar el perfil en la GUI y generar, pero sin árbol Tk.
+
+    Raíces (y workspace) de las opciones, reglas de selección evaluadas por
+    archivo, regiones de los archivos parciales y grupos EXTRAS (los glob se
+    re-evalúan).
+    """
+    proj, opts, ropts, roots = _profile_roots(payload, source)
+    selects = _payload_selects(payload)
+    render_roots = [
+        RenderRoot(
+            name,
+            root_path,
+            {
+                os.path.normcase(os.path.abspath(f))
+                for f in files
+                if selects(os.path.relpath(f, proj).replace(os.sep, "/"))
+            },
+        )
+        for name, root_path, files in roots
+    ]
+
+    extras: List[Tuple[str, str, bool]] = []
+    packages: Optional[Dict[str, DartPackage]] = None
+    pkg_index: Optional[_PackageIndex] = None
+    for group in payload.get("extras_groups", []):
+        globs = tuple(str(g) for g in group.get("globs") or [])
+        pkg_name = str(group.get("package") or "")
+        if pkg_name:
+            if pkg_index is None:
+                pkg_index = _PackageIndex()
+                try:
+                    packages = pkg_index.packages(proj)
+                except (OSError, ValueError):
+                    packages = {}
+            pkg = (packages or {}).get(pkg_name)
+            if pkg is None:
+                continue  # ya no es dependencia (o falta `pub get`)
+            off = {str(r) for r in group.get("files_off") or []}
+            base = _package_rel_base(pkg)
+            for m in compile_globs(globs or _package_globs(ropts.allowed_exts)).walk(
+                pkg.lib, ropts.excludes, pkg_index.list_dir
+            ):
+                rel = os.path.relpath(m, pkg.lib).replace(os.sep, "/")
+                extras.append((m, base, rel not in off))
+            continue
+        if globs:
+            off = {str(r) for r in group.get("files_off") or []}
+            for m in compile_globs(globs).walk(proj, ropts.excludes, source.list_dir):
+                rel = os.path.relpath(m, proj).replace(os.sep, "/")
+                extras.append((m, proj, rel not in off))
+            continue
+        for rel in sorted_casefold(str(r) for r in group.get("files") or []):
+            abs_path = os.path.abspath(os.path.join(proj, rel))
+            if source.isfile(abs_path):
+                extras.append((abs_path, proj, True))
+
+    if pkg_index is not None:
+        pkg_index.save()
+    regions: Dict[str, Tuple[str, ...]] = {}
+    for rel, names in (payload.get("regions") or {}).items():
+        norm = os.path.normcase(os.path.abspath(os.path.join(proj, rel)))
+        if names and any(norm in r.selected for r in render_roots):
+            regions[norm] = tuple(str(n) for n in names)
+    job = RenderJob(
+        project_root=proj,
+        roots_label=(
+            ",".join(r.name for r in render_roots)
+            if opts.get("workspace")
+            else str(opts.get("source_roots", DEFAULT_SOURCE_ROOTS)).strip()
+        ),
+        extras=extras,
+        roots=render_roots,
+        out_path=out_path,
+        regions=regions,
+    )
+    return ropts, job
+
+
+# ---------- Filtro del árbol (índice de rutas) ----------
+
+
+class PathIndex:
+    """Índice de trigramas sobre rutas para filtrar el árbol al teclear.
+
+    Consulta: palabras separadas por espacio (todas deben aparecer como subcadena);
+    con '~' delante, búsqueda difusa (las letras en orden, no contiguas). Si la
+    consulta nueva extiende la anterior, se filtra el resultado previo.
+    """
+
+    def __init__(self, entries: List[Tuple[str, str]]) -> None:
+        self.ids = [i for i, _ in entries]
+        self.paths = [p.casefold() for _, p in entries]
+        grams: Dict[str, List[int]] = {}
+        for n, p in enumerate(self.paths):
+            for g in {p[i : i + 3] for i in range(len(p) - 2)}:
+                grams.setdefault(g, []).append(n)
+        self._grams = grams
+        self._last_query = ""
+        self._last_hits: List[int] = []
+
+    def _candidates(self, terms: List[str]) -> Optional[Set[int]]:
+        """Posiciones que contienen todos los trigramas (None = sin trigramas)."""
+        lists = [
+            self._grams.get(t[i : i + 3], []) for t in terms for i in range(len(t) - 2)
+        ]
+        if not lists:
+            return None
+        lists.sort(key=len)
+        cand = set(lists[0])
+        for lst in lists[1:]:
+            if not cand:
+                break
+            cand.intersection_update(lst)
+        return cand
+
+    def search(self, query: str) -> List[int]:
+        """Posiciones (en orden del árbol) de las rutas que cumplen la consulta."""
+        q = query.casefold().strip()
+        if not q:
+            return []
+        if self._last_query and q.startswith(self._last_query):
+            base: Iterable[int] = self._last_hits
+        else:
+            base = range(len(self.paths))
+        paths = self.paths
+        if q.startswith("~"):
+            chars = q[1:].replace(" ", "")
+            rx = re.compile(".*?".join(re.escape(c) for c in chars))
+            hits = [n for n in base if rx.search(paths[n])]
+        else:
+            terms = q.split()
+            cand = self._candidates(terms)
+            if cand is not None:
+                base = sorted(cand.intersection(base))
+            hits = [n for n in base if all(t in paths[n] for t in terms)]
+        self._last_query, self._last_hits = q, hits
+        return hits
+
+
+class FilterTreeview(ttk.Treeview):
+    """Treeview que oculta ramas (detach) sin que el resto del código lo note.
+
+    Con el filtro activo `get_children` sigue devolviendo los hijos completos; lo
+    que se ve sale de `visible_children`. Insertar o borrar quita el filtro.
+    """
+
+    def __init__(self, master: tk.Misc, **kw: Any) -> None:
+        super().__init__(master, **kw)
+        self._full: Dict[str, Tuple[str, ...]] = {}  # carpeta -> hijos originales
+        self._shown: Dict[str, Tuple[str, ...]] = {}  # carpeta -> hijos visibles
+        self._opened: List[str] = []  # carpetas abiertas por el filtro
+        self.on_structure_change: Optional[Callable[[bool], None]] = None
+
+    @property
+    def filtered(self) -> bool:
+        return bool(self._full)
+
+    def get_children(self, item: Optional[str] = None) -> Tuple[str, ...]:
+        full = self._full.get(item or "")
+        return full if full is not None else super().get_children(item)
+
+    def visible_children(self, item: str = "") -> Tuple[str, ...]:
+        return super().get_children(item)
+
+    def insert(
+        self, parent: str, index: Any, iid: Optional[str] = None, **kw: Any
+    ) -> str:
+        self._structure_changed()
+        return super().insert(parent, index, iid, **kw)
+
+    def delete(self, *items: str) -> None:
+        self._structure_changed()
+        super().delete(*items)
+
+    def insert_leaf(self, parent: str, index: Any, **kw: Any) -> str:
+        """Inserta bajo un archivo (regiones): el filtro no los indexa, se conserva."""
+        return super().insert(parent, index, **kw)
+
+    def delete_leaf(self, item: str) -> None:
+        """Borra un hijo de archivo (el "…" de regiones) sin quitar el filtro."""
+        super().delete(item)
+
+    def _structure_changed(self) -> None:
+        was_filtered = self.filtered
+        if was_filtered:
+            self.clear_filter()
+        if self.on_structure_change:
+            self.on_structure_change(was_filtered)
+
+    def show_only(
+        self,
+        visible: Set[str],
+        dirs: Set[str],
+        children_of: Dict[str, Tuple[str, ...]],
+    ) -> None:
+        """Deja visibles solo `visible` bajo cada carpeta de `dirs`.
+
+        Un `set_children` por carpeta cuyo contenido visible cambia; las
+        carpetas tocadas antes y que ya no están en `dirs` se restauran.
+        """
+        for d in [d for d in self._full if d not in dirs]:
+            super().set_children(d, *self._full.pop(d))
+            self._shown.pop(d, None)
+        for d in dirs:
+            full = self._full.get(d, children_of.get(d, ()))
+            keep = tuple(c for c in full if c in visible)
+            if keep == self._shown.get(d, full):
+                continue
+            super().set_children(d, *keep)
+            if keep == full:
+                self._full.pop(d, None)
+                self._shown.pop(d, None)
+            else:
+                self._full[d] = full
+                self._shown[d] = keep
+            if keep and not self.item(d, "open"):
+                self.item(d, open=True)
+                self._opened.append(d)
+
+    def clear_filter(self) -> None:
+        for d, full in self._full.items():
+            super().set_children(d, *full)
+        self._full.clear()
+        self._shown.clear()
+        for d in self._opened:
+            if self.exists(d):
+                self.item(d, open=False)
+        self._opened.clear()
+
+
+# ---------- Generación en segundo plano ----------
+
+
+@dataclass
+class _GenerateRun:
+    """Estado compartido entre el hilo que renderiza y el sondeo de Tk (after)."""
+
+    job: RenderJob
+    total: int  # 0 = desconocido
+    perf: _Perf
+    verbose: bool
+    mode: str
+    cancel: threading.Event = field(default_factory=threading.Event)
+    started: float = field(default_factory=time.perf_counter)
+    done: int = 0
+    bytes_done: int = 0
+    outcome: Optional[str] = None  # "ok" | "cancelled" | "error"
+    error: Optional[BaseException] = None
+    summary: str = ""  # detalle extra para el mensaje final
+
+    def update(self, done: int, bytes_done: int) -> None:
+        self.done, self.bytes_done = done, bytes_done
+
+    def status(self) -> Tuple[float, str]:
+        """(fracción 0..1 o -1 si no hay total, texto de estado)."""
+        mb = self.bytes_done / (1024 * 1024)
+        text = f"{self.done}/{self.total or '?'} archivos · {mb:.1f} MB"
+        if not self.total:
+            return -1.0, text
+        frac = min(1.0, self.done / self.total)
+        if frac > 0:
+            elapsed = time.perf_counter() - self.started
+            eta = int(elapsed * (1 - frac) / frac)
+            text += f" · ETA {eta // 60}:{eta % 60:02d}"
+        return frac, text
+
+
 # ---------------- GUI principal ----------------
 
 
@@ -435,8 +2769,28 @@ class DartDumpGUI(tk.Tk):
         self.src_root_files_nodes: Dict[str, Dict[str, str]] = (
             {}
         )  # root_name -> (abs -> item id)
+        self.src_root_dir_nodes: Dict[str, Dict[str, str]] = (
+            {}
+        )  # root_name -> (abs dir -> item id)
         self.extras_file_nodes: Dict[str, str] = {}
         self.active_profiles: List[str] = []
+        self._perf: _Perf = _NULL_PERF
+
+        # Filtro del árbol (índice perezoso; se invalida al cambiar la estructura)
+        self._path_index: Optional[PathIndex] = None
+        self._idx_parent: Dict[str, str] = {}
+        self._idx_children: Dict[str, Tuple[str, ...]] = {}
+        self._filter_matches: List[str] = []
+        self._filter_job: Optional[str] = None
+        self._gen_run: Optional[_GenerateRun] = None
+        self._source: Source = WORK_TREE  # se fija en cada escaneo
+        self._scan_sig: Optional[Tuple[Any, ...]] = None  # opciones del último escaneo
+        self._sel_index: Optional[Tuple[FileIndex, List[str]]] = None  # id -> nodo
+        self._symbols: Optional[_SymbolIndex] = None  # perezoso
+        self._packages: Optional[_PackageIndex] = None  # perezoso
+        self._regions: Optional[_RegionIndex] = None  # perezoso
+        self._region_nodes: Dict[str, Dict[str, str]] = {}  # archivo -> símbolo -> nodo
+        self._region_stubs: Dict[str, str] = {}  # .dart sin abrir -> hijo "…"
 
         self._y_first: float = 0.0
         self._y_last: float = 1.0
@@ -458,6 +2812,16 @@ class DartDumpGUI(tk.Tk):
         sep_width_def = int(prefs.get("sep_width", 80))
         sep_auto_def = bool(prefs.get("sep_auto", False))
         sep_end_def = bool(prefs.get("sep_print_end", True))
+        write_index_def = bool(prefs.get("write_index", False))
+        max_file_kb_def = int(prefs.get("max_file_kb", 0))
+        max_file_lines_def = int(prefs.get("max_file_lines", 0))
+        workspace_def = bool(prefs.get("workspace", False))
+        compression_def = prefs.get("compression", "")
+        compress_parallel_def = bool(prefs.get("compress_parallel", False))
+        tee_stdout_def = bool(prefs.get("tee_stdout", False))
+        generated_def = _generated_policy(prefs.get("generated_policy", "include"))
+        link_parts_def = bool(prefs.get("link_parts", False))
+        strip_comments_def = bool(prefs.get("strip_comments", False))
 
         ttk.Label(top, text="Proyecto:").grid(row=0, column=0, sticky="w")
         self.project_var = tk.StringVar(value=project_def)
@@ -474,6 +2838,12 @@ class DartDumpGUI(tk.Tk):
         ttk.Entry(top, textvariable=self.roots_var, width=48).grid(
             row=1, column=1, sticky="w", pady=(6, 0)
         )
+        self.workspace_var = tk.BooleanVar(value=workspace_def)
+        ttk.Checkbutton(
+            top,
+            text="Workspace: raíces dentro de cada pubspec.yaml",
+            variable=self.workspace_var,
+        ).grid(row=1, column=2, sticky="w", pady=(6, 0))
 
         ttk.Label(top, text="Extensiones:").grid(
             row=2, column=0, sticky="w", pady=(6, 0)
@@ -520,14 +2890,56 @@ class DartDumpGUI(tk.Tk):
             row=4, column=2, columnspan=2, sticky="w", padx=(8, 0)
         )
 
+        ttk.Label(top, text="Revisión git:").grid(
+            row=5, column=0, sticky="w", pady=(6, 0)
+        )
+        self.git_rev_var = tk.StringVar(value="")
+        ttk.Entry(top, textvariable=self.git_rev_var, width=24).grid(
+            row=5, column=1, sticky="w", pady=(6, 0)
+        )
+        ttk.Label(
+            top,
+            foreground="#666",
+            text="vacío = árbol de trabajo; p. ej. v1.2.0, origin/pr-12 (se lee sin checkout)",
+        ).grid(row=5, column=2, columnspan=2, sticky="w", pady=(6, 0))
+
         for i in range(4):
             top.grid_columnconfigure(i, weight=1 if i == 1 else 0)
 
+        # ---------- Filtro del árbol ----------
+        filt = ttk.Frame(self, padding=(8, 0, 8, 4))
+        filt.pack(fill="x")
+        ttk.Label(filt, text="Filtrar:").pack(side="left")
+        self.filter_var = tk.StringVar(value="")
+        ttk.Entry(filt, textvariable=self.filter_var, width=40).pack(
+            side="left", padx=(4, 4)
+        )
+        self.filter_var.trace_add("write", self._on_filter_changed)
+        ttk.Label(
+            filt,
+            foreground="#666",
+            text="(palabras = todas; ~ = difuso)",
+        ).pack(side="left")
+        self.filter_status_var = tk.StringVar(value="")
+        ttk.Label(filt, textvariable=self.filter_status_var).pack(
+            side="left", padx=(8, 0)
+        )
+        ttk.Button(filt, text="Limpiar", command=lambda: self.filter_var.set("")).pack(
+            side="right"
+        )
+        ttk.Button(
+            filt, text="Desmarcar filtrados", command=lambda: self.check_filtered(False)
+        ).pack(side="right", padx=2)
+        ttk.Button(
+            filt, text="Marcar filtrados", command=lambda: self.check_filtered(True)
+        ).pack(side="right", padx=2)
+
         # ---------- MID: Árbol + Lado derecho ----------
         mid = ttk.Frame(self, padding=(8, 0, 8, 8))
         mid.pack(fill="both", expand=True)
 
-        self.tree = ttk.Treeview(mid, columns=("dummy",), show="tree")
+        self.tree = FilterTreeview(mid, columns=("dummy",), show="tree")
+        self.tree.on_structure_change = self._on_tree_structure_change
         yscroll = ttk.Scrollbar(mid, orient="vertical")
 
         def _tree_yview(*args: Any) -> None:
@@ -567,6 +2979,8 @@ class DartDumpGUI(tk.Tk):
         self.tree.bind("<Double-1>", self.on_tree_space)
         self.tree.bind("<space>", self.on_tree_space)
         self.tree.bind("<Return>", self.on_tree_space)
+        self.tree.bind("<Right>", self.on_tree_regions)
+        self.tree.bind("<<TreeviewOpen>>", self.on_tree_open)
 
         # Lado derecho: EXTRAS + Perfiles + Salida + Separadores + Preferencias
         right = ttk.Frame(mid)
@@ -586,12 +3000,53 @@ class DartDumpGUI(tk.Tk):
         ttk.Button(
             extras_box, text="Añadir patrón glob…", command=self.add_extra_glob
         ).pack(fill="x", pady=1)
+        ttk.Button(
+            extras_box, text="Añadir paquete (pub)…", command=self.add_extra_package
+        ).pack(fill="x", pady=1)
         ttk.Button(
             extras_box,
             text="Quitar extra seleccionado",
             command=self.remove_extra_selected,
         ).pack(fill="x", pady=(1, 0))
 
+        # --- Solo lo cambiado (git) ---
+        chg_box = ttk.LabelFrame(right, text="Cambios (git)", padding=8)
+        chg_box.pack(fill="x", pady=(0, 6))
+        ttk.Label(chg_box, text="Base:").grid(row=0, column=0, sticky="w")
+        self.changes_base_var = tk.StringVar(value="")
+        ttk.Entry(chg_box, textvariable=self.changes_base_var, width=16).grid(
+            row=0, column=1, sticky="we", padx=(4, 0)
+        )
+        ttk.Label(
+            chg_box, foreground="#666", text="vacío = git status; si no, base...HEAD"
+        ).grid(row=1, column=0, columnspan=2, sticky="w")
+        self.changes_deps_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            chg_box, text="+ dependientes directos", variable=self.changes_deps_var
+        ).grid(row=2, column=0, columnspan=2, sticky="w")
+        ttk.Button(
+            chg_box, text="Seleccionar cambiados", command=self.select_changed
+        ).grid(row=3, column=0, columnspan=2, sticky="we", pady=(4, 0))
+        self.changes_status_var = tk.StringVar(value="")
+        ttk.Label(chg_box, textvariable=self.changes_status_var).grid(
+            row=4, column=0, columnspan=2, sticky="w"
+        )
+        chg_box.grid_columnconfigure(1, weight=1)
+
+        # --- Análisis Dart (índice de símbolos, duplicados) ---
+        ana_box = ttk.LabelFrame(right, text="Análisis Dart", padding=8)
+        ana_box.pack(fill="x", pady=(0, 6))
+        ttk.Button(
+            ana_box,
+            text="Traer definiciones referenciadas",
+            command=self.pull_definitions,
+        ).pack(fill="x")
+        ttk.Button(
+            ana_box, text="Buscar código duplicado…", command=self.find_duplicates_txt
+        ).pack(fill="x", pady=(2, 0))
+        self.analysis_status_var = tk.StringVar(value="")
+        ttk.Label(ana_box, textvariable=self.analysis_status_var).pack(anchor="w")
+
         # --- Perfiles visibles ---
         prof_box = ttk.LabelFrame(right, text="Perfiles", padding=8)
         prof_box.pack(fill="x", pady=(6, 6))
@@ -604,6 +3059,9 @@ class DartDumpGUI(tk.Tk):
         ttk.Button(
             prof_box, text="Activar (multi)…", command=self.activate_profiles_dialog
         ).pack(fill="x", pady=1)
+        ttk.Button(
+            prof_box, text="Combinar (∪ ∩ − △)…", command=self.combine_profiles_dialog
+        ).pack(fill="x", pady=1)
         ttk.Button(prof_box, text="Borrar…", command=self.delete_profile_dialog).pack(
             fill="x", pady=1
         )
@@ -640,6 +3098,71 @@ class DartDumpGUI(tk.Tk):
             value="selected_plus_structure",
             variable=self.output_mode_var,
         ).pack(anchor="w")
+        ttk.Radiobutton(
+            out_box,
+            text="JSONL por trozos (embeddings; solo cambios)",
+            value="jsonl_chunks",
+            variable=self.output_mode_var,
+        ).pack(anchor="w")
+        self.write_index_var = tk.BooleanVar(value=write_index_def)
+        ttk.Checkbutton(
+            out_box,
+            text="Índice lateral (.idx)",
+            variable=self.write_index_var,
+        ).pack(anchor="w", pady=(6, 0))
+        comp_row = ttk.Frame(out_box)
+        comp_row.pack(fill="x", pady=(6, 0))
+        ttk.Label(comp_row, text="Compresión:").pack(side="left")
+        self.compression_var = tk.StringVar(
+            value=(
+                compression_def
+                if compression_def in available_compressions()
+                else NO_COMPRESSION
+            )
+        )
+        ttk.Combobox(
+            comp_row,
+            textvariable=self.compression_var,
+            values=[NO_COMPRESSION, *available_compressions()],
+            state="readonly",
+            width=8,
+        ).pack(side="left", padx=(4, 8))
+        self.compress_parallel_var = tk.BooleanVar(value=compress_parallel_def)
+        ttk.Checkbutton(
+            comp_row, text="Bloques en paralelo", variable=self.compress_parallel_var
+        ).pack(side="left")
+        self.tee_stdout_var = tk.BooleanVar(value=tee_stdout_def)
+        ttk.Checkbutton(
+            out_box,
+            text="Copia también a stdout (para tuberías)",
+            variable=self.tee_stdout_var,
+        ).pack(anchor="w")
+        gen_row = ttk.Frame(out_box)
+        gen_row.pack(fill="x", pady=(6, 0))
+        ttk.Label(gen_row, text="Código generado:").pack(side="left")
+        self.generated_var = tk.StringVar(value=GENERATED_POLICIES[generated_def])
+        ttk.Combobox(
+            gen_row,
+            textvariable=self.generated_var,
+            values=list(GENERATED_POLICIES.values()),
+            state="readonly",
+            width=16,
+        ).pack(side="left", padx=(4, 0))
+        self.link_parts_var = tk.BooleanVar(value=link_parts_def)
+        ttk.Checkbutton(
+            out_box,
+            text="Partes (part / part of) siguen a su librería",
+            variable=self.link_parts_var,
+        ).pack(anchor="w")
+        self.strip_comments_var = tk.BooleanVar(value=strip_comments_def)
+        ttk.Checkbutton(
+            out_box,
+            text="Quitar comentarios de los .dart (no los ///)",
+            variable=self.strip_comments_var,
+        ).pack(anchor="w")
+        ttk.Button(
+            out_box, text="Solo cambios desde dump…", command=self.generate_diff_txt
+        ).pack(fill="x", pady=(6, 0))
 
         # --- Separadores ---
         sep_box = ttk.LabelFrame(right, text="Separadores", padding=8)
@@ -666,6 +3189,20 @@ class DartDumpGUI(tk.Tk):
             row=1, column=0, columnspan=5, sticky="w", pady=(6, 0)
         )
 
+        # --- Límites por archivo (binarios siempre se omiten) ---
+        lim_box = ttk.LabelFrame(right, text="Límites por archivo (0 = sin)", padding=8)
+        lim_box.pack(fill="x", pady=(6, 2))
+        ttk.Label(lim_box, text="Máx. KB:").grid(row=0, column=0, sticky="w")
+        self.max_file_kb_var = tk.IntVar(value=max_file_kb_def)
+        ttk.Spinbox(
+            lim_box, from_=0, to=1 << 20, textvariable=self.max_file_kb_var, width=7
+        ).grid(row=0, column=1, sticky="w", padx=(4, 8))
+        ttk.Label(lim_box, text="Máx. líneas:").grid(row=0, column=2, sticky="w")
+        self.max_file_lines_var = tk.IntVar(value=max_file_lines_def)
+        ttk.Spinbox(
+            lim_box, from_=0, to=1 << 24, textvariable=self.max_file_lines_var, width=7
+        ).grid(row=0, column=3, sticky="w", padx=(4, 0))
+
         # --- BOTTOM ---
         bottom = ttk.Frame(self, padding=8)
         bottom.pack(fill="x")
@@ -678,9 +3215,22 @@ class DartDumpGUI(tk.Tk):
         ttk.Button(bottom, text="Examinar…", command=self.pick_output).grid(
             row=0, column=2, padx=2
         )
-        ttk.Button(bottom, text="GENERAR TXT", command=self.generate_txt).grid(
-            row=0, column=3, padx=8
+        self.generate_btn = ttk.Button(
+            bottom, text="GENERAR TXT", command=self.generate_txt
         )
+        self.generate_btn.grid(row=0, column=3, padx=8)
+
+        # Progreso de la generación (corre en un hilo; se consulta con after)
+        self.gen_progress = ttk.Progressbar(bottom, maximum=1.0)
+        self.gen_progress.grid(row=1, column=1, sticky="we", padx=5, pady=(6, 0))
+        self.gen_status_var = tk.StringVar(value="")
+        ttk.Label(bottom, textvariable=self.gen_status_var).grid(
+            row=1, column=2, sticky="w", pady=(6, 0)
+        )
+        self.gen_cancel_btn = ttk.Button(
+            bottom, text="Cancelar", command=self.cancel_generate, state="disabled"
+        )
+        self.gen_cancel_btn.grid(row=1, column=3, padx=8, pady=(6, 0))
 
         for i in range(4):
             bottom.grid_columnconfigure(i, weight=1 if i == 1 else 0)
@@ -767,7 +3317,11 @@ class DartDumpGUI(tk.Tk):
             return
         cur = self.item_state.get(item, 0)
         is_dirlike = meta.kind in {"root-extras", "root-srcroot", "dir", "extra-group"}
-        if is_dirlike:
+        if is_dirlike and self.tree.filtered:
+            # con filtro: solo los archivos visibles bajo la carpeta
+            under = [m for m in self._filter_matches if item in self._ancestors(m)]
+            self._set_files_state(under, cur != 1)
+        elif is_dirlike or item in self._region_nodes:
             self.set_state_recursive(item, cur != 1)
             self.recompute_parent_states(item)
         else:
@@ -785,6 +3339,8 @@ class DartDumpGUI(tk.Tk):
         self.item_state[item] = state
         base = self.item_meta[item].label
         self.set_item_text(item, base, state)
+        if item in self._region_stubs:
+            return
         for child in self.tree.get_children(item):
             self.set_state_recursive(child, on)
 
@@ -804,38 +3360,460 @@ class DartDumpGUI(tk.Tk):
         self.set_item_text(parent, self.item_meta[parent].label, new)
         self.recompute_parent_states(parent)
 
+    def recompute_states_bottom_up(self, item: str) -> int:
+        """Recalcula estados de carpetas en una sola pasada (post-orden)."""
+        children = self.tree.get_children(item)
+        if not children or item in self._region_stubs:
+            return self.item_state.get(item, 0)
+        states = {self.recompute_states_bottom_up(c) for c in children}
+        new = states.pop() if len(states) == 1 else 2
+        if self.item_state.get(item) != new:
+            self.item_state[item] = new
+            self.set_item_text(item, self.item_meta[item].label, new)
+        return new
+
+    # ------------------- Regiones de un .dart -------------------
+
+    def on_tree_regions(self, event: tk.Event | None = None) -> None:
+        """→ sobre un .dart de las raíces: lo abre en sus declaraciones top-level."""
+        item = self.tree.focus()
+        if item and self._expand_regions(item):
+            self.tree.item(item, open=True)
+            if self._regions is not None:
+                self._regions.save()
+
+    def on_tree_open(self, event: tk.Event | None = None) -> None:
+        """Abrir un .dart con "…" muestra sus declaraciones; abrir una carpeta
+        pone el "…" a sus .dart (solo a los que se ven: no cuesta en el escaneo)."""
+        item = self.tree.focus()
+        if item in self._region_stubs:
+            self.on_tree_regions()
+        elif item:
+            self._add_region_stubs(item)
+
+    def _has_regions(self, item: str) -> bool:
+        """¿Puede abrirse en declaraciones? (.dart de las raíces, marcable)."""
+        meta = self.item_meta.get(item)
+        return (
+            meta is not None
+            and meta.kind == "file"
+            and meta.group != "extras"
+            and meta.selectable
+            and _file_ext(meta.path) == "dart"
+        )
+
+    def _add_region_stubs(self, parent: str) -> None:
+        """Hijo "…" en cada .dart directo de `parent` aún sin abrir: así el árbol
+        muestra que se puede desplegar; `on_tree_open` lo cambia por regiones."""
+        n = 0
+        for ch in self.tree.get_children(parent):
+            if (
+                ch not in self._region_stubs
+                and ch not in self._region_nodes
+                and self._has_regions(ch)
+            ):
+                self._region_stubs[ch] = self.tree.insert_leaf(ch, "end", text="…")
+                n += 1
+        self._perf.count("tk_items", n)
+
+    def _expand_regions(self, item: str) -> Dict[str, str]:
+        """Nodos "region" del archivo (símbolo -> nodo), creados la primera vez.
+
+        Heredan el estado del archivo. {} si no es un .dart de las raíces o no
+        hay nada que elegir (una sola región).
+        """
+        done = self._region_nodes.get(item)
+        if done is not None:
+            return done
+        stub = self._region_stubs.pop(item, None)
+        if stub is not None:
+            self.tree.delete_leaf(stub)
+        if not self._has_regions(item):
+            return {}
+        meta = self.item_meta[item]
+        if self._regions is None:
+            self._regions = _RegionIndex()
+        try:
+            with self._perf.phase("regions"):
+                regions = self._regions.regions(meta.path, self._source)
+        except OSError:
+            return {}
+        if len(regions) < 2:
+            return {}
+        state = self.item_state.get(item, 0)
+        nodes: Dict[str, str] = {}
+        for r in regions:
+            label = _region_label(r)
+            node = self.tree.insert_leaf(
+                item, "end", text=f"{CHECK_ON if state else CHECK_OFF} {label}"
+            )
+            self.item_meta[node] = NodeMeta(
+                "region", meta.path, meta.root_for_rel, meta.group, label, symbol=r.name
+            )
+            self.item_state[node] = state
+            nodes[r.name] = node
+        self._perf.count("tk_items", len(nodes))
+        self._region_nodes[item] = nodes
+        return nodes
+
+    def _partial_regions(self) -> Dict[str, List[str]]:
+        """Archivos con solo algunas declaraciones marcadas: ruta -> símbolos."""
+        return {
+            self.item_meta[f].path: [
+                sym for sym, n in nodes.items() if self.item_state.get(n) == 1
+            ]
+            for f, nodes in self._region_nodes.items()
+            if self.item_state.get(f) == 2
+        }
+
+    def _apply_regions(self, regions: Dict[str, List[str]]) -> None:
+        """Deja marcadas solo las declaraciones `regions` (ruta relativa al
+        proyecto -> símbolos) de cada archivo marcado.
+
+        Por nombre, así sobreviven a ediciones; si ya no existe ninguno, el
+        archivo queda entero (como al generar).
+        """
+        if not regions:
+            return
+        index, nodes = self._selection_index()
+        with self._perf.phase("apply_regions"):
+            for rel, names in regions.items():
+                i = index.ids.get(rel)
+                if i is None or self.item_state.get(nodes[i]) != 1:
+                    continue
+                children = self._expand_regions(nodes[i])
+                wanted = {str(n) for n in names}
+                if not wanted & children.keys():
+                    continue
+                for sym, node in children.items():
+                    state = 1 if sym in wanted else 0
+                    self.item_state[node] = state
+                    self.set_item_text(node, self.item_meta[node].label, state)
+                self.recompute_parent_states(next(iter(children.values())))
+        if self._regions is not None:
+            self._regions.save()
+
     def toggle_all(self, on: bool) -> None:
         for root in list(self.src_roots_nodes.values()) + [self.extras_root]:
             self.set_state_recursive(root, on)
 
-    def expand_collapse_all(self, expand: bool) -> None:
-        def _walk(it: str) -> None:
-            self.tree.item(it, open=expand)
-            for ch in self.tree.get_children(it):
-                _walk(ch)
+    def expand_collapse_all(self, expand: bool) -> None:
+        def _walk(it: str) -> None:
+            if it in self._region_stubs:
+                return  # sin abrir aún: se despliega a mano
+            self.tree.item(it, open=expand)
+            if expand:
+                self._add_region_stubs(it)
+            for ch in self.tree.get_children(it):
+                _walk(ch)
+
+        for root in list(self.src_roots_nodes.values()) + [self.extras_root]:
+            _walk(root)
+
+    # ------------------- Filtro -------------------
+
+    def _on_tree_structure_change(self, was_filtered: bool) -> None:
+        self._path_index = None
+        if was_filtered:
+            self._filter_matches = []
+            self.filter_var.set("")
+
+    def _on_filter_changed(self, *_: Any) -> None:
+        if self._filter_job is not None:
+            self.after_cancel(self._filter_job)
+        self._filter_job = self.after(120, self.apply_filter)
+
+    def _build_path_index(self) -> PathIndex:
+        """Rutas de archivos (relativas al proyecto) + padres/hijos del árbol."""
+        proj = self.project_var.get().strip()
+        entries: List[Tuple[str, str]] = []
+        self._idx_parent = {}
+        self._idx_children = {}
+
+        def walk(it: str) -> None:
+            children = self.tree.get_children(it)
+            self._idx_children[it] = children
+            for ch in children:
+                self._idx_parent[ch] = it
+                meta = self.item_meta.get(ch)
+                if meta is None:
+                    continue
+                if meta.kind != "file":
+                    walk(ch)
+                elif meta.selectable:
+                    rel = os.path.relpath(meta.path, proj) if proj else meta.path
+                    entries.append((ch, rel.replace(os.sep, "/")))
+
+        walk("")
+        return PathIndex(entries)
+
+    def _ancestors(self, item: str) -> Iterator[str]:
+        """Carpetas sobre `item`. Sin índice no hay filtro (que lo construye) y
+        Tk sabe los padres; con filtro, lo oculto solo está en el índice."""
+        if self._path_index is None:
+            p = self.tree.parent(item)
+            while p:
+                yield p
+                p = self.tree.parent(p)
+            return
+        p = self._idx_parent.get(item, "")
+        while p:
+            yield p
+            p = self._idx_parent.get(p, "")
+
+    def apply_filter(self) -> None:
+        self._filter_job = None
+        query = self.filter_var.get().strip()
+        if not query:
+            self.tree.clear_filter()
+            self._filter_matches = []
+            self.filter_status_var.set("")
+            return
+        if self._path_index is None:
+            self._path_index = self._build_path_index()
+        idx = self._path_index
+        matches = [idx.ids[n] for n in idx.search(query)]
+        dirs: Set[str] = set(self._idx_children.get("", ()))
+        for m in matches:
+            for a in self._ancestors(m):
+                if a in dirs and self._idx_parent.get(a, "") in dirs:
+                    break
+                dirs.add(a)
+        self.tree.show_only(dirs | set(matches), dirs, self._idx_children)
+        self._filter_matches = matches
+        self.filter_status_var.set(f"{len(matches)} archivo(s)")
+
+    def check_filtered(self, on: bool) -> None:
+        """Marca/desmarca solo lo filtrado (sin recorrer lo oculto); sin filtro, todo."""
+        if not self.tree.filtered:
+            self.toggle_all(on)
+            return
+        self._set_files_state(self._filter_matches, on)
+
+    def _set_files_state(self, items: List[str], on: bool) -> None:
+        """Cambia archivos y recalcula solo sus carpetas ancestro (de abajo arriba)."""
+        state = 1 if on else 0
+        depth: Dict[str, int] = {}
+        for it in items:
+            if self.item_state.get(it) == state:
+                continue
+            self.item_state[it] = state
+            self.set_item_text(it, self.item_meta[it].label, state)
+            for r in self._region_nodes.get(it, {}).values():
+                self.item_state[r] = state
+                self.set_item_text(r, self.item_meta[r].label, state)
+            for n, a in enumerate(reversed(list(self._ancestors(it)))):
+                depth[a] = n
+        for a in sorted(depth, key=depth.__getitem__, reverse=True):
+            states = {self.item_state.get(c, 0) for c in self.tree.get_children(a)}
+            new = states.pop() if len(states) == 1 else 2
+            if self.item_state.get(a) != new:
+                self.item_state[a] = new
+                self.set_item_text(a, self.item_meta[a].label, new)
+
+    def select_changed(self) -> None:
+        """Marca solo lo que git da por cambiado (y, si se pide, quien lo importa)."""
+        project_root = self.project_var.get().strip()
+        if not project_root or not self.src_roots_nodes:
+            messagebox.showinfo("Cambios", "Escanea el proyecto primero.")
+            return
+        try:
+            with self._perf.phase("git_changed"):
+                changed = git_changed_files(
+                    project_root, self.changes_base_var.get().strip()
+                )
+        except GitError as e:
+            messagebox.showerror("Git", f"No se pudo obtener lo cambiado:\n{e}")
+            return
+
+        # ruta normalizada -> nodo, de raíces y EXTRAS
+        by_path: Dict[str, str] = {}
+        for nodes in self.src_root_files_nodes.values():
+            by_path.update(nodes)
+        keys = {os.path.normcase(os.path.abspath(p)) for p in changed}
+        items = [by_path[k] for k in keys if k in by_path]
+        missing = len(keys) - len(items)
+
+        deps: List[str] = []
+        if self.changes_deps_var.get():
+            candidates = [
+                self.item_meta[n].path
+                for name in self.src_roots_nodes
+                for n in self.src_root_files_nodes.get(name, {}).values()
+            ]
+
+            def read(path: str) -> bytes:
+                with self._source.open(path) as fh:
+                    return fh.read()
+
+            with self._perf.phase("git_dependents"):
+                deps = direct_dependents(
+                    keys, candidates, read, project_root, pubspec_name(project_root)
+                )
+            items += [by_path[os.path.normcase(os.path.abspath(p))] for p in deps]
+
+        # Un solo lote: apagar raíces y EXTRAS y encender lo cambiado (sin
+        # recalcular por archivo)
+        for root in [*self.src_roots_nodes.values(), self.extras_root]:
+            self.set_state_recursive(root, False)
+        self._set_files_state(items, True)
+        self._clear_active_profiles()
+
+        msg = f"{len(items) - len(deps)} cambiado(s)"
+        if deps:
+            msg += f" + {len(deps)} dependiente(s)"
+        if missing:
+            msg += f"; {missing} fuera del árbol"
+        self.changes_status_var.set(msg)
+
+    def pull_definitions(self) -> None:
+        """Marca los archivos que declaran lo que la selección usa (un nivel)."""
+        project_root = self.project_var.get().strip()
+        if not project_root or not self.src_roots_nodes:
+            messagebox.showinfo("Definiciones", "Escanea el proyecto primero.")
+            return
+        by_path: Dict[str, str] = {}
+        for nodes in self.src_root_files_nodes.values():
+            by_path.update(nodes)
+        dart_files = [
+            self.item_meta[n].path
+            for name in self.src_roots_nodes
+            for n in self.src_root_files_nodes.get(name, {}).values()
+            if _file_ext(self.item_meta[n].path) == "dart"
+        ]
+        selected = [
+            self.item_meta[n].path
+            for n in by_path.values()
+            if self.item_state.get(n, 0) != 0  # también los parciales
+            and _file_ext(self.item_meta[n].path) == "dart"
+        ]
+
+        if self._symbols is None:
+            self._symbols = _SymbolIndex()
+        index = self._symbols
+        with self._perf.phase("symbol_index"):
+            index.update(dart_files, self._source)
+            index.save()
+
+        package = pubspec_name(project_root)
+        wanted: Set[str] = set()
+        with self._perf.phase("symbol_refs"):
+            for path in selected:
+                try:
+                    text = _read_text(self._source, path)
+                except OSError:
+                    continue
+                imported = set(dart_directives(text, path, project_root, package))
+                own = os.path.normcase(os.path.abspath(path))
+                for ident in referenced_identifiers(text):
+                    files = index.defs.get(ident)
+                    if not files:
+                        continue
+                    keys = [os.path.normcase(os.path.abspath(f)) for f in files]
+                    if own in keys:
+                        continue  # declarado en el mismo archivo
+                    # Nombre repetido: si alguno está importado, ese es el bueno
+                    hits = [k for k in keys if k in imported] or keys
+                    wanted.update(hits)
+
+        items = [
+            by_path[k]
+            for k in wanted
+            if k in by_path and self.item_state.get(by_path[k]) != 1
+        ]
+        self._set_files_state(items, True)
+        if items:
+            self._clear_active_profiles()
+        self.analysis_status_var.set(
+            f"+{len(items)} archivo(s); {len(index.defs)} símbolos"
+            f" ({index.parsed} leídos)"
+        )
+
+    def find_duplicates_txt(self) -> None:
+        """Reporte de archivos y regiones casi duplicados entre los .dart escaneados."""
+        project_root = self.project_var.get().strip()
+        if not project_root or not self.src_roots_nodes:
+            messagebox.showinfo("Duplicados", "Escanea el proyecto primero.")
+            return
+        paths = [
+            self.item_meta[n].path
+            for name in self.src_roots_nodes
+            for n in self.src_root_files_nodes.get(name, {}).values()
+            if _file_ext(self.item_meta[n].path) == "dart"
+        ]
+        out_path = self.out_var.get().strip()
+        if not out_path:
+            base = os.path.basename(os.path.normpath(project_root)) or "proyecto"
+            out_path = os.path.join(os.getcwd(), f"{base}_sources.txt")
+        stem, ext = os.path.splitext(out_path)
+        out_path = f"{stem}_duplicados{ext or '.txt'}"
+
+        def read(path: str) -> bytes:
+            with self._source.open(path) as fh:
+                return fh.read()
 
-        for root in list(self.src_roots_nodes.values()) + [self.extras_root]:
-            _walk(root)
+        try:
+            with self._perf.phase("duplicates"):
+                report = find_duplicates(paths, read)
+            with open(out_path, "w", encoding="utf-8") as fh:
+                write_report(fh, report, project_root)
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudo analizar:\n{e}")
+            return
+        self.analysis_status_var.set(
+            f"{len(report.files)} archivo(s), {len(report.regions)} región(es)"
+        )
+        messagebox.showinfo("Listo", f"Reporte de duplicados:\n{out_path}")
 
     # ------------------- Escaneo -------------------
 
     def parse_exts(self) -> Set[str]:
-        raw = self.ext_var.get().strip()
-        if not raw:
-            return {"dart"}
-        return {e.strip().lower().lstrip(".") for e in raw.split(",") if e.strip()}
+        return parse_ext_list(self.ext_var.get())
 
     def parse_excludes(self) -> Set[str]:
-        raw = self.exclude_var.get().strip()
-        if not raw:
-            return set()
-        return {e.strip() for e in raw.split(",") if e.strip()}
+        return parse_name_list(self.exclude_var.get())
+
+    def scan_roots(self, project_root: str) -> List[str]:
+        """Raíces a escanear; en modo workspace, cada raíz dentro de cada paquete."""
+        roots = self.parse_roots()
+        if not self.workspace_var.get():
+            return roots
+        with self._perf.phase("discover_packages"):
+            packages = discover_packages(
+                project_root, self.parse_excludes(), self._source.list_dir
+            )
+        return [
+            rel
+            for pkg in packages
+            for rel in (f"{pkg}/{r}" if pkg else r for r in roots)
+            if self._source.isdir(os.path.join(project_root, rel))
+        ]
 
     def parse_roots(self) -> List[str]:
-        raw = self.roots_var.get().strip()
-        if not raw:
-            return ["lib"]
-        return [r.strip().strip("\\/") for r in raw.split(",") if r.strip()]
+        return parse_root_list(self.roots_var.get())
+
+    def _scan_signature(self) -> Tuple[Any, ...]:
+        """Opciones que deciden qué nodos tiene el árbol (igual = reutilizable).
+
+        Con revisión, también su commit: "HEAD" o una rama pueden haberse movido.
+        """
+        proj = self.project_var.get().strip()
+        rev = self.git_rev_var.get().strip()
+        commit = ""
+        if rev and proj:
+            try:
+                commit = resolve_commit(proj, rev)
+            except GitError:
+                pass  # el escaneo lo reporta
+        return (
+            os.path.normcase(os.path.abspath(proj)) if proj else "",
+            tuple(self.parse_roots()),
+            frozenset(self.parse_exts()),
+            frozenset(self.parse_excludes()),
+            self.workspace_var.get(),
+            rev,
+            commit,
+        )
 
     def clear_children(self, item: str) -> None:
         for ch in self.tree.get_children(item):
@@ -844,11 +3822,19 @@ class DartDumpGUI(tk.Tk):
     def add_dir_node(
         self, parent: str, label: str, path: str, root_for_rel: str, group: str
     ) -> str:
-        node = self.tree.insert(parent, "end", text=f"{CHECK_ON} {label}", open=False)
+        with self._perf.phase("tk_insert"):
+            node = self.tree.insert(
+                parent, "end", text=f"{CHECK_ON} {label}", open=False
+            )
+        self._perf.count("tk_items")
         self.item_meta[node] = NodeMeta(
             "dir", path, root_for_rel, group, label, selectable=True
         )
         self.item_state[node] = 1
+        if group != "extras":
+            self.src_root_dir_nodes.setdefault(group, {})[
+                os.path.normcase(os.path.abspath(path))
+            ] = node
         return node
 
     def add_file_node(
@@ -860,12 +3846,14 @@ class DartDumpGUI(tk.Tk):
         group: str,
         default_on: bool = True,
     ) -> str:
-        node = self.tree.insert(
-            parent,
-            "end",
-            text=f"{CHECK_ON if default_on else CHECK_OFF} {label}",
-            open=False,
-        )
+        with self._perf.phase("tk_insert"):
+            node = self.tree.insert(
+                parent,
+                "end",
+                text=f"{CHECK_ON if default_on else CHECK_OFF} {label}",
+                open=False,
+            )
+        self._perf.count("tk_items")
         self.item_meta[node] = NodeMeta(
             "file", path, root_for_rel, group, label, selectable=True
         )
@@ -877,7 +3865,7 @@ class DartDumpGUI(tk.Tk):
 
     def _prepare_srcroot(self, project_root: str, root_name: str) -> Optional[str]:
         root_path = os.path.join(project_root, root_name)
-        if not os.path.isdir(root_path):
+        if not self._source.isdir(root_path):
             return None
         # crea root en árbol
         root_item = self.tree.insert(
@@ -888,9 +3876,49 @@ class DartDumpGUI(tk.Tk):
         )
         self.item_state[root_item] = 1
         self.src_roots_nodes[root_name] = root_item
+        self.src_root_dir_nodes.setdefault(root_name, {})[
+            os.path.normcase(os.path.abspath(root_path))
+        ] = root_item
         return root_item
 
+    def _open_source(self, project_root: str, rev: str) -> bool:
+        """Árbol de trabajo, o la revisión `rev` del repo (índice + pipe cat-file)."""
+        self._source.close()
+        self._source = WORK_TREE
+        if not rev:
+            return True
+        try:
+            with self._perf.phase("git_index"):
+                self._source = GitRevSource(project_root, rev)
+        except GitError as e:
+            messagebox.showerror("Git", f"No se pudo leer la revisión {rev!r}:\n{e}")
+            return False
+        return True
+
     def scan_project(self) -> None:
+        if self._gen_run is not None:
+            messagebox.showwarning(
+                "Generación en curso", "Espera a que termine (o cancélala)."
+            )
+            return
+        verbose = self.verbose_var.get()
+        self._perf = _Perf("scan") if verbose else _NULL_PERF
+        try:
+            self._scan_project()
+        finally:
+            perf, self._perf = self._perf, _NULL_PERF
+        if verbose:
+            perf.finish()
+            print("—" * 90)
+            print("Escaneo:")
+            perf.print_report()
+            perf.save(project=self.project_var.get().strip())
+
+    def _scan_project(self) -> None:
+        self._scan_sig = None
+        self._sel_index = None
+        self._region_nodes = {}
+        self._region_stubs = {}
         # limpiar raíces previas
         for node in list(self.src_roots_nodes.values()):
             try:
@@ -899,55 +3927,52 @@ class DartDumpGUI(tk.Tk):
                 pass
         self.src_roots_nodes.clear()
         self.src_root_files_nodes.clear()
+        self.src_root_dir_nodes.clear()
 
         project_root = self.project_var.get().strip()
         if not project_root or not os.path.isdir(project_root):
             messagebox.showerror("Error", "Selecciona una ruta de proyecto válida.")
             return
+        if not self._open_source(project_root, self.git_rev_var.get().strip()):
+            return
 
-        allowed_exts = self.parse_exts()
-        excludes = self.parse_excludes()
-        roots = self.parse_roots()
+        allowed_exts = frozenset(self.parse_exts())
+        excludes = frozenset(self.parse_excludes())
+        rev = self._source.label
 
-        for root_name in roots:
+        prepared: List[Tuple[str, str, str]] = []
+        for root_name in self.scan_roots(project_root):
             root_item = self._prepare_srcroot(project_root, root_name)
-            if not root_item:
-                continue
-            root_path = os.path.join(project_root, root_name)
-            self.tree.item(root_item, text=root_name)
-
-            # Limpieza por si re-escaneo
-            self.clear_children(root_item)
+            if root_item:
+                prepared.append(
+                    (root_name, root_item, os.path.join(project_root, root_name))
+                )
 
-            entries = os.listdir(root_path)
-            # archivos top
-            top_files = [
-                e for e in entries if os.path.isfile(os.path.join(root_path, e))
-            ]
-            for f in sorted_casefold(top_files):
-                ext = f.rsplit(".", 1)[-1].lower() if "." in f else ""
-                if ext in allowed_exts:
-                    self.add_file_node(
-                        root_item,
-                        f,
-                        os.path.join(root_path, f),
-                        root_path,
-                        root_name,
-                        default_on=True,
+        # Listado en paralelo (scandir / índice git liberan el GIL o son lecturas de
+        # dict); el árbol Tk se arma después en este hilo, en el orden de las raíces.
+        list_dir = self._source.list_dir
+        with self._perf.phase("fs_walk"):
+            with ThreadPoolExecutor() as pool:
+                listings = list(
+                    pool.map(
+                        lambda path: _list_tree(
+                            path, allowed_exts, excludes, list_dir, keep_empty=True
+                        ),
+                        [root_path for _, _, root_path in prepared],
                     )
-
-            # subcarpetas
-            top_dirs = [e for e in entries if os.path.isdir(os.path.join(root_path, e))]
-            for d in sorted_casefold(top_dirs):
-                if d in excludes:
-                    continue
-                dir_path = os.path.join(root_path, d)
-                node = self.add_dir_node(root_item, d, dir_path, root_path, root_name)
-                self.populate_dir(
-                    node, dir_path, root_path, allowed_exts, excludes, root_name
                 )
 
+        for (root_name, root_item, root_path), listing in zip(prepared, listings):
+            if rev:
+                self.item_meta[root_item].label = f"{root_name} @ {rev}"
+            self.tree.item(root_item, text=self.item_meta[root_item].label)
+            self._perf.count("listdir", _count_dirs(listing))
+            self.populate_dir(root_item, root_path, root_path, listing, root_name)
+            with self._perf.phase("recompute_states"):
+                self.recompute_states_bottom_up(root_item)
             self.tree.item(root_item, open=True)
+            self._add_region_stubs(root_item)
+        self._scan_sig = self._scan_signature()
 
         # EXTRAS por defecto la primera vez
         if not self.extras_loaded_once:
@@ -961,39 +3986,23 @@ class DartDumpGUI(tk.Tk):
         parent: str,
         dir_path: str,
         root_path: str,
-        allowed_exts: Set[str],
-        excludes: Set[str],
+        listing: _DirListing,
         group_name: str,
     ) -> None:
-        try:
-            entries = os.listdir(dir_path)
-        except PermissionError:
-            return
-
-        files = [e for e in entries if os.path.isfile(os.path.join(dir_path, e))]
-        for f in sorted_casefold(files):
-            ext = f.rsplit(".", 1)[-1].lower() if "." in f else ""
-            if ext in allowed_exts:
-                self.add_file_node(
-                    parent,
-                    f,
-                    os.path.join(dir_path, f),
-                    root_path,
-                    group_name,
-                    default_on=True,
-                )
-
-        dirs = [e for e in entries if os.path.isdir(os.path.join(dir_path, e))]
-        for d in sorted_casefold(dirs):
-            if d in excludes:
-                continue
+        """Inserta en el árbol un listado ya hecho (archivos y luego carpetas)."""
+        for f in listing.files:
+            self.add_file_node(
+                parent,
+                f,
+                os.path.join(dir_path, f),
+                root_path,
+                group_name,
+                default_on=True,
+            )
+        for d, sub in listing.dirs:
             dpath = os.path.join(dir_path, d)
             node = self.add_dir_node(parent, d, dpath, root_path, group_name)
-            self.populate_dir(
-                node, dpath, root_path, allowed_exts, excludes, group_name
-            )
-
-        self.recompute_parent_states(parent)
+            self.populate_dir(node, dpath, root_path, sub, group_name)
 
     # ------------------- EXTRAS -------------------
 
@@ -1068,7 +4077,9 @@ class DartDumpGUI(tk.Tk):
             {e.strip().lower().lstrip(".") for e in exts.split(",")} if exts else None
         )
 
-        dlg = SelectFromFolderDialog(self, base, allowed)
+        dlg = SelectFromFolderDialog(
+            self, base, allowed, excludes=self.parse_excludes(), source=self._source
+        )
         selected = dlg.show()
         if not selected:
             return
@@ -1113,48 +4124,185 @@ class DartDumpGUI(tk.Tk):
 
     def add_extra_glob(self) -> None:
         proj = self.project_var.get().strip()
-        patt = simpledialog.askstring(
-            "Patrón glob", "Patrón relativo (ej: test/**/*.dart):", parent=self
+        text = simpledialog.askstring(
+            "Patrón glob",
+            "Patrones relativos (o absolutos dentro del proyecto) separados por\n"
+            "coma; '!' excluye (ej: test/**/*.dart, !**/*.g.dart):",
+            parent=self,
         )
-        if not patt:
-            return
-        label_group = (
-            simpledialog.askstring("Etiqueta", "Etiqueta (opcional):", parent=self)
-            or patt
+        patterns, outside = relative_glob_patterns(
+            split_glob_patterns(text or ""), proj
         )
-        base = os.path.join(proj, patt)
-        matches = _glob.glob(base, recursive=True)
+        if outside:
+            messagebox.showerror(
+                "Patrón glob",
+                "Los patrones absolutos tienen que estar dentro del proyecto:\n"
+                + "\n".join(outside),
+            )
+            return
+        if not patterns:
+            return
+        label_group = simpledialog.askstring(
+            "Etiqueta", "Etiqueta (opcional):", parent=self
+        ) or ", ".join(patterns)
+        self._add_glob_group(proj, label_group, tuple(patterns), set())
+        self.recompute_parent_states(self.extras_root)
 
+    def _add_glob_group(
+        self, proj: str, label: str, patterns: Tuple[str, ...], off_rel: Set[str]
+    ) -> str:
+        """Grupo EXTRAS por patrones; `off_rel` = coincidencias desmarcadas."""
         group_node = self.tree.insert(
-            self.extras_root, "end", text=f"{CHECK_ON} [{label_group}]", open=True
+            self.extras_root, "end", text=f"{CHECK_ON} [{label}]", open=True
         )
         self.item_meta[group_node] = NodeMeta(
-            "extra-group", "", proj, "extras-group", f"[{label_group}]", selectable=True
+            "extra-group",
+            "",
+            proj,
+            "extras-group",
+            f"[{label}]",
+            selectable=True,
+            globs=patterns,
         )
         self.item_state[group_node] = 1
 
+        matches = compile_globs(patterns).walk(
+            proj, self.parse_excludes(), self._source.list_dir
+        )
         if not matches:
             empty = self.add_file_node(
                 group_node,
-                f"{patt} [SIN COINCIDENCIAS]",
-                base,
+                f"{', '.join(patterns)} [SIN COINCIDENCIAS]",
+                os.path.join(proj, patterns[0]),
                 proj,
                 "extras",
                 default_on=False,
             )
             self.item_meta[empty].selectable = False
-        else:
-            for m in sorted_casefold([p for p in matches if os.path.isfile(p)]):
-                self.add_file_node(
-                    group_node,
-                    os.path.relpath(m, proj).replace(os.sep, "/"),
-                    os.path.abspath(m),
-                    proj,
-                    "extras",
-                    default_on=True,
-                )
+        for m in matches:
+            rel = os.path.relpath(m, proj).replace(os.sep, "/")
+            self.add_file_node(
+                group_node, rel, m, proj, "extras", default_on=rel not in off_rel
+            )
+        return group_node
+
+    def _package_index(self) -> _PackageIndex:
+        if self._packages is None:
+            self._packages = _PackageIndex()
+        return self._packages
+
+    def add_extra_package(self) -> None:
+        """Código de dependencias (package_config.json) como grupos EXTRAS."""
+        proj = self.project_var.get().strip()
+        index = self._package_index()
+        try:
+            packages = index.packages(proj)
+        except (OSError, ValueError) as e:
+            messagebox.showerror(
+                "Paquetes",
+                "No se pudo leer .dart_tool/package_config.json "
+                f"(¿falta `dart pub get`?):\n{e}",
+            )
+            return
+        own = pubspec_name(proj)
+        names = [n for n in packages if n != own]
+        if not names:
+            messagebox.showinfo("Paquetes", "El proyecto no tiene dependencias.")
+            return
+        chosen = self._list_dialog("Paquetes (package_config.json)", names, True)
+        if not chosen:
+            return
+        for name in chosen:
+            self._add_package_group(proj, name, packages[name], None, set())
+        index.save()
         self.recompute_parent_states(self.extras_root)
 
+    def _add_package_group(
+        self,
+        proj: str,
+        name: str,
+        pkg: Optional[DartPackage],
+        patterns: Optional[Tuple[str, ...]],
+        off_rel: Set[str],
+    ) -> str:
+        """Grupo EXTRAS con el lib/ de una dependencia; `off_rel` relativo a lib/.
+
+        Sin `pkg` (ya no es dependencia) queda el grupo vacío, así el perfil
+        no lo pierde al guardarse de nuevo.
+        """
+        patterns = patterns or _package_globs(self.parse_exts())
+        label = f"package:{name}"
+        lib = pkg.lib if pkg else ""
+        rel_base = _package_rel_base(pkg) if pkg else proj
+        group_node = self.tree.insert(
+            self.extras_root, "end", text=f"{CHECK_ON} [{label}]", open=False
+        )
+        self.item_meta[group_node] = NodeMeta(
+            "extra-group",
+            lib,
+            rel_base,
+            "extras-group",
+            f"[{label}]",
+            selectable=True,
+            globs=patterns,
+            package=name,
+        )
+        self.item_state[group_node] = 1
+        matches = (
+            compile_globs(patterns).walk(
+                lib, self.parse_excludes(), self._package_index().list_dir
+            )
+            if lib
+            else []
+        )
+        if not matches:
+            empty = self.add_file_node(
+                group_node,
+                f"{label} [{'SIN ARCHIVOS' if lib else 'NO RESUELTO'}]",
+                os.path.join(lib or proj, label),
+                proj,
+                "extras",
+                default_on=False,
+            )
+            self.item_meta[empty].selectable = False
+        for m in matches:
+            rel = os.path.relpath(m, lib).replace(os.sep, "/")
+            self.add_file_node(
+                group_node, rel, m, rel_base, "extras", default_on=rel not in off_rel
+            )
+        return group_node
+
+    def _gather_extras(self) -> List[Tuple[str, str, bool]]:
+        """Extras del árbol; los grupos glob se re-evalúan al generar.
+
+        Archivos nuevos que coinciden entran con el estado del grupo; los que
+        el usuario desmarcó siguen fuera y los que ya no existen desaparecen.
+        """
+        result: List[Tuple[str, str, bool]] = []
+        excludes = self.parse_excludes()
+        for group in self.tree.get_children(self.extras_root):
+            entries = self._gather_files_selected_by_root(group)
+            meta = self.item_meta.get(group)
+            if meta and meta.globs:
+                if meta.package:  # dependencia: lib/ del paquete (índice cacheado)
+                    base, list_dir = meta.path, self._package_index().list_dir
+                else:
+                    base, list_dir = meta.root_for_rel, self._source.list_dir
+                known = {os.path.normcase(e[0]): e for e in entries}
+                default_on = self.item_state.get(group, 0) != 0
+                entries = [
+                    known.get(os.path.normcase(m), (m, meta.root_for_rel, default_on))
+                    for m in (
+                        compile_globs(meta.globs).walk(base, excludes, list_dir)
+                        if base
+                        else []
+                    )
+                ]
+            result.extend(entries)
+        if self._packages is not None:
+            self._packages.save()
+        return result
+
     def remove_extra_selected(self) -> None:
         item = self.tree.focus()
         if not item:
@@ -1188,8 +4336,9 @@ class DartDumpGUI(tk.Tk):
             if not meta:
                 return
             if meta.kind == "file":
+                # parcial (2) = algunas declaraciones: entra, recortado al generar
                 result.append(
-                    (os.path.abspath(meta.path), meta.root_for_rel, state == 1)
+                    (os.path.abspath(meta.path), meta.root_for_rel, state != 0)
                 )
             for ch in self.tree.get_children(it):
                 walk(ch)
@@ -1201,43 +4350,75 @@ class DartDumpGUI(tk.Tk):
         """Retorna pares (root_name, root_path_itemid)."""
         return [(name, item_id) for name, item_id in self.src_roots_nodes.items()]
 
-    def _separator_line(self, text: str, is_end: bool) -> str:
-        ch = (self.sep_char_var.get() or "-")[0]
-        if self.sep_auto_var.get():
-            base = f"{'END ' if is_end else ''}FILE: {text}"
-            width = min(max(len(base) + 8, 60), 120)
-        else:
-            width = max(20, int(self.sep_width_var.get()))
-        label = f" {'END ' if is_end else ''}FILE: {text} "
-        line = ch * width
-        mid = width // 2
-        start = max(0, mid - len(label) // 2)
-        end = start + len(label)
-        return f"{line[:start]}{label}{line[end:]}\n"
-
-    def _write_file_block(
-        self, out_fh: TextIO, file_abs_path: str, root_for_rel: str, filename_only: bool
-    ) -> int:
-        rel = os.path.relpath(file_abs_path, root_for_rel).replace(os.sep, "/")
-        header = os.path.basename(rel) if filename_only else rel
-        out_fh.write(self._separator_line(header, is_end=False))
-        written = 0
-        try:
-            with open(file_abs_path, "r", encoding="utf-8", errors="ignore") as fh:
-                content = fh.read()
-                out_fh.write(content)
-                written = len(content)
-        except Exception as e:
-            msg = f"[ERROR al leer el archivo: {e}]\n"
-            out_fh.write(msg)
-            written = len(msg)
-        if self.sep_end_var.get():
-            out_fh.write("\n")
-            out_fh.write(self._separator_line(header, is_end=True))
-        out_fh.write("\n")
-        return written
+    def _render_options(self) -> RenderOptions:
+        """Congela las opciones de salida actuales (una sola lectura de Tk)."""
+        return RenderOptions(
+            mode=self.output_mode_var.get(),
+            filename_only=self.filename_only_var.get(),
+            sep_char=(self.sep_char_var.get() or "-")[0],
+            sep_width=int(self.sep_width_var.get()),
+            sep_auto=self.sep_auto_var.get(),
+            sep_print_end=self.sep_end_var.get(),
+            allowed_exts=frozenset(self.parse_exts()),
+            excludes=frozenset(self.parse_excludes()),
+            write_index=self.write_index_var.get(),
+            max_file_bytes=max(0, int(self.max_file_kb_var.get())) * 1024,
+            max_file_lines=max(0, int(self.max_file_lines_var.get())),
+            compress_threads=(
+                os.cpu_count() or 1 if self.compress_parallel_var.get() else 0
+            ),
+            generated=_generated_policy(self.generated_var.get()),
+            link_parts=self.link_parts_var.get(),
+            strip_comments=self.strip_comments_var.get(),
+        )
+
+    def _compression(self) -> str:
+        """Compresión elegida ("" = ninguna)."""
+        value = self.compression_var.get()
+        return "" if value == NO_COMPRESSION else value
+
+    def _set_compression(self, value: str) -> None:
+        # zstd guardado en otra máquina puede no estar disponible aquí
+        self.compression_var.set(
+            value if value in available_compressions() else NO_COMPRESSION
+        )
+
+    def _render_job(self, project_root: str, out_path: str) -> RenderJob:
+        """Recoge la selección del árbol (hilo de Tk) en estructuras planas."""
+        roots: List[RenderRoot] = []
+        for root_name, root_item in self._gather_all_src_roots():
+            selected = {
+                os.path.normcase(os.path.abspath(p))
+                for (p, _, sel) in self._gather_files_selected_by_root(root_item)
+                if sel
+            }
+            roots.append(
+                RenderRoot(root_name, os.path.join(project_root, root_name), selected)
+            )
+        return RenderJob(
+            project_root=project_root,
+            roots_label=(
+                ",".join(self.src_roots_nodes)
+                if self.workspace_var.get()
+                else self.roots_var.get().strip()
+            ),
+            extras=self._gather_extras(),
+            roots=roots,
+            out_path=out_path,
+            revision=(
+                f"{self._source.rev} ({self._source.commit[:12]})"
+                if isinstance(self._source, GitRevSource)
+                else ""
+            ),
+            regions={
+                os.path.normcase(os.path.abspath(path)): tuple(names)
+                for path, names in self._partial_regions().items()
+            },
+        )
 
     def generate_txt(self) -> None:
+        if self._gen_run is not None:
+            return  # ya hay una generación en curso
         project_root = self.project_var.get().strip()
         if not project_root or not os.path.isdir(project_root):
             messagebox.showerror("Error", "Selecciona una ruta de proyecto válida.")
@@ -1248,231 +4429,155 @@ class DartDumpGUI(tk.Tk):
             base = os.path.basename(os.path.normpath(project_root)) or "proyecto"
             out_path = os.path.join(os.getcwd(), f"{base}_sources.txt")
 
-        filename_only = self.filename_only_var.get()
         verbose = self.verbose_var.get()
-        excludes = self.parse_excludes()
-        allowed_exts = self.parse_exts()
-        mode = self.output_mode_var.get()
-        include_all_structure = mode != "content_selected"
+        opts = self._render_options()
+        perf = _Perf("generate") if verbose else _NULL_PERF
+        if opts.mode == "jsonl_chunks":
+            stem, ext = os.path.splitext(out_path)
+            if ext.lower() in ("", ".txt"):
+                out_path = stem + ".jsonl"
+        out_path = with_compression(out_path, self._compression())
 
         if verbose:
             print("—" * 90)
             print("Generando archivo…")
             print(f"Salida: {out_path}")
-            print(f"Modo: {mode}")
-            print(f"Raíces: {', '.join(self.parse_roots())}")
-
+            print(f"Modo: {opts.mode}")
+            print(f"Raíces: {', '.join(self.src_roots_nodes)}")
+
+        # Todo lo que lee Tk se hace aquí; el hilo solo ve RenderOptions/RenderJob.
+        with perf.phase("gather_tree"):
+            job = self._render_job(project_root, out_path)
+        if self.tee_stdout_var.get():
+            job.tee.append(STDOUT)
+        run = _GenerateRun(job, 0, perf, verbose, opts.mode)
+        renderer: Union[DumpRenderer, ChunkExporter] = (
+            ChunkExporter if opts.mode == "jsonl_chunks" else DumpRenderer
+        )(opts, perf, progress=run.update, cancel=run.cancel, source=self._source)
+        run.total = renderer.expected_files(job)
+        self._gen_run = run
+
+        self.generate_btn.configure(state="disabled")
+        self.gen_cancel_btn.configure(state="normal")
+        self.gen_progress.configure(
+            mode="determinate" if run.total else "indeterminate"
+        )
+        if not run.total:
+            self.gen_progress.start(50)
+        threading.Thread(
+            target=self._generate_worker, args=(run, renderer), daemon=True
+        ).start()
+        self.after(100, self._poll_generate)
+
+    @staticmethod
+    def _generate_worker(
+        run: _GenerateRun, renderer: Union[DumpRenderer, ChunkExporter]
+    ) -> None:
         try:
-            with open(out_path, "w", encoding="utf-8") as out_fh:
-                now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                out_fh.write(f"GENERADO: {now}\n")
-                out_fh.write(f"PROYECTO: {project_root}\n")
-                out_fh.write(f"RAICES: {self.roots_var.get().strip()}\n")
-                out_fh.write("=" * 80 + "\n\n")
-
-                # ============ EXTRAS ============
-                extras_all = self._gather_files_selected_by_root(self.extras_root)
-                if extras_all:
-                    out_fh.write("EXTRAS (inicio)\n")
-                    out_fh.write("=" * 80 + "\n\n")
-                    for abs_path, root_for_rel, is_selected in extras_all:
-                        rel = os.path.relpath(abs_path, root_for_rel).replace(
-                            os.sep, "/"
-                        )
-                        header = os.path.basename(rel) if filename_only else rel
-                        if mode == "structure_only":
-                            out_fh.write(self._separator_line(header, is_end=False))
-                            if self.sep_end_var.get():
-                                out_fh.write(self._separator_line(header, is_end=True))
-                            out_fh.write("\n")
-                        elif mode == "selected_plus_structure":
-                            if is_selected:
-                                self._write_file_block(
-                                    out_fh, abs_path, root_for_rel, filename_only
-                                )
-                            else:
-                                out_fh.write(self._separator_line(header, is_end=False))
-                                if self.sep_end_var.get():
-                                    out_fh.write(
-                                        self._separator_line(header, is_end=True)
-                                    )
-                                out_fh.write("\n")
-                        else:  # content_selected
-                            if is_selected:
-                                self._write_file_block(
-                                    out_fh, abs_path, root_for_rel, filename_only
-                                )
-                    out_fh.write("\n")
-
-                # ============ POR CADA RAÍZ ============
-                def subtree_has_any_allowed(path: str) -> bool:
-                    try:
-                        entries = os.listdir(path)
-                    except PermissionError:
-                        return False
-                    for f in entries:
-                        p = os.path.join(path, f)
-                        if os.path.isfile(p):
-                            ext = f.rsplit(".", 1)[-1].lower() if "." in f else ""
-                            if ext in allowed_exts:
-                                return True
-                    for d in entries:
-                        p = os.path.join(path, d)
-                        if os.path.isdir(p) and os.path.basename(p) not in excludes:
-                            if subtree_has_any_allowed(p):
-                                return True
-                    return False
+            renderer.render(run.job)
+            if isinstance(renderer, ChunkExporter):
+                run.summary = (
+                    f"{renderer.written} trozos nuevos, {renderer.skipped} sin"
+                    f" cambios, {renderer.deleted} borrados"
+                )
+            run.outcome = "ok"
+        except RenderCancelled:
+            run.outcome = "cancelled"
+        except Exception as e:
+            run.error = e
+            run.outcome = "error"
 
-                def write_descend(cur: str, root_path: str, sel_set: Set[str]) -> None:
-                    try:
-                        entries = os.listdir(cur)
-                    except PermissionError:
-                        return
-                    files = [e for e in entries if os.path.isfile(os.path.join(cur, e))]
-                    for f in sorted_casefold(files):
-                        fpath = os.path.join(cur, f)
-                        ext = f.rsplit(".", 1)[-1].lower() if "." in f else ""
-                        if ext not in allowed_exts:
-                            continue
-                        absn = os.path.normcase(os.path.abspath(fpath))
-                        rel = os.path.relpath(fpath, root_path).replace(os.sep, "/")
-                        header = os.path.basename(rel) if filename_only else rel
-
-                        if mode == "content_selected":
-                            if absn in sel_set:
-                                self._write_file_block(
-                                    out_fh, fpath, root_path, filename_only
-                                )
-                        elif mode == "structure_only":
-                            out_fh.write(self._separator_line(header, is_end=False))
-                            if self.sep_end_var.get():
-                                out_fh.write(self._separator_line(header, is_end=True))
-                            out_fh.write("\n")
-                        else:  # selected_plus_structure
-                            if absn in sel_set:
-                                self._write_file_block(
-                                    out_fh, fpath, root_path, filename_only
-                                )
-                            else:
-                                out_fh.write(self._separator_line(header, is_end=False))
-                                if self.sep_end_var.get():
-                                    out_fh.write(
-                                        self._separator_line(header, is_end=True)
-                                    )
-                                out_fh.write("\n")
-
-                    dirs = [e for e in entries if os.path.isdir(os.path.join(cur, e))]
-                    for subd in sorted_casefold(dirs):
-                        if subd in excludes:
-                            continue
-                        subpath = os.path.join(cur, subd)
-                        if include_all_structure:
-                            if not subtree_has_any_allowed(subpath):
-                                continue
-                        else:
-                            # si sólo contenido, imprime directorios solo si hay seleccionados dentro
-                            if not any(
-                                os.path.normcase(os.path.abspath(os.path.join(dp, fn)))
-                                in sel_set
-                                for dp, _, fns in os.walk(subpath)
-                                for fn in fns
-                            ):
-                                continue
-                        out_fh.write(dir_header(1, subd))
-                        out_fh.write("\n")
-                        write_descend(subpath, root_path, sel_set)
-
-                for root_name, root_item in self._gather_all_src_roots():
-                    root_path = os.path.join(project_root, root_name)
-                    if not os.path.isdir(root_path):
-                        continue
-                    # Set seleccionados para esta raíz
-                    sel_list = [
-                        (p, r)
-                        for (p, r, sel) in self._gather_files_selected_by_root(
-                            root_item
-                        )
-                        if sel
-                    ]
-                    sel_set: Set[str] = {
-                        os.path.normcase(os.path.abspath(p)) for (p, _) in sel_list
-                    }
-
-                    out_fh.write(f"=== RAIZ: {root_name} ===\n\n")
-
-                    # top-level files
-                    top_entries = os.listdir(root_path)
-                    top_files = [
-                        e
-                        for e in top_entries
-                        if os.path.isfile(os.path.join(root_path, e))
-                    ]
-                    for f in sorted_casefold(top_files):
-                        fpath = os.path.join(root_path, f)
-                        ext = f.rsplit(".", 1)[-1].lower() if "." in f else ""
-                        if ext not in allowed_exts:
-                            continue
-                        absn = os.path.normcase(os.path.abspath(fpath))
-                        rel = os.path.relpath(fpath, root_path).replace(os.sep, "/")
-                        header = os.path.basename(rel) if filename_only else rel
-
-                        if mode == "content_selected":
-                            if absn in sel_set:
-                                self._write_file_block(
-                                    out_fh, fpath, root_path, filename_only
-                                )
-                        elif mode == "structure_only":
-                            out_fh.write(self._separator_line(header, is_end=False))
-                            if self.sep_end_var.get():
-                                out_fh.write(self._separator_line(header, is_end=True))
-                            out_fh.write("\n")
-                        else:
-                            if absn in sel_set:
-                                self._write_file_block(
-                                    out_fh, fpath, root_path, filename_only
-                                )
-                            else:
-                                out_fh.write(self._separator_line(header, is_end=False))
-                                if self.sep_end_var.get():
-                                    out_fh.write(
-                                        self._separator_line(header, is_end=True)
-                                    )
-                                out_fh.write("\n")
-
-                    # subcarpetas con encabezados
-                    top_dirs = [
-                        e
-                        for e in top_entries
-                        if os.path.isdir(os.path.join(root_path, e))
-                    ]
-                    for d in sorted_casefold(top_dirs):
-                        if d in excludes:
-                            continue
-                        dpath = os.path.join(root_path, d)
-                        if include_all_structure:
-                            if not subtree_has_any_allowed(dpath):
-                                continue
-                        else:
-                            # imprime dir solo si hay seleccionados adentro
-                            if not any(
-                                os.path.normcase(os.path.abspath(os.path.join(dp, fn)))
-                                in sel_set
-                                for dp, _, fns in os.walk(dpath)
-                                for fn in fns
-                            ):
-                                continue
-                        out_fh.write(dir_header(1, d))
-                        out_fh.write("\n")
-                        write_descend(dpath, root_path, sel_set)
-
-            if verbose:
+    def cancel_generate(self) -> None:
+        if self._gen_run is not None:
+            self._gen_run.cancel.set()
+            self.gen_status_var.set("Cancelando…")
+
+    def _poll_generate(self) -> None:
+        run = self._gen_run
+        if run is None:
+            return
+        frac, text = run.status()
+        if frac >= 0:
+            self.gen_progress["value"] = frac
+        if not run.cancel.is_set():
+            self.gen_status_var.set(text)
+        if run.outcome is None:
+            self.after(100, self._poll_generate)
+            return
+        self._finish_generate(run)
+
+    def _finish_generate(self, run: _GenerateRun) -> None:
+        self._gen_run = None
+        self.gen_progress.stop()
+        self.gen_progress.configure(mode="determinate")
+        self.gen_progress["value"] = 0
+        self.generate_btn.configure(state="normal")
+        self.gen_cancel_btn.configure(state="disabled")
+        out_path = run.job.out_path
+
+        if run.outcome == "ok":
+            self.gen_status_var.set(f"Listo · {run.status()[1]}")
+            if run.verbose:
                 print("✅ TXT generado correctamente.")
-            messagebox.showinfo("Listo", f"Archivo generado:\n{out_path}")
+                run.perf.count("bytes_written", os.path.getsize(out_path))
+                run.perf.finish()
+                run.perf.print_report()
+                run.perf.save(project=run.job.project_root, mode=run.mode, out=out_path)
+            detail = f"\n{run.summary}" if run.summary else ""
+            messagebox.showinfo("Listo", f"Archivo generado:\n{out_path}{detail}")
+        elif run.outcome == "cancelled":
+            self.gen_status_var.set("Cancelado (no se modificó la salida)")
+            if run.verbose:
+                print("⏹ Generación cancelada.")
+        else:
+            self.gen_status_var.set("Error")
+            if run.verbose and run.error is not None:
+                traceback.print_exception(
+                    type(run.error), run.error, run.error.__traceback__
+                )
+            messagebox.showerror("Error", f"No se pudo generar el TXT:\n{run.error}")
 
+    def generate_diff_txt(self) -> None:
+        """Dump compacto con lo que cambió en el árbol desde un dump anterior."""
+        project_root = self.project_var.get().strip()
+        if not project_root or not os.path.isdir(project_root):
+            messagebox.showerror("Error", "Selecciona una ruta de proyecto válida.")
+            return
+        prev = filedialog.askopenfilename(
+            title="Dump anterior",
+            filetypes=[
+                ("Texto", "*.txt"),
+                ("Comprimido", "*.gz *.xz *.zst"),
+                ("Todos", "*.*"),
+            ],
+        )
+        if not prev:
+            return
+        out_path = self.out_var.get().strip()
+        if not out_path:
+            base = os.path.basename(os.path.normpath(project_root)) or "proyecto"
+            out_path = os.path.join(os.getcwd(), f"{base}_sources.txt")
+        stem, ext = os.path.splitext(out_path)
+        out_path = f"{stem}_cambios{ext or '.txt'}"
+        try:
+            with DumpIndex(prev) as old:
+                items = diff_against_tree(
+                    old,
+                    project_root,
+                    self.scan_roots(project_root),
+                    self.parse_exts(),
+                    self.parse_excludes(),
+                )
+            with open(out_path, "w", encoding="utf-8") as fh:
+                write_diff_dump(fh, items, prev, project_root)
         except Exception as e:
-            messagebox.showerror("Error", f"No se pudo generar el TXT:\n{e}")
-            if verbose:
-                raise
+            messagebox.showerror("Error", f"No se pudo generar el diff:\n{e}")
+            return
+        unknown = sum(1 for it in items if it.status == "unknown")
+        note = f" ({unknown} sin determinar)" if unknown else ""
+        messagebox.showinfo(
+            "Listo", f"{len(items) - unknown} archivos cambiados{note}:\n{out_path}"
+        )
 
     # ------------------- Perfiles -------------------
 
@@ -1480,23 +4585,16 @@ class DartDumpGUI(tk.Tk):
         """Empaqueta opciones + selección actual (todas las raíces + extras)."""
         proj = os.path.abspath(self.project_var.get().strip())
 
-        # Recoger seleccionados por cada raíz
-        lib_selected_rel: List[str] = []
-        for (
-            _,
-            root_item,
-        ) in self._gather_all_src_roots():  # _ evita warning "unused variable"
-            for abs_path, _ in [
-                (p, r)
-                for (p, r, sel) in self._gather_files_selected_by_root(root_item)
-                if sel
-            ]:
-                lib_selected_rel.append(
-                    os.path.relpath(abs_path, proj).replace(os.sep, "/")
-                )
+        # Reglas por raíz (carpetas completas = una regla)
+        selection_rules: List[SelectionRule] = []
+        for _, root_item in self._gather_all_src_roots():
+            selection_rules.extend(self._selection_rules_for(root_item, proj))
 
-        # Extras agrupados
+        # Extras agrupados (los grupos glob guardan patrones + desmarcados)
         extras_by_group: Dict[str, List[str]] = {}
+        globs_by_group: Dict[str, List[str]] = {}
+        off_by_group: Dict[str, List[str]] = {}
+        pkg_by_group: Dict[str, Tuple[str, str]] = {}  # etiqueta -> (nombre, lib/)
 
         def walk(it: str, current_group: Optional[str]) -> None:
             meta = self.item_meta[it]
@@ -1505,20 +4603,25 @@ class DartDumpGUI(tk.Tk):
                 base_group = meta.label.strip()
                 if base_group.startswith("[") and base_group.endswith("]"):
                     base_group = base_group[1:-1]
-            if (
-                meta.kind == "file"
-                and self.item_state[it] == 1
-                and meta.group == "extras"
-            ):
-                rel = os.path.relpath(meta.path, proj).replace(os.sep, "/")
-                extras_by_group.setdefault(base_group or "Extras", []).append(rel)
+                if meta.globs:
+                    globs_by_group[base_group] = list(meta.globs)
+                    extras_by_group.setdefault(base_group, [])
+                if meta.package:
+                    pkg_by_group[base_group] = (meta.package, meta.path)
+            if meta.kind == "file" and meta.group == "extras":
+                base = pkg_by_group.get(base_group or "", ("", proj))[1] or proj
+                rel = os.path.relpath(meta.path, base).replace(os.sep, "/")
+                if self.item_state[it] == 1:
+                    extras_by_group.setdefault(base_group or "Extras", []).append(rel)
+                elif meta.selectable and base_group in globs_by_group:
+                    off_by_group.setdefault(base_group, []).append(rel)
             for ch in self.tree.get_children(it):
                 walk(ch, base_group)
 
         for ch in self.tree.get_children(self.extras_root):
             walk(ch, None)
 
-        return {
+        payload: Dict[str, Any] = {
             "project_root": proj,
             "options": {
                 "source_roots": self.roots_var.get().strip(),
@@ -1531,12 +4634,78 @@ class DartDumpGUI(tk.Tk):
                 "sep_width": int(self.sep_width_var.get()),
                 "sep_auto": self.sep_auto_var.get(),
                 "sep_print_end": self.sep_end_var.get(),
+                "write_index": self.write_index_var.get(),
+                "max_file_kb": int(self.max_file_kb_var.get()),
+                "max_file_lines": int(self.max_file_lines_var.get()),
+                "workspace": self.workspace_var.get(),
+                "compression": self._compression(),
+                "compress_parallel": self.compress_parallel_var.get(),
+                "generated_policy": _generated_policy(self.generated_var.get()),
+                "link_parts": self.link_parts_var.get(),
+                "strip_comments": self.strip_comments_var.get(),
             },
-            "selected_files_rel": sorted(set(lib_selected_rel), key=str.casefold),
+            "selection_rules": selection_rules,
             "extras_groups": [
-                {"label": lbl, "files": files} for lbl, files in extras_by_group.items()
+                _extras_group(
+                    lbl,
+                    files,
+                    globs_by_group.get(lbl),
+                    off_by_group.get(lbl, []),
+                    pkg_by_group.get(lbl, ("", ""))[0],
+                )
+                for lbl, files in extras_by_group.items()
             ],
         }
+        # archivos parciales: sus declaraciones por nombre (sobreviven a ediciones)
+        regions = {
+            os.path.relpath(path, proj).replace(os.sep, "/"): names
+            for path, names in self._partial_regions().items()
+        }
+        if regions:
+            payload["regions"] = regions
+        return payload
+
+    def _selection_rules_for(self, root_item: str, proj: str) -> List[SelectionRule]:
+        """Reglas include en la carpeta más alta totalmente marcada.
+
+        Una carpeta parcial no se incluye entera (un archivo nuevo en ella no debe
+        entrar solo): se baja a sus hijos y se incluyen uno a uno.
+        """
+        counts: Dict[str, Tuple[int, int]] = {}
+
+        def count(it: str) -> Tuple[int, int]:
+            if self.item_meta[it].kind == "file":
+                res = (1 if self.item_state.get(it, 0) != 0 else 0, 1)
+            else:
+                sel = tot = 0
+                for ch in self.tree.get_children(it):
+                    s_, t_ = count(ch)
+                    sel += s_
+                    tot += t_
+                res = (sel, tot)
+            counts[it] = res
+            return res
+
+        count(root_item)
+        rules: List[SelectionRule] = []
+
+        def emit(it: str, inherited: bool) -> None:
+            meta = self.item_meta[it]
+            rel = os.path.relpath(meta.path, proj).replace(os.sep, "/")
+            sel, tot = counts[it]
+            if meta.kind == "file" or tot == 0:
+                want = self.item_state.get(it, 0) != 0
+            else:
+                want = sel == tot
+            if want != inherited:
+                rules.append({"path": rel, "include": want})
+            if meta.kind == "file" or sel in (0, tot):
+                return
+            for ch in self.tree.get_children(it):
+                emit(ch, want)
+
+        emit(root_item, False)
+        return rules
 
     def apply_profile_payload(self, payload: Dict[str, Any]) -> None:
         """Aplica un perfil (reemplaza selección)."""
@@ -1559,17 +4728,73 @@ class DartDumpGUI(tk.Tk):
         self.sep_width_var.set(int(opts.get("sep_width", self.sep_width_var.get())))
         self.sep_auto_var.set(bool(opts.get("sep_auto", self.sep_auto_var.get())))
         self.sep_end_var.set(bool(opts.get("sep_print_end", self.sep_end_var.get())))
+        self.write_index_var.set(
+            bool(opts.get("write_index", self.write_index_var.get()))
+        )
+        self.max_file_kb_var.set(
+            int(opts.get("max_file_kb", self.max_file_kb_var.get()))
+        )
+        self.max_file_lines_var.set(
+            int(opts.get("max_file_lines", self.max_file_lines_var.get()))
+        )
+        self.workspace_var.set(bool(opts.get("workspace", self.workspace_var.get())))
+        self._set_compression(str(opts.get("compression", self._compression())))
+        self.compress_parallel_var.set(
+            bool(opts.get("compress_parallel", self.compress_parallel_var.get()))
+        )
+        self.generated_var.set(
+            GENERATED_POLICIES[
+                _generated_policy(
+                    str(opts.get("generated_policy", self.generated_var.get()))
+                )
+            ]
+        )
+        self.link_parts_var.set(bool(opts.get("link_parts", self.link_parts_var.get())))
+        self.strip_comments_var.set(
+            bool(opts.get("strip_comments", self.strip_comments_var.get()))
+        )
+
+        # re-escanear solo si cambió algo que decide el árbol; si no, basta con
+        # volver a marcar (un perfil rápido desde el combo no reconstruye nada)
+        if self._scan_sig is None or self._scan_signature() != self._scan_sig:
+            self.scan_project()
 
-        # escanear con nuevas raíces
-        self.scan_project()
+        self._apply_extras_groups(proj, list(payload.get("extras_groups", [])))
 
-        # reconstruir EXTRAS desde perfil
+        # el perfil reemplaza la selección de las raíces
+        self._apply_selection_rules(proj, _payload_rule_sets(payload))
+        self._apply_regions(dict(payload.get("regions") or {}))
+
+    def _apply_extras_groups(
+        self, proj: str, extras_groups: List[Dict[str, Any]]
+    ) -> None:
+        """Rehace EXTRAS con los grupos de un perfil."""
         self.clear_children(self.extras_root)
         self.extras_file_nodes.clear()
 
-        extras_groups: List[Dict[str, Any]] = list(payload.get("extras_groups", []))
+        packages: Optional[Dict[str, DartPackage]] = None
         for group in extras_groups:
             label = str(group.get("label") or "Extras")
+            globs = [str(g) for g in group.get("globs") or []]
+            pkg_name = str(group.get("package") or "")
+            if pkg_name:
+                if packages is None:
+                    try:
+                        packages = self._package_index().packages(proj)
+                    except (OSError, ValueError):
+                        packages = {}
+                self._add_package_group(
+                    proj,
+                    pkg_name,
+                    packages.get(pkg_name),
+                    tuple(globs) or None,
+                    {str(r) for r in group.get("files_off") or []},
+                )
+                continue
+            if globs:
+                off = {str(r) for r in group.get("files_off") or []}
+                self._add_glob_group(proj, label, tuple(globs), off)
+                continue
             files_rel: List[str] = list(group.get("files") or [])
             group_node = self.tree.insert(
                 self.extras_root, "end", text=f"{CHECK_ON} [{label}]", open=True
@@ -1599,7 +4824,7 @@ class DartDumpGUI(tk.Tk):
                         cur_parent = node
                     else:
                         cur_parent = path_to_node[running_dir]
-                if os.path.isfile(abs_path):
+                if self._source.isfile(abs_path):
                     self.add_file_node(
                         cur_parent, parts[-1], abs_path, proj, "extras", default_on=True
                     )
@@ -1616,23 +4841,192 @@ class DartDumpGUI(tk.Tk):
 
         self.recompute_parent_states(self.extras_root)
 
-        # deseleccionar todo en raíces
-        for root_item in self.src_roots_nodes.values():
-            for it in self.tree.get_children(root_item):
-                self.set_state_recursive(it, False)
+    def _apply_selection_rules(
+        self, proj: str, rule_sets: List[List[SelectionRule]]
+    ) -> None:
+        """Deja las raíces marcadas según reglas (unión si hay varios perfiles)."""
+        compiled = [_compile_rules(rs) for rs in rule_sets]
+        self._apply_selection(
+            proj, lambda rel: any(_rules_select(c, rel) for c in compiled)
+        )
+
+    def _apply_selection(self, proj: str, selects: Callable[[str], bool]) -> None:
+        """Marca cada archivo (y carpeta vacía) de las raíces según `selects(rel)`.
 
-        # seleccionar según perfil
+        Una sola pasada: lo no seleccionado queda desmarcado, solo se reescribe en
+        Tk lo que cambia y las carpetas se recalculan de abajo arriba.
+        """
         proj_abs = os.path.abspath(proj)
-        for rel in list(payload.get("selected_files_rel", [])):
-            rel = str(rel)
-            absn = os.path.normcase(os.path.abspath(os.path.join(proj_abs, rel)))
-            # Busca en todas las raíces
-            for group_map in self.src_root_files_nodes.values():
-                node = group_map.get(absn)
-                if node:
-                    self.item_state[node] = 1
-                    self.set_item_text(node, self.item_meta[node].label, 1)
-                    self.recompute_parent_states(node)
+        with self._perf.phase("apply_rules"):
+            for group, group_map in (
+                *self.src_root_files_nodes.items(),
+                *self.src_root_dir_nodes.items(),
+            ):
+                if group == "extras":
+                    continue
+                for node in group_map.values():
+                    meta = self.item_meta[node]
+                    rel = os.path.relpath(meta.path, proj_abs).replace(os.sep, "/")
+                    new = 1 if selects(rel) else 0
+                    if self.item_state.get(node) != new:
+                        self.item_state[node] = new
+                        self.set_item_text(node, meta.label, new)
+                        self._perf.count("state_changes")
+                        for r in self._region_nodes.get(node, {}).values():
+                            self.item_state[r] = new
+                            self.set_item_text(r, self.item_meta[r].label, new)
+            for root_item in self.src_roots_nodes.values():
+                self.recompute_states_bottom_up(root_item)
+
+    # ---- Álgebra de selecciones (bitsets) ----
+
+    def _selection_index(self) -> Tuple[FileIndex, List[str]]:
+        """Índice estable de los archivos del escaneo (id -> nodo); se rehace al
+        volver a escanear."""
+        if self._sel_index is None:
+            proj = os.path.abspath(self.project_var.get().strip())
+            by_rel: Dict[str, str] = {}
+            for group, group_map in self.src_root_files_nodes.items():
+                if group == "extras":
+                    continue
+                for node in group_map.values():
+                    rel = os.path.relpath(self.item_meta[node].path, proj)
+                    by_rel[rel.replace(os.sep, "/")] = node
+            index = FileIndex(by_rel)
+            self._sel_index = (index, [by_rel[p] for p in index.paths])
+        return self._sel_index
+
+    def _selection_bits(self) -> int:
+        """La selección actual de las raíces como bitset."""
+        index, nodes = self._selection_index()
+        return index.select(
+            lambda rel: self.item_state.get(nodes[index.ids[rel]], 0) != 0
+        )
+
+    def _apply_combined(self, payload: Dict[str, Any], bits: int) -> None:
+        """Aplica una combinación de perfiles: raíces según el bitset, EXTRAS y
+        regiones del perfil combinado (lo mismo que se guardaría)."""
+        index, _ = self._selection_index()
+        chosen = set(index.paths_of(bits))
+        proj = os.path.abspath(self.project_var.get().strip())
+        self._apply_extras_groups(proj, list(payload.get("extras_groups", [])))
+        self._apply_selection(proj, chosen.__contains__)
+        self._apply_regions(dict(payload.get("regions") or {}))
+
+    def combine_profiles_dialog(self) -> None:
+        """Unión / intersección / diferencia / diferencia simétrica de perfiles.
+
+        Cada perfil se evalúa una vez (por diálogo) sobre el árbol escaneado; las
+        operaciones son sobre bitsets. El resultado (raíces, EXTRAS y regiones,
+        igual en los dos casos) se aplica como selección o se guarda como perfil
+        nuevo.
+        """
+        if not self.src_roots_nodes:
+            messagebox.showinfo("Perfiles", "Escanea el proyecto primero.")
+            return
+        store = _load_profile_store()
+        current = "(selección actual)"
+        choices = [current] + sorted(store, key=str.casefold)
+        index, _ = self._selection_index()
+        bits_of: Dict[str, int] = {current: self._selection_bits()}
+
+        def bits(name: str) -> int:
+            if name not in bits_of:
+                bits_of[name] = index.select(_payload_selects(store[name]))
+            return bits_of[name]
+
+        dlg = tk.Toplevel(self)
+        dlg.title("Combinar perfiles")
+        dlg.geometry("380x480")
+        try:
+            dlg.transient(self)  # type: ignore[arg-type]
+        except Exception:
+            pass
+        dlg.grab_set()
+
+        frm = ttk.Frame(dlg, padding=8)
+        frm.pack(fill="both", expand=True)
+        ttk.Label(frm, text="Operación:").pack(anchor="w")
+        op_var = tk.StringVar(value=OPERATIONS["difference"])
+        ttk.Combobox(
+            frm, textvariable=op_var, values=list(OPERATIONS.values()), state="readonly"
+        ).pack(fill="x")
+        ttk.Label(frm, text="Base:").pack(anchor="w", pady=(6, 0))
+        base_var = tk.StringVar(value=choices[0])
+        ttk.Combobox(frm, textvariable=base_var, values=choices, state="readonly").pack(
+            fill="x"
+        )
+        ttk.Label(frm, text="Con:").pack(anchor="w", pady=(6, 0))
+        lb: tk.Listbox = tk.Listbox(frm, selectmode=tk.EXTENDED, exportselection=False)
+        for c in choices:
+            lb.insert(tk.END, c)
+        lb.pack(fill="both", expand=True)
+        result_var = tk.StringVar(value="")
+        ttk.Label(frm, textvariable=result_var).pack(anchor="w", pady=(6, 0))
+
+        state: Dict[str, Any] = {"op": "difference", "names": [], "bits": 0}
+
+        def recompute(*_: Any) -> None:
+            op = next(k for k, v in OPERATIONS.items() if v == op_var.get())
+            picked = [choices[int(i)] for i in cast(Any, lb).curselection()]
+            names = [base_var.get()] + [n for n in picked if n != base_var.get()]
+            operands = [bits(n) for n in names]
+            t0 = time.perf_counter()
+            res = combine(op, operands)
+            us = (time.perf_counter() - t0) * 1e6
+            state.update(op=op, names=names, bits=res)
+            result_var.set(
+                f"= {FileIndex.count(res)} de {len(index)} archivo(s) ({us:.0f} µs)"
+            )
+
+        def expression() -> str:
+            symbol = OPERATIONS[state["op"]].split()[0]
+            return f" {symbol} ".join(state["names"])
+
+        def result() -> Dict[str, Any]:
+            payloads = [
+                self.build_profile_payload() if n == current else store[n]
+                for n in state["names"]
+            ]
+            return combined_payload(state["op"], payloads, index)[0]
+
+        def apply_selection() -> None:
+            self._apply_combined(result(), state["bits"])
+            self.active_profiles = [expression()]
+            self._refresh_profile_ui()
+            dlg.destroy()
+
+        def save_as() -> None:
+            name = simpledialog.askstring(
+                "Guardar perfil", "Nombre del perfil:", parent=dlg
+            )
+            if not name:
+                return
+            payload = result()
+            latest = _load_profile_store()
+            latest[name] = payload
+            _save_profile_store(latest)
+            self._refresh_profile_ui()
+            messagebox.showinfo(
+                "Perfiles", f"Perfil '{name}' guardado ({expression()}).", parent=dlg
+            )
+
+        op_var.trace_add("write", recompute)
+        base_var.trace_add("write", recompute)
+        lb.bind("<<ListboxSelect>>", recompute)
+
+        btns = ttk.Frame(dlg, padding=8)
+        btns.pack(fill="x")
+        ttk.Button(btns, text="Cerrar", command=dlg.destroy).pack(side="right", padx=4)
+        ttk.Button(btns, text="Guardar como perfil…", command=save_as).pack(
+            side="right", padx=4
+        )
+        ttk.Button(btns, text="Aplicar", command=apply_selection).pack(
+            side="right", padx=4
+        )
+        dlg.bind("<Escape>", lambda e: dlg.destroy())
+        recompute()
+        dlg.wait_window(dlg)
 
     # ---- Acciones de perfiles (UI) ----
 
@@ -1701,29 +5095,7 @@ class DartDumpGUI(tk.Tk):
         """Une varias selecciones en una sola (∪). Mantiene opciones del primero."""
         if not payloads:
             return self.build_profile_payload()
-        first = payloads[0]
-        proj = first.get("project_root", self.project_var.get())
-        options = dict(first.get("options", {}))
-
-        sel_set: Set[str] = set()
-        extras_map: Dict[str, Set[str]] = {}
-        for p in payloads:
-            for rel in p.get("selected_files_rel", []):
-                sel_set.add(str(rel))
-            for g in p.get("extras_groups", []):
-                label = str(g.get("label") or "Extras")
-                files = {str(r) for r in g.get("files", [])}
-                extras_map.setdefault(label, set()).update(files)
-
-        return {
-            "project_root": proj,
-            "options": options,
-            "selected_files_rel": sorted(sel_set, key=str.casefold),
-            "extras_groups": [
-                {"label": lbl, "files": sorted(list(files), key=str.casefold)}
-                for lbl, files in extras_map.items()
-            ],
-        }
+        return union_payload(payloads, self.project_var.get())
 
     def _list_dialog(
         self, title: str, items: List[str], multi: bool
@@ -1781,6 +5153,16 @@ class DartDumpGUI(tk.Tk):
             "sep_width": int(self.sep_width_var.get()),
             "sep_auto": self.sep_auto_var.get(),
             "sep_print_end": self.sep_end_var.get(),
+            "write_index": self.write_index_var.get(),
+            "max_file_kb": int(self.max_file_kb_var.get()),
+            "max_file_lines": int(self.max_file_lines_var.get()),
+            "workspace": self.workspace_var.get(),
+            "compression": self._compression(),
+            "compress_parallel": self.compress_parallel_var.get(),
+            "tee_stdout": self.tee_stdout_var.get(),
+            "generated_policy": _generated_policy(self.generated_var.get()),
+            "link_parts": self.link_parts_var.get(),
+            "strip_comments": self.strip_comments_var.get(),
         }
         _save_prefs(prefs)
         messagebox.showinfo("Preferencias", "Preferencias guardadas.")
@@ -1805,6 +5187,36 @@ class DartDumpGUI(tk.Tk):
         self.sep_width_var.set(int(prefs.get("sep_width", self.sep_width_var.get())))
         self.sep_auto_var.set(bool(prefs.get("sep_auto", self.sep_auto_var.get())))
         self.sep_end_var.set(bool(prefs.get("sep_print_end", self.sep_end_var.get())))
+        self.write_index_var.set(
+            bool(prefs.get("write_index", self.write_index_var.get()))
+        )
+        self.max_file_kb_var.set(
+            int(prefs.get("max_file_kb", self.max_file_kb_var.get()))
+        )
+        self.max_file_lines_var.set(
+            int(prefs.get("max_file_lines", self.max_file_lines_var.get()))
+        )
+        self.workspace_var.set(bool(prefs.get("workspace", self.workspace_var.get())))
+        self._set_compression(prefs.get("compression", self._compression()))
+        self.compress_parallel_var.set(
+            bool(prefs.get("compress_parallel", self.compress_parallel_var.get()))
+        )
+        self.tee_stdout_var.set(
+            bool(prefs.get("tee_stdout", self.tee_stdout_var.get()))
+        )
+        self.generated_var.set(
+            GENERATED_POLICIES[
+                _generated_policy(
+                    prefs.get("generated_policy", self.generated_var.get())
+                )
+            ]
+        )
+        self.link_parts_var.set(
+            bool(prefs.get("link_parts", self.link_parts_var.get()))
+        )
+        self.strip_comments_var.set(
+            bool(prefs.get("strip_comments", self.strip_comments_var.get()))
+        )
         messagebox.showinfo("Preferencias", "Preferencias restauradas.")
 
 
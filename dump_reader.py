@@ -0,0 +1,655 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dump Reader — acceso aleatorio a dumps generados por dump_dart_sources.py
+-------------------------------------------------------------------------
+• Mapea el TXT en memoria (mmap) y construye en una pasada un índice de offsets con
+  los separadores FILE / END FILE, las secciones (EXTRAS, === RAIZ: x ===) y los
+  encabezados de carpeta.
+• Extrae el contenido de un archivo en O(1) una vez indexado (slice del mmap).
+• Reconstruye el árbol de fuentes en una carpeta.
+• Si existe el índice lateral <dump>.idx (escrito al generar) y coincide con el dump,
+  se usa directamente y no se recorre el texto.
+• Lee también dumps comprimidos (.gz/.xz/.zst, ver dump_sinks.py) descomprimiéndolos
+  en memoria.
+• Diff estructural (dump vs dump, o dump vs árbol vivo) por hash de contenido; emite
+  un dump compacto solo con los archivos cambiados ([+] / [~] / [-]). Contra el
+  árbol, un bloque transformado (sin comentarios, colapsado, truncado, por regiones)
+  sin hash de la fuente en el índice lateral sale como [?], no como modificado.
+
+Uso:
+    python dump_reader.py list core.txt
+    python dump_reader.py extract core.txt lib/main.dart
+    python dump_reader.py split core.txt salida/
+    python dump_reader.py diff viejo.txt nuevo.txt -o cambios.txt
+    python dump_reader.py diff viejo.txt --live -o cambios.txt
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import re
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+from typing import (
+    Any,
+    BinaryIO,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    TextIO,
+    Tuple,
+)
+
+from dump_sinks import compression_for, open_compressed
+
+# Una sola expresión para todas las líneas "estructurales" del dump. El separador es
+# el de `DumpRenderer.separator`: relleno + " [END ]FILE: texto " + relleno (el
+# relleno puede faltar si la etiqueta es más ancha que la línea). Las carpetas, solo
+# en las formas exactas de `dir_header` (un nombre sin '/', sangría de 4 en 4) y
+# seguidas de la línea vacía que escribe el generador: una línea de código que
+# empiece por espacios y '/' y acabe en ':' no corta el archivo.
+_TOKEN_RE = re.compile(
+    rb"^(?:"
+    rb"=== RAIZ: (?P<root>[^\r\n]+?) ==="
+    rb"|(?P<extras>EXTRAS \(inicio\))"
+    rb"|(?P<dir>(?:Dentro de |En |(?:    ){2,})/[^/\r\n]+:)(?=\r?\n\r?\n)"
+    rb"|(?P<lead>[^\s]*) (?P<end>END )?FILE: (?P<name>[^\r\n]+?) (?P<trail>[^\s]*)"
+    rb")\r?$",
+    re.M,
+)
+
+EXTRAS_SECTION = "extras"
+
+SIDECAR_SUFFIX = ".idx"
+SIDECAR_VERSION = 2
+
+
+@dataclass
+class DumpEntry:
+    section: str  # "extras" | nombre de raíz | "" (antes de cualquier sección)
+    path: str  # ruta tal como aparece en el separador
+    offset: int  # byte donde empieza el separador FILE
+    length: int  # bytes del bloque (separador FILE .. END FILE inclusive)
+    content_offset: int
+    content_length: int  # -1 si el bloque es solo estructura
+    line_start: int  # 1-based, línea del separador FILE
+    line_end: int  # 1-based, última línea del bloque
+    # solo desde el índice lateral
+    sha1: Optional[str] = None  # sha1 del texto del bloque (UTF-8, saltos "\n")
+    src_sha1: Optional[str] = None  # sha1 de la fuente sin transformar ni truncar
+    mtime: Optional[float] = None  # mtime de la fuente al generar
+    size: Optional[int] = None  # tamaño de la fuente al generar
+
+    @property
+    def key(self) -> str:
+        """Ruta relativa al proyecto (las raíces cuelgan de <proyecto>/<raíz>)."""
+        if self.section in ("", EXTRAS_SECTION):
+            return self.path
+        return f"{self.section}/{self.path}"
+
+    @property
+    def has_content(self) -> bool:
+        return self.content_length >= 0
+
+
+def _is_separator_fill(lead: bytes, trail: bytes) -> bool:
+    fill = (lead + trail).decode("utf-8", errors="ignore")
+    return len(set(fill)) <= 1
+
+
+class DumpIndex:
+    """Índice de un dump mapeado en memoria. Usar como context manager o `close()`."""
+
+    def __init__(self, path: str, use_sidecar: bool = True) -> None:
+        self.path = os.path.abspath(path)
+        self.header: Dict[str, str] = {}
+        self.sections: List[Tuple[str, int]] = []
+        self.entries: List[DumpEntry] = []
+        self.by_key: Dict[str, DumpEntry] = {}
+        self._by_path: Dict[str, Optional[DumpEntry]] = {}
+
+        self._mm: Optional[mmap.mmap] = None
+        self._buf: Optional[bytes] = None
+        self._fh: Optional[BinaryIO] = None
+        if compression_for(self.path):
+            # .gz/.xz/.zst: sin mmap posible, se descomprime entero una vez
+            with open_compressed(self.path) as fh:
+                self._buf = fh.read()
+            size = len(self._buf)
+            use_sidecar = False  # el .idx describe offsets del texto plano
+        else:
+            self._fh = open(self.path, "rb")
+            size = os.fstat(self._fh.fileno()).st_size
+            if size:
+                self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self.from_sidecar = use_sidecar and self._load_sidecar(size)
+        if not self.from_sidecar:
+            self._scan()
+
+    # ---- ciclo de vida ----
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._fh is not None:
+            self._fh.close()
+        self._buf = None
+
+    def __enter__(self) -> "DumpIndex":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    @property
+    def data(self) -> bytes:
+        # mmap admite slicing, find y regex como bytes; el tipado lo ve distinto
+        if self._buf is not None:
+            return self._buf
+        return self._mm if self._mm is not None else b""  # type: ignore[return-value]
+
+    # ---- indexado ----
+
+    def _scan(self) -> None:
+        data = self.data
+        if not data:
+            return
+        self._parse_header(data)
+
+        section = ""
+        line = 1
+        last_pos = 0
+        pending: Optional[Tuple[str, str, int, int, int]] = (
+            None  # sec, name, hs, he, ln
+        )
+
+        def lines_until(pos: int) -> int:
+            nonlocal line, last_pos
+            line += data[last_pos:pos].count(b"\n")
+            last_pos = pos
+            return line
+
+        def close_pending(stop: int) -> None:
+            # Bloque sin END: el contenido llega hasta el siguiente token; las líneas
+            # en blanco del final son del generador (se conserva un salto final).
+            nonlocal pending
+            if pending is None:
+                return
+            sec, name, hs, he, ln = pending
+            body = data[he:stop]
+            text = body.rstrip(b"\r\n")
+            if text:
+                nl = 2 if body[len(text) : len(text) + 2] == b"\r\n" else 1
+                ce = he + len(text) + (nl if len(body) > len(text) else 0)
+                c_len = ce - he
+            else:
+                ce, c_len = he, -1  # solo estructura (o archivo vacío)
+            self._add(
+                DumpEntry(
+                    sec, name, hs, ce - hs, he, c_len, ln, lines_until(max(hs, ce - 1))
+                )
+            )
+            pending = None
+
+        tokens = list(_TOKEN_RE.finditer(data))
+        # Con marcadores END, dentro de un bloque solo cuenta su propio END: así las
+        # líneas del archivo que parezcan separadores no cortan el contenido.
+        has_end = any(m.group("end") is not None for m in tokens)
+
+        for m in tokens:
+            start, stop = m.start(), m.end()
+            if pending is not None and has_end:
+                if m.group("end") is None or m.group("name") is None:
+                    continue
+                if m.group("name").decode("utf-8", errors="replace") != pending[1]:
+                    continue
+            line_end_pos = stop + 1 if data[stop : stop + 1] == b"\n" else stop
+            if m.group("root") is not None or m.group("extras") is not None:
+                close_pending(start)
+                section = (
+                    m.group("root").decode("utf-8", errors="replace")
+                    if m.group("root") is not None
+                    else EXTRAS_SECTION
+                )
+                self.sections.append((section, start))
+                continue
+            if m.group("dir") is not None:
+                close_pending(start)
+                continue
+            if not _is_separator_fill(m.group("lead"), m.group("trail")):
+                continue
+            name = m.group("name").decode("utf-8", errors="replace")
+            if m.group("end") is None:
+                close_pending(start)
+                pending = (section, name, start, line_end_pos, lines_until(start))
+                continue
+            if pending is None or pending[1] != name:
+                continue  # END suelto (o falso positivo dentro de un archivo)
+            sec, _, hs, he, ln = pending
+            pending = None
+            if start == he:
+                c_off, c_len = he, -1  # solo estructura: END pegado al FILE
+            else:
+                ce = start - (2 if data[start - 2 : start] == b"\r\n" else 1)
+                c_off, c_len = he, max(0, ce - he)
+            self._add(
+                DumpEntry(
+                    sec,
+                    name,
+                    hs,
+                    line_end_pos - hs,
+                    c_off,
+                    c_len,
+                    ln,
+                    lines_until(start),
+                )
+            )
+        close_pending(len(data))
+
+    def _load_sidecar(self, size: int) -> bool:
+        """Carga <dump>.idx si corresponde a este dump (tamaño + GENERADO)."""
+        side = self.path + SIDECAR_SUFFIX
+        if not os.path.isfile(side):
+            return False
+        try:
+            with open(side, "r", encoding="utf-8") as fh:
+                meta: Dict[str, Any] = json.load(fh)
+        except (OSError, ValueError):
+            return False
+        if not isinstance(meta, dict):
+            return False
+        self._parse_header(self.data)
+        if (
+            meta.get("version") != SIDECAR_VERSION
+            or meta.get("dump_size") != size
+            or meta.get("generated") != self.header.get("GENERADO")
+        ):
+            self.header.clear()
+            return False
+        try:
+            section = None
+            for b in meta.get("blocks", []):
+                entry = DumpEntry(
+                    section=str(b["section"]),
+                    path=str(b["path"]),
+                    offset=int(b["offset"]),
+                    length=int(b["length"]),
+                    content_offset=int(b["content_offset"]),
+                    content_length=int(b["content_length"]),
+                    line_start=int(b["line_start"]),
+                    line_end=int(b["line_end"]),
+                    sha1=b.get("sha1"),
+                    src_sha1=b.get("src_sha1"),
+                    mtime=b.get("mtime"),
+                    size=b.get("size"),
+                )
+                if entry.section != section:
+                    section = entry.section
+                    self.sections.append((section, entry.offset))
+                self._add(entry)
+        except (KeyError, TypeError, ValueError):
+            # JSON válido pero con otra forma: se descarta y se recorre el dump
+            self.header.clear()
+            self.sections.clear()
+            self.entries.clear()
+            self.by_key.clear()
+            self._by_path.clear()
+            return False
+        return True
+
+    def _parse_header(self, data: bytes) -> None:
+        pos = 0
+        while pos < len(data):
+            nl = data.find(b"\n", pos)
+            nl = len(data) if nl < 0 else nl
+            raw = data[pos:nl].rstrip(b"\r").decode("utf-8", errors="replace")
+            pos = nl + 1
+            if not raw or raw.startswith("==="):
+                break
+            key, sep, value = raw.partition(": ")
+            if not sep:
+                break
+            self.header[key] = value
+
+    def _add(self, entry: DumpEntry) -> None:
+        self.entries.append(entry)
+        self.by_key.setdefault(entry.key, entry)
+        # por ruta sin raíz: None si es ambigua
+        self._by_path[entry.path] = entry if entry.path not in self._by_path else None
+
+    # ---- consulta ----
+
+    def __iter__(self) -> Iterator[DumpEntry]:
+        return iter(self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: str) -> Optional[DumpEntry]:
+        """Busca por ruta relativa al proyecto; si no, por ruta del separador."""
+        key = key.replace("\\", "/").strip("/")
+        return self.by_key.get(key) or self._by_path.get(key)
+
+    def read_bytes(self, entry: DumpEntry) -> bytes:
+        if not entry.has_content:
+            return b""
+        start = entry.content_offset
+        return self.data[start : start + entry.content_length]
+
+    def read(self, entry: DumpEntry) -> str:
+        return self.read_bytes(entry).decode("utf-8", errors="replace")
+
+    def extract(self, key: str) -> Optional[str]:
+        entry = self.get(key)
+        return self.read(entry) if entry else None
+
+    def reconstruct(self, out_dir: str) -> int:
+        """Escribe cada bloque con contenido bajo `out_dir`. Devuelve cuántos escribió."""
+        count = 0
+        for entry in self.entries:
+            if not entry.has_content:
+                continue
+            parts = [p for p in entry.key.split("/") if p not in ("", ".")]
+            if not parts or ".." in parts:
+                continue
+            dest = os.path.join(out_dir, *parts)
+            os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+            with open(dest, "wb") as fh:
+                fh.write(self.read_bytes(entry))
+            count += 1
+        return count
+
+
+# ---------- Diff estructural ----------
+
+DIFF_MARKERS = {"added": "[+]", "modified": "[~]", "removed": "[-]", "unknown": "[?]"}
+
+# Marcas que deja el generador en un bloque que no es la fuente tal cual
+_TRANSFORM_MARK_RE = re.compile(
+    r"^\[(?:… (?:TRUNCADO|OMITIDO|COLAPSADO)|BINARIO omitido|ERROR al leer)".encode(),
+    re.M,
+)
+
+
+@dataclass
+class DiffItem:
+    status: str  # "added" | "modified" | "removed" | "unknown"
+    key: str  # ruta relativa al proyecto
+    text: Optional[str] = None  # contenido nuevo (None en "removed")
+
+
+def _sha1_text(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def entry_sha1(idx: DumpIndex, entry: DumpEntry) -> Optional[str]:
+    """Hash guardado en el índice lateral; si no hay, se calcula del bloque."""
+    if entry.sha1:
+        return entry.sha1
+    if not entry.has_content:
+        return None
+    return hashlib.sha1(idx.read_bytes(entry).replace(b"\r\n", b"\n")).hexdigest()
+
+
+def _maybe_transformed(idx: DumpIndex, entry: DumpEntry) -> bool:
+    """El bloque puede no ser la fuente tal cual: su hash no sirve contra el árbol."""
+    if "strip_comments" in idx.header.get("TRANSFORMACIONES", ""):
+        return True
+    return _TRANSFORM_MARK_RE.search(idx.read_bytes(entry)) is not None
+
+
+def diff_dumps(old: DumpIndex, new: DumpIndex) -> List[DiffItem]:
+    """Compara dos dumps por hash. Con índices laterales no se lee contenido sin cambios."""
+    items: List[DiffItem] = []
+    for key, ne in new.by_key.items():
+        oe = old.by_key.get(key)
+        if oe is None:
+            items.append(DiffItem("added", key, new.read(ne) if ne.has_content else ""))
+        elif not ne.has_content:
+            continue  # sin contenido nuevo que mostrar
+        elif not oe.has_content or entry_sha1(old, oe) != entry_sha1(new, ne):
+            items.append(DiffItem("modified", key, new.read(ne)))
+    for key in old.by_key.keys() - new.by_key.keys():
+        items.append(DiffItem("removed", key))
+    items.sort(key=lambda it: it.key.casefold())
+    return items
+
+
+def _read_source(path: str) -> str:
+    with open(path, "r", encoding="utf-8", errors="ignore") as fh:
+        return fh.read()
+
+
+def _scan_roots(
+    project: str, roots: Iterable[str], exts: Set[str], excl: Set[str]
+) -> Dict[str, Tuple[str, os.stat_result]]:
+    """clave -> (ruta, stat) de los archivos de las raíces, en una pasada de
+    scandir (el stat sale del propio listado; en Windows no cuesta nada)."""
+    found: Dict[str, Tuple[str, os.stat_result]] = {}
+    for root in roots:
+        stack = [(os.path.join(project, root), f"{root}/")]
+        while stack:
+            cur, prefix = stack.pop()
+            try:
+                with os.scandir(cur) as it:
+                    for e in it:
+                        try:
+                            if e.is_dir():
+                                if e.name not in excl and not e.is_symlink():
+                                    stack.append((e.path, f"{prefix}{e.name}/"))
+                                continue
+                            ext = e.name.rsplit(".", 1)[-1].lower()
+                            if "." in e.name and ext in exts:
+                                found[prefix + e.name] = (e.path, e.stat())
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+    return found
+
+
+def diff_against_tree(
+    old: DumpIndex,
+    project_root: Optional[str] = None,
+    roots: Optional[Iterable[str]] = None,
+    extensions: Iterable[str] = ("dart",),
+    excludes: Iterable[str] = (".git", "build", ".dart_tool", ".idea", ".vscode"),
+) -> List[DiffItem]:
+    """Compara un dump con el árbol actual del proyecto.
+
+    Una sola pasada por las raíces (por defecto las de la cabecera RAICES) da los
+    archivos nuevos y el stat de los que ya estaban. Con mtime/tamaño del índice
+    lateral, los archivos sin tocar no se leen; sin él (`old.from_sidecar`) hay
+    que leer y comparar cada uno. Se compara con el hash de la fuente (`src_sha1`);
+    si no lo hay y el bloque pudo transformarse, un hash distinto no prueba nada y
+    sale como "unknown". Un dump con "solo nombre de archivo" necesita el índice
+    lateral para ubicar las rutas.
+    """
+    project = project_root or old.header.get("PROYECTO", "")
+    exts = {e.lower().lstrip(".") for e in extensions}
+    if roots is None:
+        roots = [
+            r.strip() for r in old.header.get("RAICES", "").split(",") if r.strip()
+        ]
+    found = _scan_roots(project, roots, exts, set(excludes))
+    items: List[DiffItem] = []
+
+    for key, oe in old.by_key.items():
+        hit = found.pop(key, None)
+        if hit is not None:
+            path, st = hit
+        else:  # EXTRAS, o filtrado por extensión/exclusión: stat directo
+            path = os.path.join(project, *key.split("/"))
+            try:
+                st = os.stat(path)
+            except OSError:
+                items.append(DiffItem("removed", key))
+                continue
+        if oe.mtime is not None and oe.mtime == st.st_mtime and oe.size == st.st_size:
+            continue
+        if not oe.has_content:
+            continue  # en el dump solo figuraba la estructura
+        try:
+            text = _read_source(path)
+        except OSError:
+            continue
+        digest = _sha1_text(text)
+        if oe.src_sha1:
+            if digest != oe.src_sha1:
+                items.append(DiffItem("modified", key, text))
+        elif digest != entry_sha1(old, oe):
+            status = "unknown" if _maybe_transformed(old, oe) else "modified"
+            items.append(DiffItem(status, key, text))
+
+    for key, (path, _) in found.items():
+        try:
+            items.append(DiffItem("added", key, _read_source(path)))
+        except OSError:
+            pass
+    items.sort(key=lambda it: it.key.casefold())
+    return items
+
+
+def separator_line(text: str, is_end: bool, ch: str = "-", width: int = 80) -> str:
+    """Mismo formato que `DumpRenderer.separator` del generador (ancho fijo)."""
+    label = f" {'END ' if is_end else ''}FILE: {text} "
+    line = ch * width
+    start = max(0, width // 2 - len(label) // 2)
+    return f"{line[:start]}{label}{line[start + len(label):]}\n"
+
+
+def write_diff_dump(out_fh: TextIO, items: List[DiffItem], old: str, new: str) -> None:
+    """Dump compacto con solo los cambios; legible por `DumpIndex`."""
+    counts = {s: sum(1 for it in items if it.status == s) for s in DIFF_MARKERS}
+    out_fh.write(f"DIFF: {old} -> {new}\n")
+    out_fh.write(f"GENERADO: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+    unknown = f" ?{counts['unknown']}" if counts["unknown"] else ""
+    out_fh.write(
+        f"CAMBIOS: +{counts['added']} ~{counts['modified']} -{counts['removed']}"
+        f"{unknown}\n"
+    )
+    out_fh.write("=" * 80 + "\n\n")
+    for it in items:
+        out_fh.write(f"{DIFF_MARKERS[it.status]} {it.key}\n")
+        out_fh.write(separator_line(it.key, is_end=False))
+        if it.text is not None:
+            out_fh.write(it.text)
+            out_fh.write("\n")
+        out_fh.write(separator_line(it.key, is_end=True))
+        out_fh.write("\n")
+
+
+# ---------- CLI ----------
+
+
+def _cmd_list(args: argparse.Namespace) -> int:
+    with DumpIndex(args.dump) as idx:
+        for e in idx:
+            size = e.content_length if e.has_content else "-"
+            print(f"{e.line_start:>7}  {size!s:>9}  {e.key}")
+    return 0
+
+
+def _cmd_extract(args: argparse.Namespace) -> int:
+    with DumpIndex(args.dump) as idx:
+        entry = idx.get(args.path)
+        if entry is None:
+            sys.stderr.write(f"No está en el dump: {args.path}\n")
+            return 1
+        sys.stdout.buffer.write(idx.read_bytes(entry))
+    return 0
+
+
+def _cmd_split(args: argparse.Namespace) -> int:
+    with DumpIndex(args.dump) as idx:
+        n = idx.reconstruct(args.out_dir)
+    print(f"{n} archivos escritos en {args.out_dir}")
+    return 0
+
+
+def _cmd_diff(args: argparse.Namespace) -> int:
+    with DumpIndex(args.old) as old:
+        if args.live:
+            if not old.from_sidecar:
+                sys.stderr.write(
+                    f"Aviso: {args.old} no tiene índice lateral ({SIDECAR_SUFFIX}) "
+                    "válido: se lee y compara cada archivo. Genera con índice para "
+                    "saltar los que no cambiaron.\n"
+                )
+            items = diff_against_tree(
+                old,
+                project_root=args.project,
+                extensions=[e for e in args.ext.split(",") if e.strip()],
+                excludes=[e for e in args.exclude.split(",") if e.strip()],
+            )
+            new_label = "(árbol actual)"
+        elif args.new:
+            with DumpIndex(args.new) as new:
+                items = diff_dumps(old, new)
+            new_label = args.new
+        else:
+            sys.stderr.write("Indica el dump nuevo o --live.\n")
+            return 2
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as fh:
+                write_diff_dump(fh, items, args.old, new_label)
+        else:
+            write_diff_dump(sys.stdout, items, args.old, new_label)
+    unknown = sum(1 for it in items if it.status == "unknown")
+    sys.stderr.write(f"{len(items) - unknown} archivos cambiados\n")
+    if unknown:
+        sys.stderr.write(
+            f"{unknown} sin determinar: el bloque estaba transformado y no hay "
+            "hash de la fuente\n"
+        )
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Lectura indexada de dumps TXT.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("list", help="Lista los bloques del dump")
+    p.add_argument("dump")
+    p.set_defaults(func=_cmd_list)
+
+    p = sub.add_parser("extract", help="Imprime el contenido de un archivo")
+    p.add_argument("dump")
+    p.add_argument("path", help="Ruta relativa al proyecto (o la del separador)")
+    p.set_defaults(func=_cmd_extract)
+
+    p = sub.add_parser("split", help="Reconstruye el árbol de fuentes")
+    p.add_argument("dump")
+    p.add_argument("out_dir")
+    p.set_defaults(func=_cmd_split)
+
+    p = sub.add_parser("diff", help="Dump compacto solo con archivos cambiados")
+    p.add_argument("old")
+    p.add_argument("new", nargs="?")
+    p.add_argument("--live", action="store_true", help="Comparar con el árbol actual")
+    p.add_argument("--project", help="Raíz del proyecto (por defecto, PROYECTO:)")
+    p.add_argument("--ext", default="dart", help="Extensiones (coma) para --live")
+    p.add_argument(
+        "--exclude",
+        default=".git,build,.dart_tool,.idea,.vscode",
+        help="Carpetas excluidas (coma) para --live",
+    )
+    p.add_argument("-o", "--out", help="Archivo de salida (por defecto, stdout)")
+    p.set_defaults(func=_cmd_diff)
+
+    args = parser.parse_args(argv)
+    return int(args.func(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
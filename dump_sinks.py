@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dump Sinks — destinos de salida en streaming (archivo, comprimido, stdout, tee)
+-------------------------------------------------------------------------------
+• Archivo atómico: se escribe en un temporal junto al destino y se reemplaza solo
+  con `commit()` (con los permisos del destino, o los de la umask si es nuevo);
+  `abort()` lo borra y el destino queda intacto.
+• Compresión al vuelo según la extensión: .gz (gzip), .xz (xz), .zst (zstd, si
+  está instalado `zstandard`). Nunca se guarda el dump entero en memoria.
+• Bloques en paralelo (`threads > 1`): el texto se corta en bloques que se
+  comprimen en hilos (zlib/lzma/zstd sueltan el GIL) como flujos independientes
+  concatenados; gzip, xz y zstd los descomprimen como un solo archivo.
+• "-" es stdout (binario, sin compresión salvo que se pida).
+• TeeSink reparte lo mismo a varios destinos a la vez.
+
+Uso:
+    sink = open_sinks(["dump.txt.gz", "-"], threads=4)
+    fh = text_writer(sink)
+    fh.write("...")
+    fh.flush(); sink.commit()   # o sink.abort() si falló
+"""
+
+from __future__ import annotations
+
+import gzip
+import io
+import lzma
+import os
+import sys
+import tempfile
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, BinaryIO, Deque, Dict, List, Optional, Sequence, TextIO
+
+try:  # opcional
+    import zstandard  # type: ignore[import-not-found]
+except ImportError:  # pragma: no cover - depende del entorno
+    zstandard = None
+
+STDOUT = "-"
+# compresión -> extensión
+COMPRESSIONS: Dict[str, str] = {"gzip": ".gz", "xz": ".xz", "zstd": ".zst"}
+DEFAULT_LEVELS: Dict[str, int] = {"gzip": 6, "xz": 6, "zstd": 3}
+# xz gana mucho con bloques grandes; gzip/zstd casi nada
+BLOCK_SIZES: Dict[str, int] = {"gzip": 1 << 20, "xz": 8 << 20, "zstd": 2 << 20}
+
+# umask del proceso (solo se puede leer cambiándola; se hace una vez al importar)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _target_mode(path: str) -> int:
+    """Permisos para el archivo final: los del que se reemplaza o, si es nuevo, los
+    de un `open(..., "w")` normal (mkstemp crea 0600)."""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except OSError:
+        return 0o666 & ~_UMASK
+
+
+def available_compressions() -> List[str]:
+    """Compresiones utilizables aquí (zstd solo con `zstandard` instalado)."""
+    return [c for c in COMPRESSIONS if c != "zstd" or zstandard is not None]
+
+
+def compression_for(path: str) -> str:
+    """Compresión que corresponde a la extensión de `path` ("" = ninguna)."""
+    lower = path.lower()
+    for name, ext in COMPRESSIONS.items():
+        if lower.endswith(ext):
+            return name
+    return ""
+
+
+def with_compression(path: str, compression: str) -> str:
+    """`path` con la extensión de `compression` añadida si aún no la tiene."""
+    if not compression or compression_for(path) == compression:
+        return path
+    return path + COMPRESSIONS[compression]
+
+
+def _check(compression: str) -> None:
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Compresión desconocida: {compression!r}")
+    if compression == "zstd" and zstandard is None:
+        raise ValueError("zstd requiere el paquete 'zstandard' (pip install zstandard)")
+
+
+def _stream_compressor(compression: str, level: int) -> Any:
+    """Objeto con compress(bytes) / flush() para un único flujo."""
+    if compression == "gzip":
+        return zlib.compressobj(level, zlib.DEFLATED, 31)  # 31 = cabecera gzip
+    if compression == "xz":
+        return lzma.LZMACompressor(preset=level)
+    return zstandard.ZstdCompressor(level=level).compressobj()
+
+
+def _compress_block(compression: str, level: int, data: bytes) -> bytes:
+    """Un flujo completo e independiente (se puede concatenar con otros)."""
+    if compression == "gzip":
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    if compression == "xz":
+        return lzma.compress(data, preset=level)
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+class OutputSink(io.RawIOBase):
+    """Un destino binario: archivo (atómico) o stdout, comprimido o no.
+
+    `compression=None` la deduce de la extensión; stdout va sin comprimir.
+    """
+
+    def __init__(
+        self,
+        target: str,
+        compression: Optional[str] = None,
+        level: Optional[int] = None,
+        threads: int = 0,
+    ) -> None:
+        super().__init__()
+        self.target = target
+        if compression is None:
+            compression = "" if target == STDOUT else compression_for(target)
+        if compression:
+            _check(compression)
+        self.compression = compression
+        self.level = DEFAULT_LEVELS.get(compression, 0) if level is None else level
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+        self._tmp: Optional[str] = None
+        if target == STDOUT:
+            self._fh: BinaryIO = sys.stdout.buffer
+        else:
+            out_dir = os.path.dirname(os.path.abspath(target))
+            fd, self._tmp = tempfile.mkstemp(
+                dir=out_dir, prefix=f".{os.path.basename(target)}.", suffix=".tmp"
+            )
+            self._fh = open(fd, "wb")
+
+        self._comp: Any = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pending: Deque["Future[bytes]"] = deque()
+        self._block: List[bytes] = []
+        self._block_len = 0
+        self._block_size = BLOCK_SIZES.get(compression, 1 << 20)
+        self._threads = threads
+        if compression and threads > 1:
+            self._pool = ThreadPoolExecutor(
+                max_workers=threads, thread_name_prefix="compress"
+            )
+        elif compression:
+            self._comp = _stream_compressor(compression, self.level)
+
+    def writable(self) -> bool:
+        return True
+
+    def _emit(self, data: bytes) -> None:
+        if data:
+            self._fh.write(data)
+            self.bytes_out += len(data)
+
+    def write(self, b: Any) -> int:
+        data = bytes(b)
+        self.bytes_in += len(data)
+        if self._pool is not None:
+            self._block.append(data)
+            self._block_len += len(data)
+            if self._block_len >= self._block_size:
+                self._submit_block()
+        elif self._comp is not None:
+            self._emit(self._comp.compress(data))
+        else:
+            self._emit(data)
+        return len(data)
+
+    def _submit_block(self) -> None:
+        assert self._pool is not None
+        data = b"".join(self._block)
+        self._block.clear()
+        self._block_len = 0
+        self._pending.append(
+            self._pool.submit(_compress_block, self.compression, self.level, data)
+        )
+        # Orden de salida = orden de entrada; como mucho 2 bloques por hilo en vuelo
+        while len(self._pending) > 2 * self._threads:
+            self._emit(self._pending.popleft().result())
+
+    def _finish(self) -> None:
+        if self._pool is not None:
+            if self._block:
+                self._submit_block()
+            while self._pending:
+                self._emit(self._pending.popleft().result())
+            self._pool.shutdown()
+            self._pool = None
+        elif self._comp is not None:
+            self._emit(self._comp.flush())
+            self._comp = None
+
+    def commit(self) -> None:
+        """Cierra el flujo comprimido y deja el archivo en su sitio."""
+        self._finish()
+        if self._tmp is None:
+            self._fh.flush()
+        else:
+            self._fh.close()
+            os.chmod(self._tmp, _target_mode(self.target))
+            os.replace(self._tmp, self.target)
+            self._tmp = None
+        super().close()
+
+    def abort(self) -> None:
+        """Descarta lo escrito (el destino, si existía, no se toca)."""
+        if self._pool is not None:
+            for fut in self._pending:
+                fut.cancel()
+            self._pending.clear()
+            self._pool.shutdown()
+            self._pool = None
+        if self._tmp is not None:
+            self._fh.close()
+            try:
+                os.remove(self._tmp)
+            except OSError:
+                pass
+            self._tmp = None
+        super().close()
+
+    def close(self) -> None:
+        # Cerrar sin commit() = abortar (p. ej. al desenrollar una excepción)
+        if not self.closed:
+            self.abort()
+
+
+class TeeSink(io.RawIOBase):
+    """Escribe lo mismo en varios destinos; commit/abort se aplican a todos."""
+
+    def __init__(self, sinks: Sequence[OutputSink]) -> None:
+        super().__init__()
+        self.sinks = list(sinks)
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b: Any) -> int:
+        for s in self.sinks:
+            s.write(b)
+        return len(b)
+
+    def commit(self) -> None:
+        for s in self.sinks:
+            s.commit()
+        super().close()
+
+    def abort(self) -> None:
+        for s in self.sinks:
+            s.abort()
+        super().close()
+
+    def close(self) -> None:
+        if not self.closed:
+            self.abort()
+
+
+Sink = Any  # OutputSink | TeeSink
+
+
+def open_sinks(
+    targets: Sequence[str], level: Optional[int] = None, threads: int = 0
+) -> Sink:
+    """Un destino por ruta ("-" = stdout), compresión según extensión."""
+    sinks: List[OutputSink] = []
+    try:
+        for t in targets:
+            sinks.append(OutputSink(t, level=level, threads=threads))
+    except BaseException:
+        for s in sinks:
+            s.abort()
+        raise
+    return sinks[0] if len(sinks) == 1 else TeeSink(sinks)
+
+
+def text_writer(sink: Sink, buffer_size: int = 1 << 20) -> TextIO:
+    """Capa de texto UTF-8 (saltos como `open(..., "w")`) sobre un destino."""
+    return io.TextIOWrapper(
+        io.BufferedWriter(sink, buffer_size), encoding="utf-8"  # type: ignore[arg-type]
+    )
+
+
+def open_compressed(path: str) -> BinaryIO:
+    """Abre para leer un dump, comprimido o no (según extensión)."""
+    compression = compression_for(path)
+    if compression == "gzip":
+        return gzip.open(path, "rb")  # type: ignore[return-value]
+    if compression == "xz":
+        return lzma.open(path, "rb")  # type: ignore[return-value]
+    if compression == "zstd":
+        _check(compression)
+        return zstandard.ZstdDecompressor().stream_reader(  # type: ignore[no-any-return]
+            open(path, "rb"), read_across_frames=True, closefd=True
+        )
+    return open(path, "rb")
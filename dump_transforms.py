@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dump Transforms — transformaciones por archivo en un pool de procesos
+---------------------------------------------------------------------
+• Registro por modo de salida: cada transformación (texto → texto) tiene nombre,
+  versión y los modos en que se aplica; el render elige la cadena de cada archivo.
+• TransformStage: lee por adelantado los archivos en el orden del dump, reparte
+  en lotes los que hay que calcular a un ProcessPoolExecutor y los devuelve en ese
+  mismo orden. Mientras se escribe una ventana, la siguiente ya se está calculando.
+• Caché en disco por (hash del contenido, transformaciones@versión): regenerar un
+  dump sin cambios no recalcula nada; subir la versión invalida lo anterior.
+• Con poco texto pendiente o una sola CPU se calcula en el propio proceso:
+  arrancar procesos costaría más de lo que ahorra.
+
+Las funciones registradas deben ser de nivel de módulo y registrarse al importar
+un módulo: los procesos del pool importan el módulo, no heredan el registro.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from dart_analysis import collapse_to_signatures, strip_comments
+
+TRANSFORM_CACHE_DIR: str = os.path.expanduser("~/.dart_dump_gui_transforms")
+TRANSFORM_CACHE_MAX = 20000  # entradas; se podan las menos usadas
+TEXT_MODES: FrozenSet[str] = frozenset({"content_selected", "selected_plus_structure"})
+
+WINDOW_FILES = 64  # archivos leídos por adelantado en cada ventana
+BATCH_CHARS = 256 << 10  # texto por lote enviado a un proceso
+MIN_POOL_CHARS = 128 << 10  # por debajo, la ventana se calcula aquí mismo
+
+COLLAPSED_MARK = "[… COLAPSADO: código generado, solo cabecera y firmas públicas]\n"
+
+Chain = Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class Transform:
+    name: str
+    version: int  # subirla invalida lo cacheado
+    fn: Callable[[str], str]
+    modes: FrozenSet[str]
+
+
+_REGISTRY: Dict[str, Transform] = {}
+
+
+def register(
+    name: str, version: int, fn: Callable[[str], str], modes: Iterable[str]
+) -> None:
+    """Registra (o reemplaza) una transformación para los modos dados."""
+    _REGISTRY[name] = Transform(name, version, fn, frozenset(modes))
+
+
+def transforms_for(mode: str) -> List[str]:
+    """Nombres registrados para un modo de salida, en orden de registro."""
+    return [t.name for t in _REGISTRY.values() if mode in t.modes]
+
+
+def chain_signature(chain: Chain) -> str:
+    return ",".join(f"{n}@{_REGISTRY[n].version}" for n in chain)
+
+
+def apply_chain(chain: Chain, text: str) -> str:
+    for name in chain:
+        text = _REGISTRY[name].fn(text)
+    return text
+
+
+def _run_batch(items: List[Tuple[Chain, str]]) -> List[str]:
+    """Punto de entrada de los procesos del pool."""
+    return [apply_chain(chain, text) for chain, text in items]
+
+
+def _collapse(text: str) -> str:
+    return collapse_to_signatures(text) + COLLAPSED_MARK
+
+
+register("strip_comments", 1, strip_comments, TEXT_MODES)
+register("collapse", 2, _collapse, TEXT_MODES)
+
+
+# ---------- pool compartido ----------
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def _shared_pool(workers: int) -> ProcessPoolExecutor:
+    """Un pool por proceso (GUI o daemon), creado al primer uso y reutilizado."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            # spawn: el render corre en un hilo y fork con hilos no es seguro
+            _POOL = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _POOL
+
+
+def _drop_pool() -> None:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.shutdown(wait=False, cancel_futures=True)
+            _POOL = None
+
+
+# ---------- caché en disco ----------
+
+
+class TransformCache:
+    """Un archivo por resultado: <dir>/<aa>/<sha1 contenido>-<sha1 cadena>.txt."""
+
+    def __init__(
+        self, root: str = TRANSFORM_CACHE_DIR, max_entries: int = TRANSFORM_CACHE_MAX
+    ) -> None:
+        self.root = root
+        self.max_entries = max_entries
+        self._added = 0
+
+    @staticmethod
+    def key(chain: Chain, text: str) -> str:
+        content = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        sig = hashlib.sha1(chain_signature(chain).encode("utf-8")).hexdigest()
+        return f"{content}-{sig[:12]}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key + ".txt")
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8", newline="") as fh:
+                text = fh.read()
+            os.utime(path)  # para podar por uso, no por creación
+        except OSError:
+            return None
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with open(fd, "w", encoding="utf-8", newline="") as fh:
+                fh.write(text)
+            os.replace(tmp, path)
+            self._added += 1
+        except OSError:
+            pass
+
+    def prune(self) -> None:
+        """Borra las entradas menos usadas si se pasó del máximo."""
+        if not self._added:
+            return
+        self._added = 0
+        entries: List[Tuple[float, str]] = []
+        try:
+            for sub in os.scandir(self.root):
+                if sub.is_dir():
+                    for e in os.scandir(sub.path):
+                        entries.append((e.stat().st_mtime, e.path))
+        except OSError:
+            return
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort()
+        for _, path in entries[: len(entries) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+# ---------- etapa del render ----------
+
+
+@dataclass
+class _Window:
+    hits: Dict[str, str]
+    paths: List[str] = field(default_factory=list)
+    keys: List[str] = field(default_factory=list)
+    items: List[Tuple[Chain, str]] = field(default_factory=list)
+    futures: List["Future[List[str]]"] = field(default_factory=list)
+
+
+class TransformStage:
+    """Transforma por adelantado, en ventanas, los archivos de un render.
+
+    `plan()` recibe (ruta, cadena) en el orden en que se van a escribir y
+    `take(ruta)` devuelve el texto transformado de esa ruta, o None si no estaba
+    planificada o `load(ruta)` no dio texto (binario, error): el render lo lee él.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[str], Optional[str]],
+        cache: Optional[TransformCache] = None,
+        workers: int = 0,
+        perf: Any = None,
+        window: int = WINDOW_FILES,
+    ) -> None:
+        self.load = load
+        self.cache = cache
+        self.workers = workers or default_workers()
+        self.perf = perf
+        self.window = window
+        self._queue: Deque[Tuple[str, Chain]] = deque()
+        self._inflight: Deque[_Window] = deque()
+        self._ready: Dict[str, str] = {}
+        self._missing: Set[str] = set()
+
+    def plan(self, files: Iterable[Tuple[str, Chain]]) -> None:
+        self._queue.extend((p, c) for p, c in files if c)
+
+    def _count(self, name: str, n: int = 1) -> None:
+        if self.perf is not None and n:
+            self.perf.count(name, n)
+
+    def _fill(self) -> None:
+        """Lee la siguiente ventana; lo que no está en caché va al pool."""
+        win = _Window(hits={})
+        n = 0
+        while self._queue and n < self.window:
+            path, chain = self._queue.popleft()
+            n += 1
+            text = self.load(path)
+            if text is None:
+                self._missing.add(path)
+                continue
+            key = TransformCache.key(chain, text) if self.cache else ""
+            cached = self.cache.get(key) if self.cache else None
+            if cached is not None:
+                win.hits[path] = cached
+                continue
+            win.paths.append(path)
+            win.keys.append(key)
+            win.items.append((chain, text))
+        self._count("transform_cache_hits", len(win.hits))
+        chars = sum(len(t) for _, t in win.items)
+        if self.workers > 1 and chars >= MIN_POOL_CHARS:
+            try:
+                self._submit(win)
+            except Exception:
+                _drop_pool()
+                win.futures = []
+        self._inflight.append(win)
+
+    def _submit(self, win: _Window) -> None:
+        pool = _shared_pool(self.workers)
+        # al menos un lote por proceso, sin pasar de BATCH_CHARS
+        chars = sum(len(t) for _, t in win.items)
+        target = min(BATCH_CHARS, chars // self.workers + 1)
+        batch: List[Tuple[Chain, str]] = []
+        size = 0
+        for item in win.items:
+            batch.append(item)
+            size += len(item[1])
+            if size >= target:
+                win.futures.append(pool.submit(_run_batch, batch))
+                batch, size = [], 0
+        if batch:
+            win.futures.append(pool.submit(_run_batch, batch))
+
+    def _collect(self, win: _Window) -> None:
+        self._ready.update(win.hits)
+        if not win.items:
+            return
+        results: List[str] = []
+        if win.futures:
+            try:
+                for fut in win.futures:
+                    results.extend(fut.result())
+                self._count("transform_batches", len(win.futures))
+            except Exception:
+                # pool roto (p. ej. sin permiso para crear procesos): aquí mismo
+                _drop_pool()
+                results = []
+        if len(results) != len(win.items):
+            results = _run_batch(win.items)
+        self._count("transformed", len(results))
+        for path, key, text in zip(win.paths, win.keys, results):
+            self._ready[path] = text
+            if self.cache:
+                self.cache.put(key, text)
+
+    def take(self, path: str) -> Optional[str]:
+        while path not in self._ready:
+            if path in self._missing:
+                self._missing.discard(path)
+                return None
+            if len(self._inflight) < 2 and self._queue:
+                self._fill()  # siempre una ventana por delante de la que se escribe
+                continue
+            if not self._inflight:
+                return None
+            with self.perf.phase("transform") if self.perf else nullcontext():
+                self._collect(self._inflight.popleft())
+        return self._ready.pop(path)
+
+    def close(self) -> None:
+        """Cancela lo pendiente (render cancelado) y poda la caché."""
+        for win in self._inflight:
+            for fut in win.futures:
+                fut.cancel()
+        self._inflight.clear()
+        self._queue.clear()
+        self._ready.clear()
+        if self.cache:
+            self.cache.prune()